@@ -1,41 +1,160 @@
 import tkinter as tk
 from tkinter import messagebox
+from tkinter import filedialog
 from library import *
 from Model import *
 from View import *
+from export import exportDelivery
+from replay import exportReplay, confidenceBand
+from session import saveSession
+from server import RemoteModel
+from worker import Worker
+from playback import PlaybackScheduler
+from autotune import MIN_TUNING_FRAMES, MAX_TUNING_FRAMES
 
 class Controller:
-    def __init__(self, root: tk.Tk, frontVideo: Video, sideVideo: Video) -> None:
+    def __init__(self, root: tk.Tk, frontVideo: Video, sideVideo: Video, model: Model = None, memoryLimit: int = None) -> None:
         """
         Initializes the Controller with the given side and front video sources and sets up the Model and View.
         Args:
             sideVideo (Video): The video source for the side camera.
             frontVideo (Video): The video source for the front camera.
+            model (Model): A model of the two videos restored from a session, if resuming one.
+            memoryLimit (int): Largest number of bytes the frames of both videos may use, or None for no limit.
         """        
         self._frontDimensions = frontVideo.getDimensions()
         self._sideDimensions = sideVideo.getDimensions()
-        self._model = Model(frontVideo, sideVideo)
+        self._model = model or Model(frontVideo, sideVideo)
+        self._model.setMemoryLimit(memoryLimit)
+        self._root = root
+        self._playback = {}
+        self._tuningClicks = {view: {} for view in View}
+        # State of each video as of the last finished task, which the Tk thread reads instead of the Model
+        self._videoStates = {}
 
         callbacks = Callbacks(
             incrementFrame=self.incrementFrame,
+            togglePlayback=self.togglePlayback,
+            skipToDelivery=self.skipToDelivery,
             updateParameters=self.updateParameters,
+            setRefinement=self.setRefinement,
+            addTuningClick=self.addTuningClick,
+            autoTune=self.autoTune,
             cropRegion=self.cropRegion,
             startTracking=self.startTracking,
             setStumpPosition=self.setStumpPosition,
             makePrediction=self.makePrediction,
-            linkVideos=self.linkVideos
+            exportDelivery=self.exportDelivery,
+            exportReplay=self.exportReplay,
+            saveSession=self.saveSession,
+            linkVideos=self.linkVideos,
+            setFitMode=self.setFitMode,
+            autoLink=self.autoLink
         )
         self._view = VIEW(root, frontVideo.getDimensions(), sideVideo.getDimensions(), callbacks)
+        self._worker = Worker(root, onBusyChange=self._busyChanged, onProgress=self._showProgress)
+        self._model.setProgressCallback(self._worker.reportProgress)
+        if model is not None:
+            self._showModelSettings()
         self.update_view()
     
+    def _showModelSettings(self) -> None:
+        """
+        Moves the controls of the View to the settings of a restored Model.
+        """
+        for view in View:
+            video = self._model.getVideo(view)
+            self._view.setParameters(view, video.getParameters())
+            self._view.setCropRegion(view, *video.getCropRegion())
+        if self._model.getStumpPosition() is not None:
+            self._view.setStumpPosition(self._model.getStumpPosition())
+
     def update_view(self) -> None:
         """
         Updates the View with the latest rendered frames from the Model.
         """
-        renders = self._model.render()
-        frontRender = renders[View.FRONT]
-        sideRender = renders[View.SIDE]
-        self._view.render(frontRender, sideRender)
+        self._runInBackground(lambda: None)
+
+    def _render(self, renders: dict[View, Render]) -> None:
+        """
+        Draws frames rendered by the Model in the View, leaving views which were not rendered unchanged.
+        Args:
+            renders (dict[View, Render]): The rendered frame of each changed view.
+        """
+        self._view.render(renders.get(View.FRONT), renders.get(View.SIDE))
+
+    def _runInBackground(self, task, onDone=None, onError=None, render: bool = True) -> None:
+        """
+        Runs a Model operation on the worker thread, renders the views it changed there too, then hands the
+        results back to the Tk thread. Model operations run in the order they were requested.
+        Args:
+            task: A function taking no arguments which updates the Model.
+            onDone: Called on the Tk thread with the task's result once the View has been redrawn.
+            onError: Called on the Tk thread with any ValueError raised by the task.
+            render (bool): Whether to redraw the views the task changed.
+        """
+        def work():
+            result = task()
+            return result, self._model.render(changedOnly=True) if render else {}, self._videoState()
+
+        def done(value):
+            result, renders, states = value
+            self._render(renders)
+            self._videoStates = states
+            self._showMemoryUsage(states)
+            if onDone is not None:
+                onDone(result)
+
+        def failed(error):
+            if onError is not None and isinstance(error, ValueError):
+                onError(error)
+            else:
+                raise error
+
+        self._worker.submit(work, done, failed)
+
+    def _runTask(self, function, *arguments):
+        """
+        Runs a function taking the Model as its first argument, on the tracking server if the Model is remote
+        so that it can read frames and points directly.
+        Args:
+            function: The function, one of the tasks the tracking server allows.
+        """
+        if isinstance(self._model, RemoteModel):
+            return self._model.runTask(function, *arguments)
+        return function(self._model, *arguments)
+
+    def _videoState(self) -> dict[View, VideoState]:
+        """
+        Reads the state of each video the Tk thread needs. Must be called on the worker thread.
+        """
+        usage = self._model.getMemoryUsage()
+        states = {}
+        for view in View:
+            video = self._model.getVideo(view)
+            states[view] = VideoState(video.getFrameIndex(), video.getTimestamp(), usage[view], video.getMemoryLimit())
+        return states
+
+    def _showMemoryUsage(self, states: dict[View, VideoState]) -> None:
+        """
+        Shows how much memory each video is using in the View.
+        Args:
+            states (dict[View, VideoState]): The state of each video after the last task.
+        """
+        for view, state in states.items():
+            self._view.setMemoryUsage(view, state.memoryUsage.total, state.memoryLimit)
+
+    def _busyChanged(self, busy: bool) -> None:
+        """
+        Shows whether the Model is busy in the View.
+        """
+        self._view.setStatus("Working..." if busy else "Ready")
+
+    def _showProgress(self, done: int, total: int) -> None:
+        """
+        Shows the progress of retracking frames in the View.
+        """
+        self._view.setStatus(f"Tracking frame {done + 1} of {total}")
     
     def incrementFrame(self, view: View) -> None:
         """
@@ -43,10 +162,72 @@ class Controller:
         Args:
             view (View): The view to increment the frame for.
         """
-        if not self._model.incrementFrame(view):
-            messagebox.showinfo("End of Video", f"No more frames in {view.name} video.")
-        else:
-            self.update_view()
+        def done(incremented):
+            if not incremented:
+                messagebox.showinfo("End of Video", f"No more frames in {view.name} video.")
+        self._runInBackground(lambda: self._model.incrementFrame(view), done)
+    
+    def togglePlayback(self, view: View) -> None:
+        """
+        Starts or stops playing the specified view (FRONT or SIDE) in real time.
+        Args:
+            view (View): The view to play or pause.
+        """
+        if view in self._playback:
+            self._stopPlayback(view)
+            return
+
+        state = self._videoStates.get(view)
+        startTime = state.timestamp if state is not None else None
+        scheduler = PlaybackScheduler(startTime if startTime is not None else 0.0)
+        self._playback[view] = scheduler
+        self._view.setPlaying(view, True)
+        self._root.after(scheduler.getTickInterval(), lambda: self._playbackTick(view))
+
+    def _stopPlayback(self, view: View) -> None:
+        """
+        Stops playing the specified view.
+        """
+        self._playback.pop(view, None)
+        self._view.setPlaying(view, False)
+
+    def _playbackTick(self, view: View) -> None:
+        """
+        Advances a playing view to the current playback time on the worker thread and renders the frame it
+        reaches. If the previous tick is still being decoded and tracked this tick's render is dropped, and
+        the next tick catches up on every frame in between.
+        Args:
+            view (View): The playing view.
+        """
+        scheduler = self._playback.get(view)
+        if scheduler is None:
+            return
+        self._root.after(scheduler.getTickInterval(), lambda: self._playbackTick(view))
+        if self._worker.isBusy():
+            scheduler.dropRender()
+            return
+
+        def done(reached):
+            scheduler.recordRender()
+            if self._playback.get(view) is scheduler:
+                self._view.setPlaybackRate(view, scheduler.achievedRate(), scheduler.getTargetRate())
+                if not reached:
+                    self._stopPlayback(view)
+                    messagebox.showinfo("End of Video", f"No more frames in {view.name} video.")
+
+        dueTime = scheduler.dueTime()
+        self._runInBackground(lambda: self._model.advanceTo(view, dueTime), done)
+
+    def skipToDelivery(self, view: View) -> None:
+        """
+        Skips the specified view (FRONT or SIDE) past idle footage to the next detected delivery.
+        Args:
+            view (View): The view to skip.
+        """
+        def done(skipped):
+            if not skipped:
+                messagebox.showinfo("No Delivery Found", f"No more movement detected in {view.name} video.")
+        self._runInBackground(lambda: self._model.skipToDelivery(view), done)
     
     def updateParameters(self, view: View, parameters: Parameters) -> None:
         """
@@ -55,9 +236,57 @@ class Controller:
             view (View): The view to update the parameters for.
             parameters (Parameters): The new tracking parameters.
         """
-        self._model.updateParameters(view, parameters)
-        self.update_view()
+        self._runInBackground(lambda: self._model.updateParameters(view, parameters))
     
+    def setRefinement(self, view: View, enabled: bool) -> None:
+        """
+        Sets whether tracked ball centres are refined to sub-pixel precision for the specified view (FRONT or SIDE).
+        Args:
+            view (View): The view to update.
+            enabled (bool): Whether to refine tracked ball centres.
+        """
+        self._runInBackground(lambda: self._model.setRefinement(view, enabled))
+    
+    def addTuningClick(self, view: View, x: float, y: float) -> None:
+        """
+        Records where the user clicked the ball in the current frame of the specified view (FRONT or SIDE),
+        keeping one click per frame for the most recent frames.
+        Args:
+            view (View): The view that was clicked.
+            x (float): The x position of the click in video pixels.
+            y (float): The y position of the click in video pixels.
+        """
+        # The frame last rendered, as the Model may already be tracking a later frame during playback
+        state = self._videoStates.get(view)
+        frame = state.frameIndex if state is not None else None
+        if frame is None:
+            return
+        clicks = self._tuningClicks[view]
+        clicks.pop(frame, None)
+        clicks[frame] = (x, y)
+        while len(clicks) > MAX_TUNING_FRAMES:
+            clicks.pop(next(iter(clicks)))
+        self._view.setStatus(f"Ball clicked in {len(clicks)} {view.name.lower()} frames")
+
+    def autoTune(self, view: View) -> None:
+        """
+        Chooses the tracking parameters of the specified view (FRONT or SIDE) from the balls clicked in it.
+        Args:
+            view (View): The view to tune.
+        """
+        clicks = [(frame, x, y) for frame, (x, y) in self._tuningClicks[view].items()]
+        if len(clicks) < MIN_TUNING_FRAMES:
+            messagebox.showerror("Auto Tune", f"Click the ball in at least {MIN_TUNING_FRAMES} frames of the {view.name} video first.")
+            return
+
+        def done(result):
+            parameters, hits = result
+            self._tuningClicks[view].clear()
+            self._view.setParameters(view, parameters)
+            messagebox.showinfo("Auto Tune", f"The chosen parameters find the clicked ball in {hits} of {len(clicks)} frames.")
+
+        self._runInBackground(lambda: self._model.autoTune(view, clicks), done, lambda e: messagebox.showerror("Auto Tune", str(e)))
+
     def cropRegion(self, view: View, topleft: tuple[int], bottomright: tuple[int]) -> None:
         """
         Updates the crop region for the specified view (FRONT or SIDE).
@@ -65,8 +294,7 @@ class Controller:
             view (View): The view to update the crop region for.
             cropRegion (tuple[tuple[int]]): The new crop region as ((x1, y1), (x2, y2)).
         """
-        self._model.cropRegion(view, topleft, bottomright)
-        self.update_view()
+        self._runInBackground(lambda: self._model.cropRegion(view, topleft, bottomright))
     
     def setStumpPosition(self, position: int) -> None:
         """
@@ -77,8 +305,7 @@ class Controller:
         if position < 0 or position > self._sideDimensions[0]:
             messagebox.showerror("Invalid Position", "Stump position must be within the width of the side video.")
         else:
-            self._model.setStumpPosition(position)
-            self.update_view()
+            self._runInBackground(lambda: self._model.setStumpPosition(position))
     
     def startTracking(self, view: View) -> None:
         """
@@ -86,41 +313,140 @@ class Controller:
         Args:
             view (View): The view to start tracking for.
         """
-        if self._model.startTracking(view):
-            messagebox.showinfo("Tracking Started", f"Started tracking in {view.name} video.")
-        else:
-            messagebox.showerror("Tracking Error", f"Already started tracking or no frames available.")
+        def done(started):
+            if started:
+                messagebox.showinfo("Tracking Started", f"Started tracking in {view.name} video.")
+            else:
+                messagebox.showerror("Tracking Error", f"Already started tracking or no frames available.")
+        self._runInBackground(lambda: self._model.startTracking(view), done)
     
     def makePrediction(self) -> None:
         """
         Makes a prediction based on the tracked data and updates the View to display the results.
         """
-        output = None
-        # Attempt to make prediction and handle potential errors
-        try:
-            output = self._model.makePrediction()
-        except ValueError as e:
-            messagebox.showerror("Could not make prediction: ", str(e))
-            return
-        
+        self._runInBackground(
+            self._predictAndRender,
+            lambda result: self._showPrediction(*result),
+            lambda e: messagebox.showerror("Could not make prediction: ", str(e)),
+            render=False
+        )
+
+    def _predictAndRender(self) -> tuple[Prediction, dict[View, Render]]:
+        """
+        Makes a prediction and renders both views to draw it over. Both views are invalidated so that the
+        next change redraws them without the prediction.
+        """
+        prediction = self._model.makePrediction()
+        self._model.invalidate(*View)
+        renders = self._model.render(changedOnly=True)
+        self._model.invalidate(*View)
+        return prediction, renders
+
+    def _showPrediction(self, prediction: Prediction, renders: dict[View, Render]) -> None:
+        """
+        Draws a prediction over the latest frames and plots the points it was made from.
+        Args:
+            prediction (Prediction): The prediction made by the Model.
+            renders (dict[View, Render]): The frames rendered by the Model after the prediction was made.
+        """
         # Update the front view to draw the predicted line of the ball upon impact
-        renders = self._model.render()
         frontRender = renders[View.FRONT]
         frontRender.circles=[]
         frontRender.cropRegion=None
-        frontRender.verticalLines=[output[0]]
+        frontRender.verticalLines=[prediction.line]
+        frontRender.verticalBands=confidenceBand(prediction.lineInterval)
 
         # Update the side view to draw the predicted height of the ball upon impact
         sideRender = renders[View.SIDE]
         sideRender.circles=[]
         sideRender.cropRegion=None
         sideRender.verticalLines=[]
-        sideRender.horizontalLines=[output[1]]
+        sideRender.horizontalLines=[prediction.height]
+        sideRender.horizontalBands=confidenceBand(prediction.heightInterval)
         
         self._view.render(frontRender, sideRender)
+        self._model.showPlots()
+
+    def setFitMode(self, mode: FitMode) -> None:
+        """
+        Sets how trajectories are fitted when making a prediction.
+        Args:
+            mode (FitMode): The fitting mode chosen by the user.
+        """
+        self._runInBackground(lambda: self._model.setFitMode(mode), render=False)
+
+    def exportDelivery(self) -> None:
+        """
+        Appends the tracked trajectories and latest prediction to a delivery file chosen by the user.
+        """
+        path = filedialog.asksaveasfilename(defaultextension=".npz", filetypes=[("Delivery files", "*.npz")])
+        if not path:
+            return
+
+        def done(index):
+            messagebox.showinfo("Delivery Exported", f"Saved as delivery {index} in {path}.")
+
+        def export():
+            try:
+                return self._runTask(exportDelivery, path)
+            except OSError as e:
+                raise ValueError(str(e)) from e
+
+        self._runInBackground(export, done, lambda e: messagebox.showerror("Could not export delivery: ", str(e)), render=False)
+
+    def exportReplay(self) -> None:
+        """
+        Writes an annotated replay of the delivery and its latest prediction to a video file chosen by the user.
+        """
+        path = filedialog.asksaveasfilename(defaultextension=".mp4", filetypes=[("Replay videos", "*.mp4")])
+        if not path:
+            return
+
+        def done(count):
+            messagebox.showinfo("Replay Exported", f"Wrote {count} frames to {path}.")
+
+        def export():
+            try:
+                return self._runTask(exportReplay, path)
+            except OSError as e:
+                raise ValueError(str(e)) from e
+
+        self._runInBackground(export, done, lambda e: messagebox.showerror("Could not export replay: ", str(e)), render=False)
+
+    def saveSession(self) -> None:
+        """
+        Saves the state of the review to a session file chosen by the user, so it can be resumed later.
+        """
+        path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("Session files", "*.json")])
+        if not path:
+            return
+
+        def save():
+            try:
+                self._runTask(saveSession, path)
+            except OSError as e:
+                raise ValueError(str(e)) from e
+
+        self._runInBackground(save, lambda _: messagebox.showinfo("Session Saved", f"Saved session to {path}."),
+            lambda e: messagebox.showerror("Could not save session: ", str(e)), render=False)
 
     def linkVideos(self) -> None:
         """
         Links the side and front videos for synchronized playback.
         """
-        self._model.linkVideos()
\ No newline at end of file
+        def done(linked):
+            if not linked:
+                messagebox.showerror("Link Error", "Both videos must have a frame loaded before linking.")
+        self._runInBackground(self._model.linkVideos, done)
+
+    def autoLink(self) -> None:
+        """
+        Links the side and front videos using an offset estimated from the motion in each video.
+        """
+        def done(offset):
+            if offset is None:
+                messagebox.showerror("Link Error", "Both videos must have a frame loaded before linking.")
+            else:
+                messagebox.showinfo("Videos Linked", f"Side video offset by {offset:.1f} ms.")
+
+        self._runInBackground(self._model.autoLink, done, lambda e: messagebox.showerror("Link Error", str(e)))
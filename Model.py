@@ -1,33 +1,74 @@
+import sys
 import cv2 as cv
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy.optimize import curve_fit
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict, replace
 from library import *
+from motion import *
+from decoders import openCapture
+from fitting import *
+from reconstruction import *
+from autotune import tuneParameters
 
 class Video:
     """
     A class to handle video processing and ball tracking.
     """
-    def __init__(self, filePath: str, ballColour: tuple[int]) -> None:
+    def __init__(self, filePath: str, ballColour: tuple[int], backend: Backend = Backend.OPENCV, scale: float = 1.0, grayscale: bool = False, trackingOnly: bool = False, opener=None) -> None:
         """
         Initializes the Video object with the given parameters.
 
         parameters:
             filePath (str): Path to the video file.
             ballColour (tuple[int]): RGB color of the ball to track.
-            width (int): Width to resize the video frames.
-            height (int): Height to resize the video frames.
-            fps (int): Frames per second of the video.
+            backend (Backend): The library used to decode the video.
+            scale (float): Factor by which to shrink frames as they are decoded. Tracking parameters stay
+                in pixels of the full size video and are scaled to match.
+            grayscale (bool): Whether to decode frames to a single grayscale channel.
+            trackingOnly (bool): Whether to keep only the single channel crop region tracking needs of
+                every frame but the current one, rather than whole frames.
+            opener: A function returning a new capture of the video from its first frame, used instead of
+                opening the file, such as for a clip kept from a live stream.
         """
-        self._video = cv.VideoCapture(filePath)
+        self._filePath = filePath
+        self._decodeOptions = (backend, scale, grayscale)
+        self._opener = opener
+        self._video = self._openCapture()
         self._ballColour = ballColour
         self._curFrame = None
         self._firstValidFrame = None
+        self._curIndex = None
         self._frames = []
+        self._skipped = set()
+        self._timestamps = []
         self._points = []
+        # Indices of the frames and tracking planes held in memory, oldest first, and the bytes they use
+        self._keptFrames = {}
+        self._planes = {}
+        self._frameBytes = 0
+        self._planeBytes = 0
+        self._memoryLimit = None
+        self._trackingOnly = trackingOnly
+        # Reused for tracking planes which are not kept, so extracting them does not allocate per frame
+        self._planeBuffer = None
+        # Candidate circles detected in each tracked frame, and the state of the cheapest tracks through them
+        self._candidates = {}
+        self._trackCosts = None
+        self._trackFrames = []
+        self._trackPrevious = []
+        # Whether the track has been extended since the points were last read back from it
+        self._trackChanged = False
         self._cropRegion = ((0, 0), self.getDimensions())
         self._params = defaultParameters()
+        self._motionScan = None
+        self._refine = False
+        self._progressCallback = None
+
+    def getFilePath(self) -> str:
+        """
+        Returns the path of the video file.
+        """
+        return self._filePath
 
     def getDimensions(self) -> tuple[int, int]:
         """
@@ -40,14 +81,63 @@ class Video:
         height = int(self._video.get(cv.CAP_PROP_FRAME_HEIGHT))
         return (width, height)
 
-    def getFPS(self) -> int:
+    def getFPS(self) -> float:
+        """
+        Returns the nominal frames per second of the video as reported by the container.
+
+        returns:
+            float: Frames per second of the video.
+        """
+        return float(self._video.get(cv.CAP_PROP_FPS))
+
+    def getFrameInterval(self) -> float:
+        """
+        Returns the estimated time between consecutive frames, taken from the most recent presentation
+        timestamps where available so that variable frame rate footage is handled.
+
+        returns:
+            float: Time between frames in milliseconds.
+        """
+        if len(self._timestamps) >= 2:
+            return float(np.median(np.diff(self._timestamps[-FRAME_INTERVAL_WINDOW:])))
+        fps = self.getFPS()
+        return 1000 / fps if fps > 0 else DEFAULT_FRAME_INTERVAL
+
+    def getTimestamp(self, frame: int = None) -> float | None:
+        """
+        Returns the presentation timestamp of a decoded frame.
+
+        parameters:
+            frame (int): Index of the frame, defaults to the current frame.
+        returns:
+            float | None: Timestamp in milliseconds, or None if no frames have been decoded.
+        """
+        if frame is None:
+            frame = self._curIndex
+        if frame is None:
+            return None
+        return self._timestamps[frame]
+
+    def getFrameCount(self) -> int:
+        """
+        Returns the number of frames read from the video so far, whether decoded or skipped.
+        """
+        return len(self._timestamps)
+
+    def getTimestamps(self) -> list[float]:
+        """
+        Returns a copy of the presentation timestamps of all decoded frames in milliseconds.
+        """
+        return self._timestamps.copy()
+
+    def getPointTimes(self) -> np.ndarray:
         """
-        Returns the frames per second of the video.
+        Returns the presentation timestamps of the frames each tracked point was found in.
 
         returns:
-            int: Frames per second of the video.
+            np.ndarray: Timestamps in milliseconds, aligned with the points list.
         """
-        return int(self._video.get(cv.CAP_PROP_FPS))
+        return np.array([self._timestamps[point[3]] for point in self._trackedPoints()], dtype=np.float64)
     
     def markFirstFrame(self) -> bool:
         """
@@ -58,6 +148,12 @@ class Video:
         self._firstValidFrame = len(self._frames) - 1
         return True
 
+    def getFrameIndex(self) -> int | None:
+        """
+        Returns the index of the current frame, or None if no frames have been decoded.
+        """
+        return self._curIndex
+
     def getCurrentFrame(self):
         """
         Returns a copy of the current frame being processed.
@@ -71,8 +167,43 @@ class Video:
         """
         Returns a copy of the list of tracked ball positions.
         """
-        return self._points.copy()
+        return self._trackedPoints().copy()
+
+    def _trackedPoints(self) -> list[tuple]:
+        """
+        Returns the tracked ball positions, reading them back from the track only if it has been extended
+        since they were last read, so that tracking a batch of frames backtracks once rather than per frame.
+        """
+        if self._trackChanged:
+            self._points = self._backtrackPoints()
+            self._trackChanged = False
+        return self._points
     
+    def restoreTracking(self, points: list[tuple], times: list[float]) -> None:
+        """
+        Replaces the tracked ball positions with previously exported ones, without decoding any frames.
+
+        parameters:
+            points (list[tuple]): The tracked (x, y, radius, frame) positions.
+            times (list[float]): Timestamp in milliseconds of the frame of each point.
+        """
+        frameCount = max([int(point[3]) for point in points], default=-1) + 1
+        self._timestamps = [np.nan] * frameCount
+        self._frames = [None] * frameCount
+        self._releaseFrames()
+        self._skipped = set()
+        for point, time in zip(points, times):
+            self._timestamps[int(point[3])] = float(time)
+        self._candidates = {int(point[3]): np.array([point[:3]], dtype=np.float64) for point in points}
+        self._resolveTrack()
+        self._firstValidFrame = int(points[0][3]) if len(points) > 0 else None
+
+    def getParameters(self) -> Parameters:
+        """
+        Returns the current ball tracking parameters.
+        """
+        return self._params
+
     def getCropRegion(self) -> tuple[tuple[int, int], tuple[int, int]]:
         """
         Returns the current crop region for the video frames.
@@ -91,6 +222,8 @@ class Video:
             bottomRight (tuple[int, int]): Bottom-right coordinates of the crop region.
         """
         self._cropRegion = (topLeft, bottomRight)
+        self._motionScan = None
+        self._releasePlanes()
         self._recalculatePoints()
 
     def incrementFrame(self) -> bool:
@@ -106,75 +239,632 @@ class Video:
             return False
         
         self._curFrame = frame
-        self._frames.append(frame)
+        self._frames.append(None)
+        self._keepFrame(len(self._frames) - 1, frame)
+        self._timestamps.append(self._readTimestamp(self._video, self._timestamps[-1] if self._timestamps else None))
+        self._curIndex = len(self._frames) - 1
         if self._firstValidFrame is not None and len(self._frames) - 1 >= self._firstValidFrame:
             self._trackBallInCurrentFrame()
+        self._trimFrames()
         return True
-    
+
+    def _readTimestamp(self, capture, previous: float | None) -> float:
+        """
+        Returns the presentation timestamp of the frame that was just read from a capture. Backends which
+        do not report timing (or report it out of order) fall back to the nominal frame rate.
+
+        parameters:
+            capture: The capture the frame was read from.
+            previous (float | None): Timestamp of the previously read frame, if any.
+        """
+        timestamp = capture.get(cv.CAP_PROP_POS_MSEC)
+        if previous is not None and timestamp <= previous:
+            fps = self.getFPS()
+            timestamp = previous + (1000 / fps if fps > 0 else DEFAULT_FRAME_INTERVAL)
+        return timestamp
+
+    def _openCapture(self):
+        """
+        Opens an independent capture of the video file, leaving the playback position untouched.
+        """
+        if self._opener is not None:
+            return self._opener()
+        return openCapture(self._filePath, *self._decodeOptions)
+
+    def scanMotion(self, scale: float = MOTION_SCAN_SCALE, step: int = 1) -> MotionScan:
+        """
+        Measures the motion energy within the crop region of the video by differencing downsampled
+        frames. Only every step-th frame is decoded, the rest are grabbed and discarded. The scan is
+        cached until the crop region changes.
+
+        parameters:
+            scale (float): Factor by which frames are shrunk before differencing.
+            step (int): Number of frames between measurements.
+        returns:
+            MotionScan: Frame indices, timestamps in milliseconds and motion energy of the sampled frames after the first.
+        """
+        if self._motionScan is not None and self._motionScan[0] == (scale, step):
+            return self._motionScan[1]
+
+        capture, shrunk = self._openScanCapture(scale)
+        (left, top), (right, bottom) = self._cropRegion
+        region = ((int(left * shrunk), int(top * shrunk)), (max(int(right * shrunk), int(left * shrunk) + 1), max(int(bottom * shrunk), int(top * shrunk) + 1)))
+        frames, times, energy = [], [], []
+        previous = None
+        timestamp = None
+        buffer = None
+        index = 0
+        while True:
+            if index % step == 0:
+                ret, frame = capture.read(buffer)
+                buffer = frame
+            else:
+                ret, frame = capture.grab(), None
+            if not ret:
+                break
+            timestamp = self._readTimestamp(capture, timestamp)
+
+            if frame is not None:
+                current = downsample(frame, region, scale / shrunk)
+                # The first frame has nothing to be compared with, and a made up zero would be correlated
+                if previous is not None:
+                    frames.append(index)
+                    times.append(timestamp)
+                    energy.append(motionEnergy(previous, current))
+                previous = current
+            index += 1
+
+        scan = MotionScan(np.array(frames), np.array(times), np.array(energy))
+        self._motionScan = ((scale, step), scan)
+        return scan
+
+    def findDeliveryWindows(self, step: int = None) -> list[tuple[int, int]]:
+        """
+        Pre-scans the video at low resolution for stretches of motion which may contain a delivery.
+
+        parameters:
+            step (int): Number of frames between motion measurements, defaults to the number of frames
+                in MOTION_SCAN_INTERVAL so that most frames are grabbed without being decoded.
+        returns:
+            list[tuple[int, int]]: First and last frame index of each candidate delivery window.
+        """
+        if step is None:
+            step = max(1, int(round(MOTION_SCAN_INTERVAL / self.getFrameInterval())))
+        return findDeliveryWindows(self.scanMotion(step=step))
+
+    def _openScanCapture(self, scale: float):
+        """
+        Opens an independent capture for a motion scan which decodes frames already shrunk by the given
+        factor and in grayscale, where the video is read from a file.
+
+        returns:
+            tuple: The capture, and the factor by which it shrinks frames compared to the displayed frames.
+        """
+        if self._opener is not None:
+            return self._opener(), 1.0
+        backend, decodeScale, _ = self._decodeOptions
+        return openCapture(self._filePath, backend, decodeScale * scale, True), scale
+
+    def isTracking(self) -> bool:
+        """
+        Returns whether ball tracking has been started on this video.
+        """
+        return self._firstValidFrame is not None
+
+    def skipFrame(self) -> bool:
+        """
+        Advances past the next frame without decoding or storing it. The frame keeps its index and
+        timestamp so that later frames are numbered by their position in the video.
+
+        returns:
+            bool: True if successful, false otherwise.
+        """
+        if not self._video.grab():
+            return False
+        self._skipped.add(len(self._frames))
+        self._frames.append(None)
+        self._timestamps.append(self._readTimestamp(self._video, self._timestamps[-1] if self._timestamps else None))
+        return True
+
+    def skipToFrame(self, frame: int) -> bool:
+        """
+        Skips forward to the given frame without decoding the frames in between, then decodes it.
+
+        parameters:
+            frame (int): Index of the frame to display next.
+        returns:
+            bool: True if successful, false otherwise.
+        """
+        while len(self._frames) < frame:
+            if not self.skipFrame():
+                return False
+        return self.incrementFrame()
+
     def _trackBallInCurrentFrame(self) -> None:
         """
-        Tracks the ball in the current frame and updates the points list.
-        Requires that at least one frame has been processed.
+        Detects the candidate balls in the current frame and extends the track through them. The points
+        list is brought up to date when it is next read. Requires that at least one frame has been processed.
         """
-        prevCircle = self._points[-1] if len(self._points) > 0 else None
-        if prevCircle:
-            prevCircle = (prevCircle[0] - self._cropRegion[0][0], prevCircle[1] - self._cropRegion[0][1], prevCircle[2], prevCircle[3])
+        if self._trackingOnly:
+            # The plane of the current frame is kept so the frame can be reduced to it once it is not displayed
+            plane = self._trackingPlane(self._curFrame)
+            self._keepPlane(self._curIndex, np.ascontiguousarray(plane))
+        else:
+            plane = self._scratchPlane(self._curFrame)
+        self._candidates[self._curIndex] = self._detectCandidates(plane)
+        self._extendTrack(self._curIndex)
+        self._trackChanged = True
 
+    def _detectCandidates(self, r: np.ndarray) -> np.ndarray:
+        """
+        Detects the circles in the tracking plane of a frame which may be the ball.
 
-        # Split the frame into its color channels and apply Gaussian blur
-        cropped = self._curFrame[self._cropRegion[0][1]:self._cropRegion[1][1], self._cropRegion[0][0]:self._cropRegion[1][0]]
-        b, g, r = cv.split(cropped)
-        blur = cv.GaussianBlur(r, (self._params.blurSqrSize, self._params.blurSqrSize), 0)
+        parameters:
+            r (np.ndarray): The red channel of the cropped frame, as returned by _trackingPlane.
+        returns:
+            np.ndarray: The (x, y, radius) of each candidate in video coordinates, strongest first.
+        """
+        # Apply Gaussian blur to the red channel of the cropped frame
+        params = self._scaledParameters()
+        blur = cv.GaussianBlur(r, (params.blurSqrSize, params.blurSqrSize), 0)
 
         # Detect circles in the blurred image using HoughCircles
         circles = cv.HoughCircles(blur, cv.HOUGH_GRADIENT, 
-            self._params.dp, 
-            self._params.minDist, 
-            param1=self._params.param1, 
-            param2=self._params.param2, 
-            minRadius=self._params.minRadius, 
-            maxRadius=self._params.maxRadius
+            params.dp, 
+            params.minDist, 
+            param1=params.param1, 
+            param2=params.param2, 
+            minRadius=params.minRadius, 
+            maxRadius=params.maxRadius
         )
-
         if circles is None:
-            return
-        
-        # Add the most likely circle to the points list based on distance to the previous circle
-        circles = np.uint32(np.around(circles))
-        chosen = None
-        for i in circles[0, :]:
-            if chosen is None: 
-                chosen = i
-            if prevCircle is not None:
-                if dist(chosen[0], chosen[1], prevCircle[0], prevCircle[1]) <= dist(i[0], i[1], prevCircle[0], prevCircle[1]):
-                    chosen = i
-        
+            return np.empty((0, 3), dtype=np.float64)
+
+        circles = circles[0, :TRACKING_MAX_CANDIDATES].astype(np.float64)
+        if self._refine:
+            circles[:, :2] = [self._refineCentre(r, circle) for circle in circles]
+        else:
+            circles = np.around(circles)
         # Account for the fact that only a cropped image is used in the algorithm
-        adjustedX = chosen[0] + self._cropRegion[0][0]
-        adjustedY = chosen[1] + self._cropRegion[0][1]
-        chosen = (adjustedX, adjustedY, chosen[2], len(self._points))
-        self._points.append(chosen)
+        circles[:, :2] += self._cropRegion[0]
+        return circles
+
+    def _extendTrack(self, index: int) -> None:
+        """
+        Extends the cheapest tracks ending at each candidate by the candidates of a later frame, keeping
+        which earlier candidate each new one is best reached from so the track can be decided later.
+
+        parameters:
+            index (int): Index of the frame, after every frame the track has been extended by.
+        """
+        candidates = self._candidates[index]
+        if len(candidates) == 0:
+            return
+        costs = np.arange(len(candidates)) * TRACKING_RANK_COST
+        if self._trackCosts is None:
+            previous = np.zeros(len(candidates), dtype=np.int64)
+        else:
+            lastIndex = self._trackFrames[-1]
+            total = self._trackCosts[:, None] + self._transitionCosts(self._candidates[lastIndex], candidates, index - lastIndex)
+            previous = np.argmin(total, axis=0)
+            costs += total[previous, np.arange(len(candidates))]
+        self._trackFrames.append(index)
+        self._trackPrevious.append(previous)
+        self._trackCosts = costs
+
+    def _transitionCosts(self, previous: np.ndarray, current: np.ndarray, gap: int) -> np.ndarray:
+        """
+        Returns the cost of the ball moving from each candidate of one frame to each candidate of a later
+        frame, growing with the distance moved per frame and the change in size, and penalising steps
+        longer than the largest expected step or too short for a ball in flight.
+
+        parameters:
+            previous (np.ndarray): Candidates of the earlier frame.
+            current (np.ndarray): Candidates of the later frame.
+            gap (int): Number of frames between the two frames.
+        returns:
+            np.ndarray: The cost of each pair, indexed by previous then current candidate.
+        """
+        steps = np.hypot(current[None, :, 0] - previous[:, None, 0], current[None, :, 1] - previous[:, None, 1]) / gap
+        radii = np.maximum(np.maximum(current[None, :, 2], previous[:, None, 2]), 1)
+        resizing = np.abs(current[None, :, 2] - previous[:, None, 2]) / radii
+        maxStep = max(self._scaledParameters().maxStep, 1)
+        penalties = np.where(steps > maxStep, TRACKING_GATE_COST, 0) + np.where(steps < TRACKING_MIN_STEP, TRACKING_STILL_COST, 0)
+        return steps / maxStep + TRACKING_RADIUS_COST * resizing + penalties
+
+    def _backtrackPoints(self) -> list[tuple]:
+        """
+        Returns the tracked ball positions along the cheapest track through the candidates of every frame.
+        """
+        if self._trackCosts is None:
+            return []
+        points = []
+        choice = int(np.argmin(self._trackCosts))
+        for index, previous in zip(reversed(self._trackFrames), reversed(self._trackPrevious)):
+            x, y, radius = self._candidates[index][choice]
+            points.append((float(x), float(y), float(radius), index))
+            choice = int(previous[choice])
+        points.reverse()
+        return points
+
+    def _resolveTrack(self) -> None:
+        """
+        Finds the cheapest track through the detected candidates again without detecting them again, such
+        as after the largest expected step changes.
+        """
+        self._trackCosts = None
+        self._trackFrames = []
+        self._trackPrevious = []
+        for index in sorted(self._candidates):
+            self._extendTrack(index)
+        self._points = self._backtrackPoints()
+        self._trackChanged = False
         
+    def _trackingPlane(self, frame: np.ndarray, buffer: np.ndarray = None) -> np.ndarray:
+        """
+        Returns the single channel image of the crop region of a frame which circles are detected in. Only
+        the red channel is copied out of colour frames, into the given buffer when it has the right shape.
+        """
+        cropped = frame[self._cropRegion[0][1]:self._cropRegion[1][1], self._cropRegion[0][0]:self._cropRegion[1][0]]
+        return cropped if cropped.ndim == 2 else cv.extractChannel(cropped, 2, buffer)
+
+    def _scratchPlane(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Returns the tracking plane of a frame in a buffer which is reused by the next call, for planes
+        which are only needed until their candidates have been detected.
+        """
+        plane = self._trackingPlane(frame, self._planeBuffer)
+        if frame.ndim == 3:
+            self._planeBuffer = plane
+        return plane
+
+    def autoTune(self, clicks: list[tuple[int, float, float]]) -> tuple[Parameters, int]:
+        """
+        Finds the tracking parameters which best detect the ball where it was clicked in a few frames,
+        then retracks the video with them.
+
+        parameters:
+            clicks (list[tuple[int, float, float]]): The frame index and (x, y) position of the ball in each clicked frame.
+        returns:
+            tuple[Parameters, int]: The parameters chosen and the number of clicked frames they track correctly.
+        """
+        planes, targets = [], []
+        for frame, x, y in clicks:
+            image = self._getFrame(frame) if frame is not None and 0 <= frame < len(self._frames) else None
+            if image is None:
+                raise ValueError("The ball can only be clicked in frames that have been decoded.")
+            planes.append(self._trackingPlane(image))
+            targets.append((x - self._cropRegion[0][0], y - self._cropRegion[0][1]))
+        scale = self._decodeOptions[1]
+        parameters, hits = tuneParameters(planes, targets, scaleParameters(self._params, scale))
+        # The search ran on decoded frames, so its sizes are converted back to pixels of the full size video
+        parameters = scaleParameters(parameters, 1 / scale)
+        self.updateParameters(parameters)
+        return (parameters, hits)
+
+    def _refineCentre(self, plane: np.ndarray, circle: tuple[float]) -> tuple[float, float]:
+        """
+        Refines the centre of a detected circle to sub-pixel precision using the intensity-weighted
+        centroid of a small patch around it.
+
+        parameters:
+            plane (np.ndarray): The single channel image the circle was detected in.
+            circle (tuple[float]): The detected x, y and radius.
+        returns:
+            tuple[float, float]: The refined x and y coordinates.
+        """
+        x, y, radius = float(circle[0]), float(circle[1]), float(circle[2])
+        reach = radius * REFINE_REACH
+        left, top = max(0, int(x - reach)), max(0, int(y - reach))
+        right, bottom = min(plane.shape[1], int(np.ceil(x + reach)) + 1), min(plane.shape[0], int(np.ceil(y + reach)) + 1)
+        patch = plane[top:bottom, left:right].astype(np.float32)
+        if patch.size == 0:
+            return (x, y)
+
+        ys, xs = np.mgrid[top:bottom, left:right]
+        inside = (xs - x) ** 2 + (ys - y) ** 2 <= reach ** 2
+        # Weigh each pixel by how much brighter it is than the surroundings of the ball
+        background = np.median(patch[~inside]) if np.any(~inside) else patch.min()
+        weights = np.where(inside, np.clip(patch - background, 0, None), 0)
+        total = weights.sum()
+        if total <= 0:
+            return (x, y)
+        return (float((weights * xs).sum() / total), float((weights * ys).sum() / total))
+
+    def setRefinement(self, enabled: bool) -> None:
+        """
+        Sets whether tracked ball centres are refined to sub-pixel precision, and retracks the ball.
+
+        parameters:
+            enabled (bool): Whether to refine tracked ball centres.
+        """
+        self._refine = enabled
+        self._recalculatePoints()
+
+    def _scaledParameters(self) -> Parameters:
+        """
+        Returns the ball tracking parameters in pixels of the decoded frames.
+        """
+        return scaleParameters(self._params, self._decodeOptions[1])
+
     def updateParameters(self, params: Parameters) -> None:
         """
-        Updates the ball tracking parameters.
+        Updates the ball tracking parameters, given in pixels of the full size video.
+
+        Changing only the largest expected step keeps the detected candidates and only finds the track
+        through them again.
 
         parameters:
             params (Parameters): New ball tracking parameters.
         """
+        if replace(params, maxStep=self._params.maxStep) == self._params:
+            self._params = params
+            self._resolveTrack()
+            return
         self._params = params
-        self._points = []
         self._recalculatePoints()
     
+    def setProgressCallback(self, callback) -> None:
+        """
+        Sets a function to be called with (done, total) as frames are retracked.
+
+        parameters:
+            callback: The function to call, or None to stop reporting progress.
+        """
+        self._progressCallback = callback
+
     def _recalculatePoints(self) -> None:
         """
         Recalculates all tracked ball positions based on the current parameters.
         """
-        self._points = []
+        self._candidates = {}
         if self._firstValidFrame is not None:
-            for i in range(self._firstValidFrame, len(self._frames)):
-                self._curFrame = self._frames[i]
-                self._trackBallInCurrentFrame()
+            total = len(self._frames) - self._firstValidFrame
+            for i, plane in self._planesFrom(self._firstValidFrame):
+                if self._progressCallback is not None:
+                    self._progressCallback(i - self._firstValidFrame, total)
+                self._candidates[i] = self._detectCandidates(plane)
+        self._resolveTrack()
+
+    def _getFrame(self, index: int):
+        """
+        Returns a frame which has been read, decoding it again if it is not held in memory.
+
+        parameters:
+            index (int): Index of the frame.
+        returns:
+            The frame, or None if it was skipped without decoding or can no longer be decoded.
+        """
+        for _, frame in self._framesFrom(index, index + 1):
+            return frame
+        return None
+
+    def _planesFrom(self, start: int):
+        """
+        Yields the index and tracking plane of each decoded frame from the given frame onwards, using the
+        planes held in memory and decoding the frames of the rest again where they are not held.
+
+        parameters:
+            start (int): Index of the first frame.
+        """
+        index, stop = start, len(self._frames)
+        while index < stop:
+            if index in self._planes:
+                yield index, self._planes[index]
+                index += 1
+                continue
+            end = index + 1
+            while end < stop and end not in self._planes:
+                end += 1
+            for i, frame in self._framesFrom(index, end, keep=self._trackingOnly):
+                yield i, self._planes[i] if i in self._planes else self._scratchPlane(frame)
+            index = end
+
+    def _keepFrame(self, index: int, frame: np.ndarray) -> None:
+        """
+        Holds a decoded frame in memory, counting the bytes it uses.
+        """
+        if self._frames[index] is not None:
+            self._frameBytes -= self._frames[index].nbytes
+        self._frames[index] = frame
+        self._frameBytes += frame.nbytes
+        self._keptFrames.pop(index, None)
+        self._keptFrames[index] = None
+
+    def _releaseFrames(self) -> None:
+        """
+        Forgets the accounting of every frame and plane, after the frames list has been replaced.
+        """
+        self._keptFrames = {}
+        self._frameBytes = 0
+        self._releasePlanes()
+
+    def _releasePlanes(self) -> None:
+        """
+        Drops every tracking plane held in memory, such as when the crop region they were cut from changes.
+        """
+        self._planes = {}
+        self._planeBytes = 0
+
+    def setMemoryLimit(self, limit: int | None) -> None:
+        """
+        Sets the largest number of bytes the frames held in memory may use. Once it is reached the oldest
+        frames are reduced to the single channel crop region tracking needs, then dropped altogether,
+        and are decoded again if they are needed.
+
+        parameters:
+            limit (int | None): The limit in bytes, or None for no limit.
+        """
+        self._memoryLimit = limit
+        self._trimFrames()
+
+    def getMemoryLimit(self) -> int | None:
+        """
+        Returns the largest number of bytes the frames held in memory may use, or None if there is no limit.
+        """
+        return self._memoryLimit
+
+    def getMemoryUsage(self) -> MemoryUsage:
+        """
+        Returns how many bytes the video is using for frames, caches and tracking.
+        """
+        scan = self._motionScan[1] if self._motionScan is not None else None
+        caches = scan.frames.nbytes + scan.times.nbytes + scan.energy.nbytes if scan is not None else 0
+        tracking = sum(candidates.nbytes for candidates in self._candidates.values())
+        points = self._trackedPoints()
+        tracking += sys.getsizeof(points) + sum(sys.getsizeof(point) + 4 * POINT_FIELD_BYTES for point in points)
+        tracking += sys.getsizeof(self._timestamps) + len(self._timestamps) * POINT_FIELD_BYTES
+        return MemoryUsage(self._frameBytes, self._planeBytes, caches, tracking)
+
+    def _trimFrames(self) -> None:
+        """
+        Reduces the oldest frames held in memory to their tracking planes, then drops the oldest planes,
+        until the frames and planes fit within the memory limit. In tracking only mode every frame but the
+        current one is reduced whatever the limit. The current frame is always kept.
+        """
+        for index in list(self._keptFrames):
+            overLimit = self._memoryLimit is not None and self._frameBytes + self._planeBytes > self._memoryLimit
+            if not (overLimit or self._trackingOnly):
+                return
+            if index != self._curIndex:
+                self._reduceFrame(index)
+        for index in list(self._planes):
+            if self._memoryLimit is None or self._frameBytes + self._planeBytes <= self._memoryLimit:
+                return
+            self._planeBytes -= self._planes.pop(index).nbytes
+
+    def _reduceFrame(self, index: int) -> None:
+        """
+        Drops a frame held in memory, keeping its tracking plane instead if it is a tracked frame.
+        """
+        frame = self._frames[index]
+        self._frames[index] = None
+        self._frameBytes -= frame.nbytes
+        del self._keptFrames[index]
+        if self._firstValidFrame is not None and index >= self._firstValidFrame and index not in self._planes:
+            self._keepPlane(index, np.ascontiguousarray(self._trackingPlane(frame)))
+
+    def _keepPlane(self, index: int, plane: np.ndarray) -> None:
+        """
+        Holds the tracking plane of a frame in memory, counting the bytes it uses.
+        """
+        if index in self._planes:
+            self._planeBytes -= self._planes.pop(index).nbytes
+        self._planes[index] = plane
+        self._planeBytes += plane.nbytes
+
+    def readFrames(self, start: int, stop: int = None):
+        """
+        Yields the index and image of each decoded frame in a range of frames which have been read, without
+        keeping frames which had to be decoded again. The images of frames held in memory are yielded
+        as they are, so must be copied before being drawn on.
+
+        parameters:
+            start (int): Index of the first frame.
+            stop (int): Index after the last frame, defaults to the number of frames read.
+        """
+        return self._framesFrom(start, stop, keep=False)
+
+    def _framesFrom(self, start: int, stop: int = None, keep: bool = True):
+        """
+        Yields the index and image of each decoded frame in a range of frames which have been read. Frames
+        which are not held in memory are decoded again in order from a single independent capture, which
+        is seeked once rather than per frame.
+
+        parameters:
+            start (int): Index of the first frame.
+            stop (int): Index after the last frame, defaults to the number of frames read.
+            keep (bool): Whether frames which are decoded again are kept afterwards.
+        """
+        stop = len(self._frames) if stop is None else stop
+        capture, position = None, None
+        try:
+            for i in range(start, stop):
+                if i in self._skipped:
+                    continue
+                frame = self._frames[i]
+                if frame is None:
+                    if capture is None:
+                        capture = self._openCapture()
+                        if i > 0:
+                            capture.set(cv.CAP_PROP_POS_FRAMES, i)
+                        position = i
+                    while position < i:
+                        capture.grab()
+                        position += 1
+                    ret, frame = capture.read()
+                    position += 1
+                    if not ret:
+                        return
+                    if keep:
+                        self._keepFrame(i, frame)
+                        self._trimFrames()
+                yield i, frame
+        finally:
+            if capture is not None:
+                capture.release()
+
+    def getSession(self) -> dict:
+        """
+        Returns everything needed to resume working on the video without tracking it again, as plain
+        values which can be written to JSON.
+        """
+        return {
+            "filePath": self._filePath,
+            "backend": self._decodeOptions[0].value,
+            "scale": self._decodeOptions[1],
+            "grayscale": self._decodeOptions[2],
+            "trackingOnly": self._trackingOnly,
+            "ballColour": list(self._ballColour),
+            "cropRegion": [list(self._cropRegion[0]), list(self._cropRegion[1])],
+            "parameters": asdict(self._params),
+            "refine": self._refine,
+            "firstValidFrame": self._firstValidFrame,
+            "currentFrame": self._curIndex,
+            "timestamps": [float(timestamp) for timestamp in self._timestamps],
+            "skipped": sorted(self._skipped),
+            "points": [[float(point[0]), float(point[1]), float(point[2]), int(point[3])] for point in self._trackedPoints()],
+            "candidates": [[index, candidates.tolist()] for index, candidates in sorted(self._candidates.items())],
+        }
+
+    def restoreSession(self, session: dict) -> None:
+        """
+        Restores a state saved with getSession. The capture is seeked straight to the saved position and
+        only the current frame is decoded, so resuming takes the same time however far into the video
+        the session was saved. Other frames are decoded again only if they are needed.
+
+        parameters:
+            session (dict): The saved state of the video.
+        """
+        self._cropRegion = tuple(tuple(corner) for corner in session["cropRegion"])
+        self._params = Parameters(**session["parameters"])
+        self._refine = session["refine"]
+        self._firstValidFrame = session["firstValidFrame"]
+        self._timestamps = list(session["timestamps"])
+        self._frames = [None] * len(self._timestamps)
+        self._releaseFrames()
+        self._skipped = set(session["skipped"])
+        # Sessions saved before candidates were kept restore the tracked points as the only candidates
+        if "candidates" in session:
+            self._candidates = {index: np.array(candidates, dtype=np.float64).reshape(-1, 3) for index, candidates in session["candidates"]}
+        else:
+            self._candidates = {int(point[3]): np.array([point[:3]], dtype=np.float64) for point in session["points"]}
+        self._resolveTrack()
+        self._motionScan = None
+        self._curIndex = session["currentFrame"]
+        self._curFrame = None
+        if self._curIndex is None:
+            return
+
+        self._video.set(cv.CAP_PROP_POS_FRAMES, self._curIndex)
+        ret, frame = self._video.read()
+        if not ret:
+            raise ValueError(f"Could not decode frame {self._curIndex} of {self._filePath}.")
+        self._keepFrame(self._curIndex, frame)
+        self._skipped.discard(self._curIndex)
+        self._curFrame = frame
+        if self._curIndex + 1 != len(self._frames):
+            self._video.set(cv.CAP_PROP_POS_FRAMES, len(self._frames))
         
 class Model:
     """
@@ -192,30 +882,233 @@ class Model:
         self._sideVideo = sideVideo
         self._isLinked = False
         self._stumpPosition = None
-        self._framesSinceLink = {frontVideo: 0, sideVideo: 0}
+        self._linkTimes = {}
+        self._prediction = None
+        self._plots = []
+        self._fitMode = FitMode.STANDARD
+        # Views whose markings have changed since they were last rendered, and the frame each last showed
+        self._dirty = set(View)
+        self._renderedFrames = {}
+        self._projections = {}
+
+    def setFitMode(self, mode: FitMode) -> None:
+        """
+        Sets how trajectories are fitted when making a prediction.
+
+        parameters:
+            mode (FitMode): Ordinary least squares, or a robust fit which discards outlying detections.
+        """
+        self._fitMode = mode
+
+    def getVideo(self, view: View) -> Video:
+        """
+        Returns the video object for the specified view (FRONT or SIDE).
+        """
+        return self._sideVideo if view == View.SIDE else self._frontVideo
+
+    def getStumpPosition(self) -> int | None:
+        """
+        Returns the stump position from the view of the side video, or None if it has not been set.
+        """
+        return self._stumpPosition
+
+    def getLinkTime(self, view: View) -> float:
+        """
+        Returns the timestamp in milliseconds of the specified view which corresponds to the moment of linking.
+        """
+        return self._linkTimes[self.getVideo(view)]
+
+    def restore(self, stumpPosition: int, prediction: Prediction = None) -> None:
+        """
+        Restores a previously analysed delivery whose points were restored with link-relative timestamps,
+        without reprocessing either video.
+
+        parameters:
+            stumpPosition (int): The stump position from the view of the side video.
+            prediction (Prediction): The prediction made for the delivery, if any.
+        """
+        self._stumpPosition = stumpPosition
+        self._linkTimes = {self._frontVideo: 0, self._sideVideo: 0}
+        self._isLinked = True
+        self._prediction = prediction
+        self.invalidate(*View)
     
+    def getSession(self) -> dict:
+        """
+        Returns the state of the model and both videos as plain values which can be written to JSON.
+        """
+        return {
+            "front": self._frontVideo.getSession(),
+            "side": self._sideVideo.getSession(),
+            "linked": self._isLinked,
+            "linkTimes": [self._linkTimes.get(self._frontVideo), self._linkTimes.get(self._sideVideo)],
+            "stumpPosition": self._stumpPosition,
+            "fitMode": self._fitMode.name,
+            "projections": {view.name: projection.tolist() for view, projection in self._projections.items()},
+            "prediction": asdict(self._prediction) if self._prediction is not None else None,
+        }
+
+    def restoreSession(self, session: dict) -> None:
+        """
+        Restores a state saved with getSession, including the state of both videos.
+
+        parameters:
+            session (dict): The saved state of the model.
+        """
+        self._frontVideo.restoreSession(session["front"])
+        self._sideVideo.restoreSession(session["side"])
+        self._isLinked = session["linked"]
+        self._linkTimes = {}
+        if self._isLinked:
+            self._linkTimes = {self._frontVideo: session["linkTimes"][0], self._sideVideo: session["linkTimes"][1]}
+        self._stumpPosition = session["stumpPosition"]
+        self._fitMode = FitMode[session["fitMode"]]
+        self._projections = {View[name]: np.array(projection) for name, projection in session["projections"].items()}
+        prediction = session["prediction"]
+        if prediction is not None:
+            for name in ("progressCoefficients", "lineCoefficients", "heightCoefficients", "lineInterval", "heightInterval"):
+                if prediction[name] is not None:
+                    prediction[name] = tuple(prediction[name])
+            prediction = Prediction(**prediction)
+        self._prediction = prediction
+        self.invalidate(*View)
+
+    def setProgressCallback(self, callback) -> None:
+        """
+        Sets a function to be called with (done, total) as either video retracks its frames.
+
+        parameters:
+            callback: The function to call, or None to stop reporting progress.
+        """
+        self._frontVideo.setProgressCallback(callback)
+        self._sideVideo.setProgressCallback(callback)
+
+    def setMemoryLimit(self, limit: int | None) -> None:
+        """
+        Sets the largest number of bytes the frames of both videos held in memory may use together,
+        shared between the videos in proportion to the size of their frames.
+
+        parameters:
+            limit (int | None): The limit in bytes, or None for no limit.
+        """
+        areas = {video: np.prod(video.getDimensions()) for video in (self._frontVideo, self._sideVideo)}
+        total = max(sum(areas.values()), 1)
+        for video, area in areas.items():
+            video.setMemoryLimit(None if limit is None else int(limit * area / total))
+
+    def getMemoryUsage(self) -> dict[View, MemoryUsage]:
+        """
+        Returns how many bytes each video is using for frames, caches and tracking.
+        """
+        return {view: self.getVideo(view).getMemoryUsage() for view in View}
+
     def setStumpPosition(self, position: int) -> None: 
         """
         Sets the stump position from the view of the side video.
 
         parameters:
-            position (int): The stump position.
+            position (int): The stump position, in pixels of the side video as it is decoded and displayed,
+                like the tracked points it is compared with.
         """
         self._stumpPosition = position
+        self.invalidate(View.SIDE)
 
-    def linkVideos(self) -> bool:
+    def linkVideos(self, offset: float = None) -> bool:
         """
         Links the front and side video views for synchronized ball tracking.
 
+        Without an offset the currently displayed frames are taken to show the same instant. From then on
+        the videos are paired by their presentation timestamps rather than by frame counts.
+
+        parameters:
+            offset (float): Milliseconds to add to a front timestamp to get the side timestamp of the same
+                instant. If given, the videos are stepped forward until they are aligned.
         returns:
             bool: True if linking was successful, false otherwise.
         """
+        if self._frontVideo.getTimestamp() is None or self._sideVideo.getTimestamp() is None:
+            return False
+        if offset is None:
+            self._linkTimes = {
+                self._frontVideo: self._frontVideo.getTimestamp(),
+                self._sideVideo: self._sideVideo.getTimestamp(),
+            }
+        else:
+            self._linkTimes = {self._frontVideo: 0, self._sideVideo: offset}
+            if self._linkedTime(self._frontVideo) < self._linkedTime(self._sideVideo):
+                self._alignVideo(self._frontVideo, self._linkedTime(self._sideVideo))
+            else:
+                self._alignVideo(self._sideVideo, self._linkedTime(self._frontVideo))
         self._isLinked = True
+        return True
+
+    def estimateSyncOffset(self) -> float:
+        """
+        Estimates the offset between the front and side videos by cross-correlating the motion within
+        their crop regions.
+
+        returns:
+            float: Milliseconds to add to a front timestamp to get the side timestamp of the same instant.
+        """
+        front = self._frontVideo.scanMotion()
+        side = self._sideVideo.scanMotion()
+        return estimateOffset(front.times, front.energy, side.times, side.energy)
+
+    def autoLink(self) -> float | None:
+        """
+        Links the videos using an automatically estimated offset instead of manual alignment.
+
+        returns:
+            float | None: The offset used in milliseconds, or None if linking failed.
+        """
+        offset = self.estimateSyncOffset()
+        if not self.linkVideos(offset):
+            return None
+        return offset
+
+    def _linkedTime(self, video: Video, frame: int = None) -> float:
+        """
+        Returns the time of a frame of the given video relative to the moment the videos were linked.
+
+        parameters:
+            video (Video): The video the frame belongs to.
+            frame (int): Index of the frame, defaults to the current frame.
+        returns:
+            float: Time since linking in milliseconds.
+        """
+        return video.getTimestamp(frame) - self._linkTimes[video]
+
+    def getPairedFrame(self, view: View, frame: int) -> int:
+        """
+        Returns the index of the frame in the other view which is closest in time to the given frame,
+        interpolating between the decoded timestamps of the other view.
+
+        parameters:
+            view (View): The view the given frame belongs to (FRONT or SIDE).
+            frame (int): Index of the frame in that view.
+        returns:
+            int: Index of the paired frame in the other view.
+        """
+        if not self._isLinked:
+            raise ValueError("Must link videos before pairing frames.")
+        source, target = self._frontVideo, self._sideVideo
+        if view == View.SIDE:
+            source, target = target, source
+
+        # Frames restored without a timestamp are skipped, and without any the frames are paired by index
+        targetTimes = np.asarray(target.getTimestamps(), dtype=np.float64) - self._linkTimes[target]
+        known = np.flatnonzero(np.isfinite(targetTimes))
+        sourceTime = self._linkedTime(source, frame)
+        if len(known) == 0 or not np.isfinite(sourceTime):
+            return int(np.clip(frame, 0, max(len(targetTimes) - 1, 0)))
+        position = np.interp(sourceTime, targetTimes[known], known)
+        return int(round(position))
     
     def startTracking(self, view: View) -> bool:
         """
         Starts the ball tracking process for both video views.
         """
+        self.invalidate(*View)
         if self._isLinked:
             return self._frontVideo.markFirstFrame() and self._sideVideo.markFirstFrame()
         elif view == View.FRONT:
@@ -224,26 +1117,38 @@ class Model:
             return self._sideVideo.markFirstFrame()
         return False
     
-    def render(self) -> dict[View, Render]:
+    def render(self, changedOnly: bool = False) -> dict[View, Render]:
         """
         Renders the current frames and ball tracking points from both video views.
 
+        parameters:
+            changedOnly (bool): Only render views which changed since they were last rendered, leaving
+                out the frame of a view whose markings changed but whose frame did not.
         returns:
-            Render: A Render object containing the current frames and ball tracking points.
+            dict[View, Render]: A Render object for each rendered view, containing its current frame and ball tracking points.
         """
-        frontRender = Render(
-            frame=self._frontVideo.getCurrentFrame(),
-            circles=self._frontVideo.getPoints(),
-            cropRegion=self._frontVideo.getCropRegion(),
-            verticalLines=[],
-        )
-        sideRender = Render(
-            frame=self._sideVideo.getCurrentFrame(),
-            circles=self._sideVideo.getPoints(),
-            cropRegion=self._sideVideo.getCropRegion(),
-            verticalLines=[self._stumpPosition] if self._stumpPosition is not None else [],
-        )
-        return {View.FRONT: frontRender, View.SIDE: sideRender}
+        renders = {}
+        for view in View:
+            video = self.getVideo(view)
+            frameChanged = self._renderedFrames.get(view) != video.getFrameIndex()
+            if changedOnly and not frameChanged and view not in self._dirty:
+                continue
+            renders[view] = Render(
+                frame=video.getCurrentFrame() if frameChanged or not changedOnly else None,
+                circles=video.getPoints(),
+                cropRegion=video.getCropRegion(),
+                verticalLines=[self._stumpPosition] if view == View.SIDE and self._stumpPosition is not None else [],
+            )
+            self._renderedFrames[view] = video.getFrameIndex()
+            self._dirty.discard(view)
+        return renders
+
+    def invalidate(self, *views: View) -> None:
+        """
+        Marks the markings of the given views as needing to be rendered again, such as after drawing a
+        prediction over them.
+        """
+        self._dirty.update(views)
 
     def incrementFrame(self, view: View) -> bool:
         """
@@ -256,24 +1161,80 @@ class Model:
             bool: True if successful, false otherwise.
         """
         if self._isLinked:
-            FPSRatio = self._frontVideo.getFPS() / self._sideVideo.getFPS()
             fast, slow = self._frontVideo, self._sideVideo
-            if FPSRatio < 1:
-                fast, slow = self._sideVideo, self._frontVideo
-                FPSRatio = 1 / FPSRatio
-            
-            fast.incrementFrame()
-            self._framesSinceLink[fast] += 1
-            if self._framesSinceLink[fast] >= FPSRatio * self._framesSinceLink[slow]:
-                slow.incrementFrame()
-                self._framesSinceLink[slow] += 1
+            if fast.getFrameInterval() > slow.getFrameInterval():
+                fast, slow = slow, fast
+
+            if not fast.incrementFrame():
+                return False
+            self._alignVideo(slow, self._linkedTime(fast))
             return True
         elif view == View.FRONT:
             return self._frontVideo.incrementFrame()
         elif view == View.SIDE:
             return self._sideVideo.incrementFrame()
         return False
-    
+
+    def advanceTo(self, view: View, timestamp: float) -> bool:
+        """
+        Advances the specified video one frame at a time until its current frame reaches the given time,
+        so that every frame on the way is tracked. Linked videos stay aligned as in incrementFrame.
+
+        parameters:
+            view (View): The video view to advance (FRONT or SIDE).
+            timestamp (float): Presentation timestamp to advance to in milliseconds.
+        returns:
+            bool: True if the time was reached, False if the video ended first.
+        """
+        video = self.getVideo(view)
+        while video.getTimestamp() is None or video.getTimestamp() + video.getFrameInterval() / 2 < timestamp:
+            if not self.incrementFrame(view):
+                return False
+        return True
+
+    def _alignVideo(self, video: Video, target: float) -> None:
+        """
+        Advances a linked video until its current frame is the one closest in time to the target, so that
+        slower streams skip ahead instead of being stepped in lockstep.
+
+        parameters:
+            video (Video): The video to advance.
+            target (float): The time since linking to align to in milliseconds.
+        """
+        # Frames which will not be displayed or tracked are skipped without decoding
+        if not video.isTracking():
+            while self._linkedTime(video, video.getFrameCount() - 1) + video.getFrameInterval() * 3 / 2 < target:
+                if not video.skipFrame():
+                    return
+        while self._linkedTime(video) + video.getFrameInterval() / 2 < target:
+            if not video.incrementFrame():
+                return
+
+    def skipToDelivery(self, view: View) -> bool:
+        """
+        Skips the specified video to the start of the next stretch of motion after the current frame,
+        without decoding the idle frames in between. Linked videos are skipped together.
+
+        parameters:
+            view (View): The video view to skip (FRONT or SIDE).
+        returns:
+            bool: True if a delivery was found and skipped to, false otherwise.
+        """
+        video = self._sideVideo if view == View.SIDE else self._frontVideo
+        current = video.getFrameCount() - 1
+        for start, _ in video.findDeliveryWindows():
+            if start > current:
+                break
+        else:
+            return False
+
+        if not video.skipToFrame(start):
+            return False
+        if self._isLinked:
+            other = self._frontVideo if video is self._sideVideo else self._sideVideo
+            self._alignVideo(other, self._linkedTime(video))
+        return True
+
     def cropRegion(self, view: View, topLeft: tuple[int, int], bottomRight: tuple[int, int]) -> None:
         """
         Sets the crop region for the specified video view.
@@ -283,6 +1244,7 @@ class Model:
             topLeft (tuple[int, int]): Top-left coordinates of the crop region.
             bottomRight (tuple[int, int]): Bottom-right coordinates of the crop region.
         """
+        self.invalidate(view)
         if view == View.FRONT:
             self._frontVideo.cropToRegion(topLeft, bottomRight)
         elif view == View.SIDE:
@@ -296,11 +1258,36 @@ class Model:
             view (View): The video view to update (FRONT or SIDE).
             params (Parameters): New ball tracking parameters.
         """
+        self.invalidate(view)
         if view == View.FRONT:
             self._frontVideo.updateParameters(params)
         elif view == View.SIDE:
             self._sideVideo.updateParameters(params)
     
+    def autoTune(self, view: View, clicks: list[tuple[int, float, float]]) -> tuple[Parameters, int]:
+        """
+        Chooses the ball tracking parameters of the specified video view from clicked ball positions.
+
+        parameters:
+            view (View): The video view to tune (FRONT or SIDE).
+            clicks (list[tuple[int, float, float]]): The frame index and (x, y) position of the ball in each clicked frame.
+        returns:
+            tuple[Parameters, int]: The parameters chosen and the number of clicked frames they track correctly.
+        """
+        self.invalidate(view)
+        return self.getVideo(view).autoTune(clicks)
+
+    def setRefinement(self, view: View, enabled: bool) -> None:
+        """
+        Sets whether tracked ball centres are refined to sub-pixel precision in the specified video view.
+
+        parameters:
+            view (View): The video view to update (FRONT or SIDE).
+            enabled (bool): Whether to refine tracked ball centres.
+        """
+        self.invalidate(view)
+        self.getVideo(view).setRefinement(enabled)
+    
     def markFirstFrame(self, view: View) -> bool:
         """
         Starts tracking the ball in the specified video view.
@@ -308,15 +1295,21 @@ class Model:
         parameters:
             view (View): The video view to start tracking (FRONT or SIDE).
         """
+        self.invalidate(view)
         if view == View.FRONT:
             return self._frontVideo.markFirstFrame()
         elif view == View.SIDE:
             return self._sideVideo.markFirstFrame()
         return False
 
-    def makePrediction(self) -> tuple[int]:
+    def makePrediction(self, bootstrap: int = 0) -> Prediction:
         """
-        Outputs the predicted line and height of the ball from the data collected from ball tracking.
+        Outputs the predicted line and height of the ball from the data collected from ball tracking,
+        with confidence intervals propagated from the uncertainty of the fits.
+
+        parameters:
+            bootstrap (int): Number of bootstrap replicates used for the intervals. If zero, the intervals
+                are propagated from the covariance of the fits instead.
         """
 
         if self._stumpPosition == None:
@@ -326,82 +1319,215 @@ class Model:
         if len(self._frontVideo.getPoints()) < 2 or len(self._sideVideo.getPoints()) < 3:
             raise ValueError("Not enough points to make prediction.")
         
-        numFrames = self._requiredFramesForPrediction()
-        line = self._predictLine(int(numFrames * self._frontVideo.getFPS() / self._sideVideo.getFPS()))
-        height = self._predictHeight(numFrames)
-        return (line, height)
+        self._plots = []
+        impactTime, progressFit = self._predictImpactTime()
+        line, frontBounce, frontConfidence, lineFit = self._predictLine(impactTime)
+        height, sideBounce, sideConfidence, heightFit = self._predictHeight(impactTime)
+        self._prediction = Prediction(
+            line=line,
+            height=height,
+            impactTime=impactTime,
+            frontBounce=frontBounce,
+            sideBounce=sideBounce,
+            progressCoefficients=tuple(progressFit.coefficients.tolist()),
+            lineCoefficients=tuple(lineFit.coefficients.tolist()),
+            heightCoefficients=tuple(heightFit.coefficients.tolist()),
+            frontBounceConfidence=frontConfidence,
+            sideBounceConfidence=sideConfidence,
+            progressInliers=progressFit.inlierCount(),
+            lineInliers=lineFit.inlierCount(),
+            heightInliers=heightFit.inlierCount(),
+            progressResidual=progressFit.residualError(),
+            lineResidual=lineFit.residualError(),
+            heightResidual=heightFit.residualError(),
+        )
+        if bootstrap > 0:
+            intervals = self._bootstrapIntervals(progressFit, lineFit, heightFit, bootstrap)
+        else:
+            intervals = self._propagatedIntervals(progressFit, lineFit, heightFit, impactTime)
+        self._prediction.lineInterval, self._prediction.heightInterval = intervals
+        return self._prediction
 
-    def _requiredFramesForPrediction(self) -> int:
+    def _propagatedIntervals(self, progressFit: Fit, lineFit: Fit, heightFit: Fit, impactTime: float) -> tuple[tuple[float, float], tuple[float, float]]:
         """
-        Returns the number of frames required from the side video to make a prediction.
+        Returns confidence intervals for the line and height by propagating the covariance of each fit,
+        including the uncertainty in when the ball reaches the stumps.
+        """
+        slope, intercept = progressFit.coefficients
+        gradient = np.array([-impactTime / slope, -1 / slope])
+        timeVariance = gradient @ progressFit.covariance @ gradient
+
+        intervals = []
+        for fit in (lineFit, heightFit):
+            value = fit.evaluate(impactTime)
+            deviation = np.sqrt(fit.variance(impactTime) + fit.slope(impactTime) ** 2 * timeVariance)
+            intervals.append((value - CONFIDENCE_Z * deviation, value + CONFIDENCE_Z * deviation))
+        return tuple(intervals)
+
+    def _bootstrapIntervals(self, progressFit: Fit, lineFit: Fit, heightFit: Fit, samples: int) -> tuple[tuple[float, float], tuple[float, float]]:
+        """
+        Returns confidence intervals for the line and height from predictions made with bootstrap
+        replicates of every fit, all evaluated together.
+        """
+        progress = bootstrapFit(progressFit, samples)
+        impactTimes = (self._stumpPosition - progress[:, 1]) / progress[:, 0]
+
+        intervals = []
+        for fit in (lineFit, heightFit):
+            replicates = bootstrapFit(fit, samples)
+            powers = np.vander(impactTimes, replicates.shape[1])
+            values = np.sum(replicates * powers, axis=1)
+            low, high = np.nanpercentile(values, [50 - CONFIDENCE_LEVEL / 2, 50 + CONFIDENCE_LEVEL / 2])
+            intervals.append((float(low), float(high)))
+        return tuple(intervals)
+
+    def setCalibration(self, view: View, imagePoints: list[tuple[float, float]], worldPoints: list[tuple[float, float, float]]) -> None:
+        """
+        Calibrates the specified view from reference points, such as the pitch corners and stump tops,
+        whose positions are known in metres.
+
+        parameters:
+            view (View): The video view being calibrated (FRONT or SIDE).
+            imagePoints (list[tuple[float, float]]): Pixel coordinates of the reference points.
+            worldPoints (list[tuple[float, float, float]]): World coordinates of the reference points.
+        """
+        self._projections[view] = calibrateCamera(imagePoints, worldPoints)
+
+    def reconstructTrajectory(self, stumpDistance: float = PITCH_LENGTH) -> Reconstruction:
+        """
+        Fuses the tracked points after the bounce from both calibrated views into a single 3D trajectory.
+
+        parameters:
+            stumpDistance (float): Distance along the pitch of the batter's stumps in metres.
+        returns:
+            Reconstruction: The trajectory and the point in metres where it reaches the stumps.
+        """
+        if self._isLinked == False:
+            raise ValueError("Must link videos before reconstructing.")
+        if len(self._projections) < len(View):
+            raise ValueError("Both views must be calibrated before reconstructing.")
+
+        observations = []
+        for view in View:
+            video = self.getVideo(view)
+            points = video.getPoints()
+            times = self._pointTimes(video)
+            bounce, _ = self._findBounceFrame(points, times) if len(points) > 0 else (0, 0.0)
+            pixels = np.array([point[:2] for point in points[bounce:]], dtype=np.float64).reshape(-1, 2)
+            observations.append((self._projections[view], times[bounce:], pixels))
+        return reconstructTrajectory(observations, stumpDistance)
+
+    def showPlots(self) -> None:
+        """
+        Plots the tracked points used by the most recent prediction. Must be called from the main thread.
+        """
+        plotPoints(self._plots)
+
+    def getPlots(self) -> list[tuple[str, str, str, np.ndarray, np.ndarray]]:
+        """
+        Returns the title, axis labels and points of each plot of the most recent prediction.
+        """
+        return self._plots
+
+    def getPrediction(self) -> Prediction | None:
+        """
+        Returns the details of the most recent prediction, or None if no prediction has been made.
+        """
+        return self._prediction
+
+    def _pointTimes(self, video: Video) -> np.ndarray:
+        """
+        Returns the times of the tracked points of a video relative to the moment the videos were linked.
+
+        parameters:
+            video (Video): The video whose points to use.
+        returns:
+            np.ndarray: Time of each point in seconds.
+        """
+        return (video.getPointTimes() - self._linkTimes[video]) / 1000
+
+    def _predictImpactTime(self) -> tuple[float, Fit]:
+        """
+        Returns the time since linking, in seconds, at which the ball is expected to reach the stumps,
+        along with the fitted progress of the ball.
         """
         sidePoints = self._sideVideo.getPoints()
         xs = [sidePoints[i][0] for i in range(len(sidePoints))]
-        frames = [sidePoints[i][3] for i in range(len(sidePoints))]
-        plt.scatter(frames, xs)
-        plt.title("Progress of the ball vs Frames")
-        plt.xlabel("Frame Number")
-        plt.ylabel("x position of the ball (side view)")
-        plt.show()
+        times = self._pointTimes(self._sideVideo)
+        self._plots.append(("Progress of the ball vs Time", "Time (s)", "x position of the ball (side view)", np.asarray(times), np.asarray(xs)))
 
         if len(xs) < 2:
             raise ValueError("Not enough points to make a prediction.")
 
-        lineParams, _ = curve_fit(linear, frames, xs)
-        predictedFrames = linearInverse([self._stumpPosition], *lineParams)
-        return predictedFrames[0] - frames[-1]
+        fit = fitTrajectory(times, xs, 1, self._fitMode)
+        return (linearInverse([self._stumpPosition], *fit.coefficients)[0], fit)
 
-    def _predictLine(self, numFrames: int) -> int:
+    def _predictLine(self, impactTime: float) -> tuple[int, int, float, Fit]:
         """
-        Returns the predicted line of the ball as viewed from the front angle, giving the expected vertical line
+        Returns the predicted line of the ball as viewed from the front angle, giving the expected vertical line,
+        along with the index of the bounce point, the confidence in it and the fit.
+
+        parameters:
+            impactTime (float): Time since linking at which the ball reaches the stumps in seconds.
         """
         frontPoints = self._frontVideo.getPoints()
-        bounce = self._findBounceFrame(frontPoints)
+        times = self._pointTimes(self._frontVideo)
+        bounce, confidence = self._findBounceFrame(frontPoints, times)
         xs = [frontPoints[i][0] for i in range(bounce, len(frontPoints))]
-        frames = [frontPoints[i][3] for i in range(bounce, len(frontPoints))]
-        plt.scatter(frames, xs)
-        plt.title("Line of the ball vs Frames")
-        plt.xlabel("Frame Number")
-        plt.ylabel("x position of the ball (front view)")
-        plt.show()
+        times = times[bounce:]
+        self._plots.append(("Line of the ball vs Time", "Time (s)", "x position of the ball (front view)", np.asarray(times), np.asarray(xs)))
 
         if len(xs) < 2:
             raise ValueError("Not enough points after bounce to make line prediction.")
     
-        lineParams, _ = curve_fit(linear, frames, xs)
-        prediction = linear([frames[-1] + numFrames], *lineParams)
-        return int(prediction[0])
+        fit = fitTrajectory(times, xs, 1, self._fitMode)
+        prediction = linear([impactTime], *fit.coefficients)
+        return (int(prediction[0]), bounce, confidence, fit)
     
-    def _predictHeight(self, numFrames: int) -> int:
+    def _predictHeight(self, impactTime: float) -> tuple[int, int, float, Fit]:
         """
-        Returns the predicted height of the ball as viewed from the side angle, giving the expected height above ground.
+        Returns the predicted height of the ball as viewed from the side angle, giving the expected height above ground,
+        along with the index of the bounce point, the confidence in it and the fit.
+
+        parameters:
+            impactTime (float): Time since linking at which the ball reaches the stumps in seconds.
         """
         sidePoints = self._sideVideo.getPoints()
-        bounce = self._findBounceFrame(sidePoints)
+        times = self._pointTimes(self._sideVideo)
+        bounce, confidence = self._findBounceFrame(sidePoints, times)
         ys = [sidePoints[i][1] for i in range(bounce, len(sidePoints))]
-        frames = [sidePoints[i][3] for i in range(bounce, len(sidePoints))]
-        plt.scatter(frames, ys)
-        plt.title("Height of the ball vs Frames")
-        plt.xlabel("Frame Number")
-        plt.ylabel("y position of the ball (side view)")
-        plt.show()
+        times = times[bounce:]
+        self._plots.append(("Height of the ball vs Time", "Time (s)", "y position of the ball (side view)", np.asarray(times), np.asarray(ys)))
 
         if len(ys) < 3:
             raise ValueError("Not enough points to make height prediction.")
         
-        heightParams, _ = curve_fit(quadratic, frames, ys)
-        prediction = quadratic([frames[-1] + numFrames], *heightParams)
-        return int(prediction[0])
+        fit = fitTrajectory(times, ys, 2, self._fitMode)
+        prediction = quadratic([impactTime], *fit.coefficients)
+        return (int(prediction[0]), bounce, confidence, fit)
     
-    def _findBounceFrame(self, points: list[list[int]]) -> int:
+    def _findBounceFrame(self, points: list[list[int]], times: np.ndarray) -> tuple[int, float]:
         """
-        Finds the first frame after the ball bounce based on the tracked points.
+        Finds the bounce point based on the tracked points, ignoring outlying detections.
 
         parameters:
             points (list[list[int]]): List of tracked ball positions.
+            times (np.ndarray): Time of each tracked position.
+        returns:
+            tuple[int, float]: Index of the bounce point (0 if none was found) and the confidence in it.
         """
-        maximum = max([points[i][1] for i in range(len(points))])
-        for i in range(1, len(points)-1):
-            if points[i][1] == maximum:
-                return i
-        return 0
\ No newline at end of file
+        return findBounce(times, np.array([point[1] for point in points], dtype=np.float64))
+
+def plotPoints(plots: list[tuple[str, str, str, np.ndarray, np.ndarray]]) -> None:
+    """
+    Shows a scatter plot of each set of points, one after another. Must be called from the main thread.
+
+    parameters:
+        plots (list[tuple]): The title, x axis label, y axis label, x values and y values of each plot.
+    """
+    for title, xlabel, ylabel, xs, ys in plots:
+        plt.scatter(xs, ys)
+        plt.title(title)
+        plt.xlabel(xlabel)
+        plt.ylabel(ylabel)
+        plt.show()
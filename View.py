@@ -99,34 +99,79 @@ class VideoView(tk.Label):
         self._width = width
         self._height = height
         self._root = root
+        self._base = None
+        self._scale = (1.0, 1.0)
 
-    def updateFrame(self, frame, circles: list[tuple[int]]=[], cropRegion: tuple[tuple[int]]=None, verticalLines: list[int]=[], horizontalLines=[]) -> None:
+    def updateFrame(self, frame, circles: list[tuple[int]]=[], cropRegion: tuple[tuple[int]]=None, verticalLines: list[int]=[], horizontalLines=[], verticalBands=[], horizontalBands=[]) -> None:
         """
         Updates the displayed frame in the GUI.
         parameters:
-            frame: The frame to display (as a numpy array).
+            frame: The frame to display (as a numpy array), or None to redraw the markings over the last frame.
             circles: The circles to draw on the image
             cropRegion: The region which will be analysed for ball tracking
-        """
-        # draw tracked ball positions
-        for circle in circles:
-            cv.circle(frame, (circle[0], circle[1]), circle[2], (0, 0, 255), 2)
-        # draw cropped region
-        if cropRegion is not None:
-            cv.rectangle(frame, cropRegion[0], cropRegion[1], (255, 255, 255), 2)
-        for line in verticalLines:
-            cv.line(frame, (line, 0), (line, len(frame)), (0, 0, 255), 2)
-        for line in horizontalLines:
-            cv.line(frame, (0, line), (len(frame[0]), line), (0, 0, 255), 2)
-        
-        frame = cv.resize(frame, (self._width, self._height), interpolation=cv.INTER_AREA)
-        frame = cv.cvtColor(frame, cv.COLOR_BGR2RGB)
+            verticalBands: The (left, right) confidence bands to shade across the image
+            horizontalBands: The (top, bottom) confidence bands to shade across the image
+        """
+        # converting and resizing the frame is the expensive part, so it is kept for redrawing the markings
+        if frame is not None:
+            if frame.ndim == 2:
+                frame = cv.cvtColor(frame, cv.COLOR_GRAY2BGR)
+            self._scale = (self._width / len(frame[0]), self._height / len(frame))
+            self._base = cv.resize(frame, (self._width, self._height), interpolation=cv.INTER_AREA)
+        if self._base is None:
+            return
+
+        render = Render(self._base.copy(), circles, cropRegion, verticalLines, horizontalLines, verticalBands, horizontalBands)
+        frame = cv.cvtColor(drawOverlays(render, self._scale), cv.COLOR_BGR2RGB)
         img = Image.fromarray(frame)
         imgtk = ImageTk.PhotoImage(image=img)
         self.imgtk = imgtk 
         self.configure(image=imgtk)
 
 
+    def onClick(self, function) -> None:
+        """
+        Sets a function to be called with the position in the video that is clicked.
+        parameters:
+            function: The function to call with the (x, y) position of the click in video pixels.
+        """
+        self.bind("<Button-1>", lambda event: function(event.x / self._scale[0], event.y / self._scale[1]))
+
+
+def drawOverlays(render: Render, scale: tuple[float, float] = (1.0, 1.0)):
+    """
+    Draws the markings of a render onto its frame in place.
+    parameters:
+        render: The render whose frame is drawn on, as a BGR numpy array.
+        scale: The (x, y) scale of the frame relative to the video the markings were measured in.
+    returns:
+        The frame with the markings drawn on it.
+    """
+    frame = render.frame
+    sx, sy = scale
+    height, width = frame.shape[:2]
+    # shade confidence bands behind the other markings
+    if len(render.verticalBands) > 0 or len(render.horizontalBands) > 0:
+        shaded = frame.copy()
+        for left, right in render.verticalBands:
+            cv.rectangle(shaded, (round(left * sx), 0), (round(right * sx), height), (0, 255, 255), -1)
+        for top, bottom in render.horizontalBands:
+            cv.rectangle(shaded, (0, round(top * sy)), (width, round(bottom * sy)), (0, 255, 255), -1)
+        cv.addWeighted(shaded, 0.3, frame, 0.7, 0, dst=frame)
+    # draw tracked ball positions
+    for circle in render.circles:
+        cv.circle(frame, (round(circle[0] * sx), round(circle[1] * sy)), max(1, round(circle[2] * min(sx, sy))), (0, 0, 255), 2)
+    # draw cropped region
+    if render.cropRegion is not None:
+        (left, top), (right, bottom) = render.cropRegion
+        cv.rectangle(frame, (round(left * sx), round(top * sy)), (round(right * sx), round(bottom * sy)), (255, 255, 255), 2)
+    for line in render.verticalLines:
+        cv.line(frame, (round(line * sx), 0), (round(line * sx), height), (0, 0, 255), 2)
+    for line in render.horizontalLines:
+        cv.line(frame, (0, round(line * sy)), (width, round(line * sy)), (0, 0, 255), 2)
+    return frame
+
+
 class Slider(tk.Frame):
     def __init__(self, root: tk.Frame, label: str, from_:float, to: float, resolution: float, default: float, orient=tk.VERTICAL, length=100) -> None:
         """
@@ -188,7 +233,8 @@ class ParameterBar(tk.Frame):
         (Parameter.MIN_RADIUS, 1, 100, 1, 5),
         (Parameter.MAX_RADIUS, 1, 100, 1, 35),
         (Parameter.PARAM1, 1, 200, 1, 100),
-        (Parameter.PARAM2, 1, 50, 1, 20)
+        (Parameter.PARAM2, 1, 50, 1, 20),
+        (Parameter.MAX_STEP, 1, 500, 1, DEFAULT_MAX_STEP)
     ]
 
     def __init__(self, root: tk.Frame | tk.Tk, function) -> None:
@@ -224,6 +270,21 @@ class ParameterBar(tk.Frame):
             slider.onChange(function)
         slider.pack(side=tk.LEFT, expand=tk.Y)
     
+    def setParameters(self, parameters: Parameters) -> None:
+        """
+        Moves the sliders to the given parameters without triggering an update.
+        parameters:
+            parameters: The parameters to show.
+        """
+        self._sliders[Parameter.BLUR_SQR_SIZE].setValue(parameters.blurSqrSize)
+        self._sliders[Parameter.DP].setValue(parameters.dp)
+        self._sliders[Parameter.MIN_DIST].setValue(parameters.minDist)
+        self._sliders[Parameter.MIN_RADIUS].setValue(parameters.minRadius)
+        self._sliders[Parameter.MAX_RADIUS].setValue(parameters.maxRadius)
+        self._sliders[Parameter.PARAM1].setValue(parameters.param1)
+        self._sliders[Parameter.PARAM2].setValue(parameters.param2)
+        self._sliders[Parameter.MAX_STEP].setValue(parameters.maxStep)
+
     def getParameters(self) -> Parameters:
         """
         Returns the current parameters from the sliders.
@@ -237,7 +298,8 @@ class ParameterBar(tk.Frame):
             minRadius=int(self._sliders[Parameter.MIN_RADIUS].getValue()),
             maxRadius=int(self._sliders[Parameter.MAX_RADIUS].getValue()),
             param1=int(self._sliders[Parameter.PARAM1].getValue()),
-            param2=int(self._sliders[Parameter.PARAM2].getValue())
+            param2=int(self._sliders[Parameter.PARAM2].getValue()),
+            maxStep=int(self._sliders[Parameter.MAX_STEP].getValue())
         )
 
 class CropControlBar(tk.Frame):
@@ -281,27 +343,84 @@ class CropControlBar(tk.Frame):
         self._bottom.onChange(crop)
         self._right.onChange(crop)
 
+    def setRegion(self, topLeft: tuple[int], bottomRight: tuple[int]) -> None:
+        """
+        Moves the sliders to the given crop region without triggering a crop.
+        parameters:
+            topLeft: The top-left corner of the region.
+            bottomRight: The bottom-right corner of the region.
+        """
+        self._left.setValue(topLeft[0])
+        self._top.setValue(topLeft[1])
+        self._right.setValue(bottomRight[0])
+        self._bottom.setValue(bottomRight[1])
+
 
 class PlaybackBar(tk.Frame):
-    def __init__(self, root: tk.Frame | tk.Tk, nextFunction, startTrackFunction) -> None:
+    def __init__(self, root: tk.Frame | tk.Tk, playFunction, nextFunction, skipFunction, startTrackFunction) -> None:
         """
         Initializes the VideoControlBar object with the given Tkinter root.
         parameters:
             root: The Tkinter root window.
+            playFunction: The function that starts or stops playing the video
             nextFunction: The function that moves to the next frame of the video
+            skipFunction: The function that skips idle footage to the next delivery
             startTrackFunction: The function that initiates ball tracking on the video
         """
         super().__init__(root)
 
+        self._playButton = tk.Button(self, text="Play", width=5, command=playFunction)
+        self._playButton.pack(side=tk.LEFT)
+
         nextButton = tk.Button(self, text="Next Frame", command=nextFunction)
         nextButton.pack(side=tk.LEFT)
 
+        skipButton = tk.Button(self, text="Skip Idle", command=skipFunction)
+        skipButton.pack(side=tk.LEFT)
+
         trackButton = tk.Button(self, text="Start Tracking", command=startTrackFunction)
         trackButton.pack(side=tk.LEFT)
 
+        self._rateLabel = tk.Label(self, text="", width=16, anchor=tk.W)
+        self._rateLabel.pack(side=tk.LEFT)
+
+        self._memoryLabel = tk.Label(self, text="", width=20, anchor=tk.W)
+        self._memoryLabel.pack(side=tk.LEFT)
+
+    def setPlaying(self, playing: bool) -> None:
+        """
+        Shows whether the video is playing.
+        parameters:
+            playing: True if the video is playing.
+        """
+        self._playButton.configure(text="Pause" if playing else "Play")
+        if not playing:
+            self._rateLabel.configure(text="")
+
+    def setPlaybackRate(self, achieved: float, target: float) -> None:
+        """
+        Shows the achieved and target number of frames rendered per second while playing.
+        parameters:
+            achieved: The number of frames rendered per second.
+            target: The number of frames per second playback aims for.
+        """
+        self._rateLabel.configure(text=f"{achieved:.1f} / {target:.0f} fps")
+
+    def setMemoryUsage(self, used: int, limit: int | None) -> None:
+        """
+        Shows how much memory the video is using.
+        parameters:
+            used: The number of bytes used.
+            limit: The number of bytes frames may use, or None if there is no limit.
+        """
+        text = f"Memory: {used / 2**20:.0f} MB"
+        if limit is not None:
+            text += f" / {limit / 2**20:.0f} MB"
+        self._memoryLabel.configure(text=text)
+
 
 class VideoControlBar(tk.Frame):
-    def __init__(self, root: tk.Frame | tk.Tk, videoName: str, dimensions: tuple[int], parameterFunction, cropFunction, nextFunction, startTrackFunction) -> None:
+    def __init__(self, root: tk.Frame | tk.Tk, videoName: str, dimensions: tuple[int], parameterFunction, refineFunction, tuneFunction, cropFunction, playFunction, nextFunction, skipFunction, startTrackFunction) -> None:
         """
         Initializes the ControlBar object with the given Tkinter root.
         parameters:
@@ -309,7 +428,12 @@ class VideoControlBar(tk.Frame):
             videoName: The name of the video this bar controls
             dimensions: The dimensions of the video
             parameterFunction: The function that updates the video's ball tracking parameters
+            refineFunction: The function that toggles sub-pixel refinement of the video's ball centres
+            tuneFunction: The function that chooses the video's parameters from the balls clicked in it
             cropFunction: The function that updates the video's crop region
+            playFunction: The function that starts or stops playing the video
+            nextFunction: The function that moves to the next frame of the video
+            skipFunction: The function that skips idle footage to the next delivery
             startTrackFunction: the function that initiates ball tracking on the video
         """
         super().__init__(root)
@@ -319,28 +443,64 @@ class VideoControlBar(tk.Frame):
         parameterFrame = tk.Frame(self)
         parameterLabel = tk.Label(parameterFrame, text="Parameters", font=("Arial", FontSize.HEADER))
         parameterLabel.pack(side=tk.TOP, fill=tk.X)
-        parameterBar = ParameterBar(parameterFrame, parameterFunction)
-        parameterBar.pack(side=tk.TOP, fill=tk.X)
+        self._parameterBar = ParameterBar(parameterFrame, parameterFunction)
+        self._parameterBar.pack(side=tk.TOP, fill=tk.X)
+        refine = tk.BooleanVar(self, False)
+        refineButton = tk.Checkbutton(parameterFrame, text="Sub-pixel Centres", variable=refine,
+            command=lambda: refineFunction(refine.get()))
+        refineButton.pack(side=tk.TOP)
+        tuneButton = tk.Button(parameterFrame, text="Auto Tune From Clicks", command=tuneFunction)
+        tuneButton.pack(side=tk.TOP)
         parameterFrame.pack(side=tk.LEFT, fill=tk.X, padx=25)
 
         cropFrame = tk.Frame(self)
         cropLabel = tk.Label(cropFrame, text="Crop Region", font=("Arial", FontSize.HEADER))
         cropLabel.pack(side=tk.TOP, fill=tk.X)
-        cropBar = CropControlBar(cropFrame, dimensions, cropFunction)
-        cropBar.pack(side=tk.TOP, fill=tk.X)
+        self._cropBar = CropControlBar(cropFrame, dimensions, cropFunction)
+        self._cropBar.pack(side=tk.TOP, fill=tk.X)
         cropLabel.pack(side=tk.TOP, fill=tk.X)
         cropFrame.pack(side=tk.LEFT, fill=tk.X, padx=25)
 
         playbackFrame = tk.Frame(self)
         playbackLabel = tk.Label(playbackFrame, text="Playback Controls", font=("Arial", FontSize.HEADER))
         playbackLabel.pack(side=tk.TOP, fill=tk.X)
-        playbackBar = PlaybackBar(playbackFrame, nextFunction, startTrackFunction)
-        playbackBar.pack(side=tk.TOP, fill=tk.BOTH)
+        self._playbackBar = PlaybackBar(playbackFrame, playFunction, nextFunction, skipFunction, startTrackFunction)
+        self._playbackBar.pack(side=tk.TOP, fill=tk.BOTH)
         playbackFrame.pack(side=tk.LEFT, fill=tk.X, padx=25)
 
+    def setParameters(self, parameters: Parameters) -> None:
+        """
+        Shows the given tracking parameters on the sliders.
+        """
+        self._parameterBar.setParameters(parameters)
+
+    def setCropRegion(self, topLeft: tuple[int], bottomRight: tuple[int]) -> None:
+        """
+        Shows the given crop region on the sliders.
+        """
+        self._cropBar.setRegion(topLeft, bottomRight)
+
+    def setPlaying(self, playing: bool) -> None:
+        """
+        Shows whether the video is playing.
+        """
+        self._playbackBar.setPlaying(playing)
+
+    def setPlaybackRate(self, achieved: float, target: float) -> None:
+        """
+        Shows the achieved and target number of frames rendered per second while playing.
+        """
+        self._playbackBar.setPlaybackRate(achieved, target)
+
+    def setMemoryUsage(self, used: int, limit: int | None) -> None:
+        """
+        Shows how much memory the video is using.
+        """
+        self._playbackBar.setMemoryUsage(used, limit)
+
 
 class MasterControlBar(tk.Frame):
-    def __init__(self, root, makePredictionFunction, linkFunction, setStumpFunction, sideVideoDimensions):
+    def __init__(self, root, makePredictionFunction, exportFunction, replayFunction, saveSessionFunction, linkFunction, autoLinkFunction, fitModeFunction, setStumpFunction, sideVideoDimensions):
         """
         Initializes the MasterControlBar object with the given Tkinter root.
         parameters:
@@ -356,9 +516,45 @@ class MasterControlBar(tk.Frame):
         linkButton = tk.Button(self, text="Link Videos", command=linkFunction)
         linkButton.pack(side=tk.LEFT)
 
+        autoLinkButton = tk.Button(self, text="Auto Link", command=autoLinkFunction)
+        autoLinkButton.pack(side=tk.LEFT)
+
+        self._fitMode = tk.StringVar(self, FitMode.STANDARD.value)
+        fitModeMenu = tk.OptionMenu(self, self._fitMode, *[mode.value for mode in FitMode],
+            command=lambda value: fitModeFunction(FitMode(value)))
+        fitModeMenu.pack(side=tk.LEFT)
+
         predictButton = tk.Button(self, text="Make Prediction", command=makePredictionFunction)
         predictButton.pack(side=tk.LEFT)
 
+        exportButton = tk.Button(self, text="Export Delivery", command=exportFunction)
+        exportButton.pack(side=tk.LEFT)
+
+        replayButton = tk.Button(self, text="Export Replay", command=replayFunction)
+        replayButton.pack(side=tk.LEFT)
+
+        saveButton = tk.Button(self, text="Save Session", command=saveSessionFunction)
+        saveButton.pack(side=tk.LEFT)
+
+        self._status = tk.Label(self, text="Ready", width=24, anchor=tk.W)
+        self._status.pack(side=tk.LEFT)
+
+    def setStatus(self, text: str) -> None:
+        """
+        Shows what the application is currently doing.
+        parameters:
+            text: The status to show.
+        """
+        self._status.configure(text=text)
+
+    def setStumpPosition(self, position: int) -> None:
+        """
+        Moves the stump slider to the given position without triggering an update.
+        parameters:
+            position: The stump position.
+        """
+        self._stumpSlider.setValue(position)
+
     def _setStumpPos(self) -> None:
         self._stumpFunction(self._stumpSlider.getValue())
 
@@ -376,20 +572,26 @@ class VIEW:
         
         self._frontView = VideoView(root, 540, 960)
         self._frontView.pack(side=tk.LEFT)
+        self._frontView.onClick(lambda x, y: callbacks.addTuningClick(View.FRONT, x, y))
 
         rightFrame = tk.Frame(root)
         rightFrame.pack(side=tk.LEFT, fill=tk.BOTH)
         
         self._sideView = VideoView(rightFrame, 960, 540)
         self._sideView.pack(side=tk.TOP)
+        self._sideView.onClick(lambda x, y: callbacks.addTuningClick(View.SIDE, x, y))
 
         self._frontControlBar = VideoControlBar(
             rightFrame,
             "Front View",
             frontDimensions,
             lambda params: callbacks.updateParameters(View.FRONT, params),
+            lambda enabled: callbacks.setRefinement(View.FRONT, enabled),
+            lambda: callbacks.autoTune(View.FRONT),
             lambda topLeft, bottomRight: callbacks.cropRegion(View.FRONT, topLeft, bottomRight),
+            lambda: callbacks.togglePlayback(View.FRONT),
             lambda: callbacks.incrementFrame(View.FRONT),
+            lambda: callbacks.skipToDelivery(View.FRONT),
             lambda: callbacks.startTracking(View.FRONT)
         )
         self._frontControlBar.pack(side=tk.TOP, fill=tk.X)
@@ -399,8 +601,12 @@ class VIEW:
             "Side View",
             sideDimensions,
             lambda params: callbacks.updateParameters(View.SIDE, params),
+            lambda enabled: callbacks.setRefinement(View.SIDE, enabled),
+            lambda: callbacks.autoTune(View.SIDE),
             lambda topLeft, bottomRight: callbacks.cropRegion(View.SIDE, topLeft, bottomRight),
+            lambda: callbacks.togglePlayback(View.SIDE),
             lambda: callbacks.incrementFrame(View.SIDE),
+            lambda: callbacks.skipToDelivery(View.SIDE),
             lambda: callbacks.startTracking(View.SIDE)
         )
         self._sideControlBar.pack(side=tk.TOP, fill=tk.X)
@@ -408,30 +614,103 @@ class VIEW:
         self._masterControlBar = MasterControlBar(
             rightFrame,
             callbacks.makePrediction,
+            callbacks.exportDelivery,
+            callbacks.exportReplay,
+            callbacks.saveSession,
             callbacks.linkVideos,
+            callbacks.autoLink,
+            callbacks.setFitMode,
             callbacks.setStumpPosition,
             sideDimensions
         )
         self._masterControlBar.pack(side=tk.TOP)
     
-    def render(self, frontRender: Render, sideRender: Render) -> None:
+    def setStatus(self, text: str) -> None:
+        """
+        Shows what the application is currently doing.
+        parameters:
+            text: The status to show.
+        """
+        self._masterControlBar.setStatus(text)
+
+    def setParameters(self, view: View, parameters: Parameters) -> None:
+        """
+        Shows the tracking parameters of the specified view on its sliders.
+        parameters:
+            view: The view (FRONT or SIDE).
+            parameters: The parameters to show.
+        """
+        self._controlBar(view).setParameters(parameters)
+
+    def setCropRegion(self, view: View, topLeft: tuple[int], bottomRight: tuple[int]) -> None:
+        """
+        Shows the crop region of the specified view on its sliders.
+        parameters:
+            view: The view (FRONT or SIDE).
+            topLeft: The top-left corner of the region.
+            bottomRight: The bottom-right corner of the region.
+        """
+        self._controlBar(view).setCropRegion(topLeft, bottomRight)
+
+    def setStumpPosition(self, position: int) -> None:
+        """
+        Shows the stump position on its slider.
+        parameters:
+            position: The stump position.
+        """
+        self._masterControlBar.setStumpPosition(position)
+
+    def setPlaying(self, view: View, playing: bool) -> None:
+        """
+        Shows whether the specified view is playing.
+        parameters:
+            view: The view (FRONT or SIDE).
+            playing: True if the view is playing.
+        """
+        self._controlBar(view).setPlaying(playing)
+
+    def setPlaybackRate(self, view: View, achieved: float, target: float) -> None:
+        """
+        Shows the achieved and target rendering rate of the specified view while playing.
+        parameters:
+            view: The view (FRONT or SIDE).
+            achieved: The number of frames rendered per second.
+            target: The number of frames per second playback aims for.
+        """
+        self._controlBar(view).setPlaybackRate(achieved, target)
+
+    def setMemoryUsage(self, view: View, used: int, limit: int | None) -> None:
+        """
+        Shows how much memory the specified view is using.
+        parameters:
+            view: The view (FRONT or SIDE).
+            used: The number of bytes used.
+            limit: The number of bytes frames may use, or None if there is no limit.
+        """
+        self._controlBar(view).setMemoryUsage(used, limit)
+
+    def _controlBar(self, view: View) -> VideoControlBar:
+        """
+        Returns the control bar of the specified view.
+        """
+        return self._sideControlBar if view == View.SIDE else self._frontControlBar
+
+    def render(self, frontRender: Render | None, sideRender: Render | None) -> None:
         """
         Renders the given frames in the GUI.
         parameters:
-            frontRender: The render data for the front view.
-            sideRender: The render data for the side view.
-        """
-        self._frontView.updateFrame(
-            frontRender.frame,
-            frontRender.circles,
-            frontRender.cropRegion,
-            frontRender.verticalLines,
-            frontRender.horizontalLines
-        )
-        self._sideView.updateFrame(
-            sideRender.frame,
-            sideRender.circles,
-            sideRender.cropRegion,
-            sideRender.verticalLines,
-            sideRender.horizontalLines
-        )
\ No newline at end of file
+            frontRender: The render data for the front view, or None to leave it unchanged.
+            sideRender: The render data for the side view, or None to leave it unchanged.
+        """
+        for videoView, render in ((self._frontView, frontRender), (self._sideView, sideRender)):
+            if render is None:
+                continue
+            videoView.updateFrame(
+                render.frame,
+                render.circles,
+                render.cropRegion,
+                render.verticalLines,
+                render.horizontalLines,
+                render.verticalBands,
+                render.horizontalBands
+            )
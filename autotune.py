@@ -0,0 +1,101 @@
+import itertools
+import cv2 as cv
+import numpy as np
+from dataclasses import replace
+from concurrent.futures import ThreadPoolExecutor
+from library import *
+
+# Candidate values searched for each tracking parameter. Blur sizes must be odd.
+TUNING_GRID = {
+    "blurSqrSize": (5, 9, 13, 17),
+    "dp": (1.0, 1.2, 1.5),
+    "param1": (50, 100, 150),
+    "param2": (10, 15, 20, 30, 40),
+}
+# Largest ball radius in pixels looked for around a click
+MAX_TUNING_RADIUS = 80
+# Range of radii searched, relative to the radius estimated from the clicked frames
+RADIUS_RANGE = (0.7, 1.4)
+# Largest distance in pixels between a clicked ball and a detection for the detection to count
+TUNING_TOLERANCE = 6
+# Smallest and largest number of clicked frames the search is made from
+MIN_TUNING_FRAMES = 3
+MAX_TUNING_FRAMES = 5
+
+def tuneParameters(planes: list[np.ndarray], targets: list[tuple[float, float]], base: Parameters = None, workers: int = None) -> tuple[Parameters, int]:
+    """
+    Searches for the tracking parameters which detect exactly the clicked ball in each of a few frames.
+    The radius range is fixed from the size of the clicked balls, then each frame is blurred once per candidate blur size and shared by every candidate with that size, and
+    the blur sizes are searched in parallel since OpenCV releases the GIL while detecting circles.
+
+    parameters:
+        planes (list[np.ndarray]): The cropped single channel image tracked in each clicked frame.
+        targets (list[tuple[float, float]]): Position of the ball clicked in each plane, in plane coordinates.
+        base (Parameters): Parameters whose unsearched fields are kept, defaults to defaultParameters().
+        workers (int): Number of threads, defaults to one per blur size.
+    returns:
+        tuple[Parameters, int]: The best parameters and the number of frames in which the tracker would
+            pick the clicked ball with them.
+    """
+    if not MIN_TUNING_FRAMES <= len(planes) <= MAX_TUNING_FRAMES or len(planes) != len(targets):
+        raise ValueError(f"Click the ball in {MIN_TUNING_FRAMES} to {MAX_TUNING_FRAMES} frames to auto tune.")
+    base = base or defaultParameters()
+    targets = np.asarray(targets, dtype=np.float64)
+    radius = np.median([estimateRadius(plane, target) for plane, target in zip(planes, targets)])
+    minRadius = max(1, int(np.floor(radius * RADIUS_RANGE[0])))
+    maxRadius = int(np.ceil(radius * RADIUS_RANGE[1])) + 1
+
+    def search(blurSize: int) -> tuple[tuple, Parameters]:
+        blurred = [cv.GaussianBlur(plane, (blurSize, blurSize), 0) for plane in planes]
+        best = None
+        for dp, param1, param2 in itertools.product(TUNING_GRID["dp"], TUNING_GRID["param1"], TUNING_GRID["param2"]):
+            parameters = replace(base, blurSqrSize=blurSize, dp=dp, param1=param1, param2=param2, minRadius=minRadius, maxRadius=maxRadius)
+            score = _score(blurred, targets, parameters)
+            if best is None or score > best[0]:
+                best = (score, parameters)
+        return best
+
+    with ThreadPoolExecutor(max_workers=workers or len(TUNING_GRID["blurSqrSize"])) as executor:
+        results = list(executor.map(search, TUNING_GRID["blurSqrSize"]))
+    score, parameters = max(results, key=lambda result: result[0])
+    return (parameters, score[0])
+
+def estimateRadius(plane: np.ndarray, target: tuple[float, float]) -> float:
+    """
+    Estimates the radius of a clicked ball as the distance from the click at which the average
+    brightness of a ring around it changes most sharply.
+
+    parameters:
+        plane (np.ndarray): The single channel image the ball was clicked in.
+        target (tuple[float, float]): Position of the click.
+    returns:
+        float: The estimated radius in pixels.
+    """
+    x, y = int(round(target[0])), int(round(target[1]))
+    top, left = max(0, y - MAX_TUNING_RADIUS), max(0, x - MAX_TUNING_RADIUS)
+    patch = cv.GaussianBlur(plane[top:y + MAX_TUNING_RADIUS + 1, left:x + MAX_TUNING_RADIUS + 1], (3, 3), 0).astype(np.float64)
+    rows, columns = np.indices(patch.shape)
+    distances = np.hypot(columns + left - target[0], rows + top - target[1]).astype(np.int64).ravel()
+    counts = np.bincount(distances, minlength=MAX_TUNING_RADIUS + 1)[:MAX_TUNING_RADIUS + 1]
+    sums = np.bincount(distances, weights=patch.ravel(), minlength=MAX_TUNING_RADIUS + 1)[:MAX_TUNING_RADIUS + 1]
+    profile = sums / np.maximum(counts, 1)
+    return float(np.argmax(np.abs(np.diff(profile[counts > 0]))) + 1)
+
+def _score(blurred: list[np.ndarray], targets: np.ndarray, parameters: Parameters) -> tuple[int, int, int]:
+    """
+    Scores parameters by the number of frames where the strongest circle is the clicked ball, then by
+    how few other circles were detected, then by preferring the strictest accumulator threshold.
+    """
+    hits = 0
+    extras = 0
+    for plane, target in zip(blurred, targets):
+        circles = cv.HoughCircles(plane, cv.HOUGH_GRADIENT, parameters.dp, parameters.minDist,
+            param1=parameters.param1, param2=parameters.param2, minRadius=parameters.minRadius, maxRadius=parameters.maxRadius)
+        if circles is None:
+            continue
+        # The tracker favours the strongest circle when nothing else separates the candidates
+        distance = np.hypot(*(circles[0, 0, :2] - target))
+        if distance <= max(TUNING_TOLERANCE, circles[0, 0, 2] / 2):
+            hits += 1
+        extras += len(circles[0]) - 1
+    return (hits, -extras, parameters.param2)
@@ -0,0 +1,249 @@
+import cv2 as cv
+import numpy as np
+from library import *
+
+try:
+    import av
+except ImportError:
+    av = None
+
+class OpenCVCapture:
+    """
+    A wrapper around cv.VideoCapture which can shrink and/or convert frames to grayscale as they are read.
+    """
+    def __init__(self, filePath: str, scale: float = 1.0, grayscale: bool = False) -> None:
+        """
+        Initializes the OpenCVCapture object with the given parameters.
+
+        parameters:
+            filePath (str): Path to the video file.
+            scale (float): Factor by which to shrink decoded frames.
+            grayscale (bool): Whether to convert decoded frames to a single grayscale channel.
+        """
+        self._capture = cv.VideoCapture(filePath)
+        self._scale = scale
+        self._grayscale = grayscale
+        self._size = outputSize(
+            int(self._capture.get(cv.CAP_PROP_FRAME_WIDTH)),
+            int(self._capture.get(cv.CAP_PROP_FRAME_HEIGHT)),
+            scale
+        )
+
+    def get(self, prop: int) -> float:
+        if prop == cv.CAP_PROP_FRAME_WIDTH:
+            return self._size[0]
+        if prop == cv.CAP_PROP_FRAME_HEIGHT:
+            return self._size[1]
+        return self._capture.get(prop)
+
+    def set(self, prop: int, value: float) -> bool:
+        return self._capture.set(prop, value)
+
+    def isOpened(self) -> bool:
+        return self._capture.isOpened()
+
+    def grab(self) -> bool:
+        return self._capture.grab()
+
+    def read(self, image: np.ndarray = None) -> tuple[bool, np.ndarray]:
+        """
+        Decodes the next frame, writing it into the given buffer when it has the right shape.
+        """
+        ret, frame = self._capture.read()
+        if not ret:
+            return False, None
+        if self._grayscale:
+            frame = cv.cvtColor(frame, cv.COLOR_BGR2GRAY)
+        if self._scale != 1.0:
+            frame = cv.resize(frame, self._size, interpolation=cv.INTER_AREA)
+        if image is not None and image.shape == frame.shape:
+            np.copyto(image, frame)
+            return True, image
+        return True, frame
+
+    def release(self) -> None:
+        self._capture.release()
+
+
+class EmptyCapture:
+    """
+    A capture with no frames, standing in for a video whose tracking was restored without its file.
+    """
+    def get(self, prop: int) -> float:
+        return 0
+
+    def set(self, prop: int, value: float) -> bool:
+        return False
+
+    def isOpened(self) -> bool:
+        return False
+
+    def grab(self) -> bool:
+        return False
+
+    def read(self, image: np.ndarray = None) -> tuple[bool, np.ndarray]:
+        return False, None
+
+    def release(self) -> None:
+        pass
+
+class PyAVCapture:
+    """
+    A capture with the same interface as cv.VideoCapture which decodes using FFmpeg through PyAV.
+    Decoding is spread across threads by FFmpeg, and scaling and grayscale conversion are done by
+    FFmpeg's scaler while converting out of the decoder's pixel format.
+    """
+    def __init__(self, filePath: str, scale: float = 1.0, grayscale: bool = False, threads: int = 0) -> None:
+        """
+        Initializes the PyAVCapture object with the given parameters.
+
+        parameters:
+            filePath (str): Path to the video file.
+            scale (float): Factor by which to shrink decoded frames.
+            grayscale (bool): Whether to decode frames to a single grayscale channel.
+            threads (int): Number of decoding threads, 0 lets FFmpeg choose one per core.
+        """
+        if av is None:
+            raise ImportError("The PyAV backend requires the 'av' package to be installed.")
+        self._container = av.open(filePath)
+        self._stream = self._container.streams.video[0]
+        self._stream.thread_type = "AUTO"
+        self._stream.thread_count = threads
+        self._decoder = self._container.decode(self._stream)
+        self._format = "gray" if grayscale else "bgr24"
+        self._channels = 1 if grayscale else 3
+        self._size = outputSize(self._stream.codec_context.width, self._stream.codec_context.height, scale)
+        self._time = 0.0
+        self._index = 0
+        self._pending = None
+
+    def get(self, prop: int) -> float:
+        if prop == cv.CAP_PROP_FRAME_WIDTH:
+            return self._size[0]
+        if prop == cv.CAP_PROP_FRAME_HEIGHT:
+            return self._size[1]
+        if prop == cv.CAP_PROP_FPS:
+            rate = self._stream.average_rate or self._stream.guessed_rate
+            return float(rate) if rate else 0.0
+        if prop == cv.CAP_PROP_POS_MSEC:
+            return self._time * 1000
+        if prop == cv.CAP_PROP_POS_FRAMES:
+            return self._index
+        if prop == cv.CAP_PROP_FRAME_COUNT:
+            return self._stream.frames
+        return 0
+
+    def set(self, prop: int, value: float) -> bool:
+        """
+        Seeks to the frame with the given index, which is the only property that can be set. FFmpeg seeks
+        to the preceding keyframe and the frames up to the requested one are decoded and discarded.
+        """
+        if prop != cv.CAP_PROP_POS_FRAMES or self._container is None:
+            return False
+        rate = self.get(cv.CAP_PROP_FPS)
+        if rate <= 0:
+            return False
+        start = float(self._stream.start_time * self._stream.time_base) if self._stream.start_time is not None else 0.0
+        target = start + value / rate
+        self._container.seek(int(target / self._stream.time_base), stream=self._stream, backward=True)
+        self._decoder = self._container.decode(self._stream)
+        self._pending = None
+        self._index = int(value)
+        # Frames are decoded from the keyframe and discarded until the one at the requested time
+        while True:
+            frame = self._decode()
+            if frame is None:
+                return False
+            if frame.time is None or frame.time >= target - 0.5 / rate:
+                self._pending = frame
+                return True
+
+    def isOpened(self) -> bool:
+        return self._container is not None
+
+    def _decode(self):
+        """
+        Returns the next frame from the decoder, or None at the end of the video.
+        """
+        try:
+            return next(self._decoder)
+        except (StopIteration, av.error.EOFError):
+            return None
+
+    def _nextFrame(self):
+        """
+        Returns the next decoded frame, or None at the end of the video.
+        """
+        if self._container is None:
+            return None
+        frame, self._pending = self._pending, None
+        if frame is None:
+            frame = self._decode()
+        if frame is None:
+            return None
+        if frame.time is not None:
+            self._time = frame.time
+        self._index += 1
+        return frame
+
+    def grab(self) -> bool:
+        """
+        Decodes the next frame without converting it out of the decoder's pixel format.
+        """
+        return self._nextFrame() is not None
+
+    def read(self, image: np.ndarray = None) -> tuple[bool, np.ndarray]:
+        """
+        Decodes the next frame, copying it straight out of FFmpeg's buffer into the given buffer when it
+        has the right shape, or into a newly allocated one otherwise.
+        """
+        frame = self._nextFrame()
+        if frame is None:
+            return False, None
+
+        width, height = self._size
+        shape = (height, width, self._channels) if self._channels > 1 else (height, width)
+        if image is None or image.shape != shape or image.dtype != np.uint8:
+            image = np.empty(shape, dtype=np.uint8)
+
+        plane = frame.reformat(width, height, self._format).planes[0]
+        rows = np.frombuffer(plane, dtype=np.uint8).reshape(height, plane.line_size)
+        np.copyto(image, rows[:, :width * self._channels].reshape(shape))
+        return True, image
+
+    def release(self) -> None:
+        if self._container is not None:
+            self._container.close()
+            self._container = None
+
+
+def outputSize(width: int, height: int, scale: float) -> tuple[int, int]:
+    """
+    Returns the dimensions of frames shrunk by the given factor, kept even for the benefit of FFmpeg's scaler.
+
+    parameters:
+        width (int): Width of the source frames.
+        height (int): Height of the source frames.
+        scale (float): Factor by which to shrink the frames.
+    """
+    if scale == 1.0:
+        return (width, height)
+    return (max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2))
+
+def openCapture(filePath: str, backend: Backend = Backend.OPENCV, scale: float = 1.0, grayscale: bool = False):
+    """
+    Opens a video file with the given decoding backend.
+
+    parameters:
+        filePath (str): Path to the video file.
+        backend (Backend): The library used to decode the video.
+        scale (float): Factor by which to shrink decoded frames.
+        grayscale (bool): Whether to decode frames to a single grayscale channel.
+    returns:
+        A capture object with the cv.VideoCapture get/set/read/grab interface.
+    """
+    if backend == Backend.PYAV:
+        return PyAVCapture(filePath, scale, grayscale)
+    if scale == 1.0 and not grayscale:
+        return cv.VideoCapture(filePath)
+    return OpenCVCapture(filePath, scale, grayscale)
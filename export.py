@@ -0,0 +1,194 @@
+import os
+import numpy as np
+from library import *
+from Model import Model, Video
+from decoders import EmptyCapture
+
+# Columns holding one row per tracked point, across both views of every delivery
+POINT_COLUMNS = ("pointDelivery", "pointView", "pointX", "pointY", "pointRadius", "pointFrame", "pointTime")
+# Version of the layout of delivery files, stored in each file written
+EXPORT_FORMAT_VERSION = 2
+# Version of files written before the layout was versioned
+LEGACY_FORMAT_VERSION = 1
+
+def deliveryColumns(model: Model) -> dict[str, np.ndarray]:
+    """
+    Flattens the tracked points and prediction of a model into columns for a single delivery.
+    Point times are stored relative to the moment the videos were linked.
+
+    parameters:
+        model (Model): A model which has made a prediction.
+    returns:
+        dict[str, np.ndarray]: The columns of the delivery, keyed by name.
+    """
+    prediction = model.getPrediction()
+    if prediction is None:
+        raise ValueError("Must make a prediction before exporting a delivery.")
+
+    points = {name: [] for name in POINT_COLUMNS}
+    for view in View:
+        video = model.getVideo(view)
+        viewPoints = video.getPoints()
+        points["pointView"].append(np.full(len(viewPoints), view.value, dtype=np.int8))
+        points["pointX"].append(np.array([point[0] for point in viewPoints], dtype=np.float32))
+        points["pointY"].append(np.array([point[1] for point in viewPoints], dtype=np.float32))
+        points["pointRadius"].append(np.array([point[2] for point in viewPoints], dtype=np.float32))
+        points["pointFrame"].append(np.array([point[3] for point in viewPoints], dtype=np.int32))
+        points["pointTime"].append(video.getPointTimes() - model.getLinkTime(view))
+    columns = {name: np.concatenate(values) for name, values in points.items() if values}
+    columns["pointDelivery"] = np.zeros(len(columns["pointX"]), dtype=np.int32)
+
+    columns.update({
+        "frontPath": np.array([model.getVideo(View.FRONT).getFilePath()]),
+        "sidePath": np.array([model.getVideo(View.SIDE).getFilePath()]),
+        "stumpPosition": np.array([model.getStumpPosition()], dtype=np.int32),
+        "line": np.array([prediction.line], dtype=np.int32),
+        "height": np.array([prediction.height], dtype=np.int32),
+        "impactTime": np.array([prediction.impactTime], dtype=np.float64),
+        "frontBounce": np.array([prediction.frontBounce], dtype=np.int32),
+        "sideBounce": np.array([prediction.sideBounce], dtype=np.int32),
+        "frontBounceConfidence": np.array([prediction.frontBounceConfidence], dtype=np.float64),
+        "sideBounceConfidence": np.array([prediction.sideBounceConfidence], dtype=np.float64),
+        "progressInliers": np.array([prediction.progressInliers], dtype=np.int32),
+        "lineInliers": np.array([prediction.lineInliers], dtype=np.int32),
+        "heightInliers": np.array([prediction.heightInliers], dtype=np.int32),
+        "progressResidual": np.array([prediction.progressResidual], dtype=np.float64),
+        "lineResidual": np.array([prediction.lineResidual], dtype=np.float64),
+        "heightResidual": np.array([prediction.heightResidual], dtype=np.float64),
+        "lineInterval": np.array([prediction.lineInterval or (np.nan, np.nan)], dtype=np.float64),
+        "heightInterval": np.array([prediction.heightInterval or (np.nan, np.nan)], dtype=np.float64),
+        "progressCoefficients": np.array([prediction.progressCoefficients], dtype=np.float64),
+        "lineCoefficients": np.array([prediction.lineCoefficients], dtype=np.float64),
+        "heightCoefficients": np.array([prediction.heightCoefficients], dtype=np.float64),
+    })
+    return columns
+
+def exportDelivery(model: Model, path: str) -> int:
+    """
+    Appends the tracked trajectories and prediction of a model to a columnar NPZ file, creating it if
+    it does not exist. The file is replaced atomically so an interrupted export never corrupts it, which
+    means every export rewrites the whole file. Columns which only one of the file and the delivery has
+    are filled with NaN, or empty strings, for the rows which lack them.
+
+    parameters:
+        model (Model): A model which has made a prediction.
+        path (str): Path to the NPZ file.
+    returns:
+        int: Index of the delivery within the file.
+    """
+    columns = deliveryColumns(model)
+    index = 0
+    if os.path.exists(path):
+        existing = loadDeliveries(path)
+        version = int(existing.pop("formatVersion", LEGACY_FORMAT_VERSION))
+        if version > EXPORT_FORMAT_VERSION:
+            raise ValueError(f"Delivery file was written by a newer version (format {version}).")
+        if "line" not in existing or "pointX" not in existing:
+            raise ValueError(f"{path} is not a delivery file.")
+        index = len(existing["line"])
+        columns["pointDelivery"] += index
+        columns = _appendColumns(existing, columns)
+
+    temporaryPath = path + ".tmp"
+    with open(temporaryPath, "wb") as file:
+        np.savez_compressed(file, formatVersion=np.array(EXPORT_FORMAT_VERSION), **columns)
+    os.replace(temporaryPath, path)
+    return index
+
+def _appendColumns(existing: dict[str, np.ndarray], columns: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    """
+    Appends the columns of a delivery to the columns of a file, filling columns missing from either.
+    """
+    rows = {
+        "existing": (len(existing["line"]), len(existing["pointX"])),
+        "new": (len(columns["line"]), len(columns["pointX"])),
+    }
+    appended = {}
+    for name in dict.fromkeys([*existing, *columns]):
+        template = columns[name] if name in columns else existing[name]
+        parts = []
+        for source, key in ((existing, "existing"), (columns, "new")):
+            deliveries, points = rows[key]
+            parts.append(source[name] if name in source else _missingColumn(template, points if name.startswith("point") else deliveries))
+        appended[name] = np.concatenate(parts)
+    return appended
+
+def _missingColumn(template: np.ndarray, rows: int) -> np.ndarray:
+    """
+    Returns a column shaped like the given column for rows which have no value, NaN for numbers and an
+    empty string for text.
+    """
+    shape = (rows, *template.shape[1:])
+    if template.dtype.kind in "US":
+        return np.full(shape, "", dtype=template.dtype)
+    return np.full(shape, np.nan)
+
+def loadDeliveries(path: str) -> dict[str, np.ndarray]:
+    """
+    Loads every column of an exported delivery file for bulk analysis.
+
+    parameters:
+        path (str): Path to the NPZ file.
+    returns:
+        dict[str, np.ndarray]: The columns, keyed by name. Point columns are aligned with each other and
+            delivery columns have one row per delivery.
+    """
+    with np.load(path, allow_pickle=False) as data:
+        return {name: data[name] for name in data.files}
+
+def restoreModel(columns: dict[str, np.ndarray], delivery: int, ballColour: tuple[int] = (0, 0, 0), openVideos: bool = False) -> Model:
+    """
+    Rebuilds the state of a Model for one exported delivery without decoding either video. Deliveries
+    whose point times are missing, such as from files written before times were exported, are paired
+    by frame index instead.
+
+    parameters:
+        columns (dict[str, np.ndarray]): Columns loaded with loadDeliveries.
+        delivery (int): Index of the delivery to restore.
+        ballColour (tuple[int]): RGB colour of the ball to track if tracking is resumed.
+        openVideos (bool): Whether to open the source videos so that their frames can be shown or tracking
+            resumed. Otherwise the videos need not exist.
+    returns:
+        Model: A model with the tracked points and prediction of the delivery.
+    """
+    rows = {view: (columns["pointDelivery"] == delivery) & (columns["pointView"] == view.value) for view in View}
+    times = {view: columns["pointTime"][rows[view]].astype(np.float64) for view in View}
+    if not all(np.isfinite(viewTimes).all() for viewTimes in times.values()):
+        # Both views are given the same frame interval, so frames with the same index are paired
+        times = {view: columns["pointFrame"][rows[view]] * DEFAULT_FRAME_INTERVAL for view in View}
+
+    videos = {}
+    for view, pathColumn in ((View.FRONT, "frontPath"), (View.SIDE, "sidePath")):
+        points = list(zip(
+            columns["pointX"][rows[view]].tolist(),
+            columns["pointY"][rows[view]].tolist(),
+            columns["pointRadius"][rows[view]].tolist(),
+            columns["pointFrame"][rows[view]].tolist(),
+        ))
+        path = str(columns[pathColumn][delivery])
+        videos[view] = Video(path, ballColour) if openVideos else Video(path, ballColour, opener=EmptyCapture)
+        videos[view].restoreTracking(points, times[view].tolist())
+
+    prediction = Prediction(
+        line=int(columns["line"][delivery]),
+        height=int(columns["height"][delivery]),
+        impactTime=float(columns["impactTime"][delivery]),
+        frontBounce=int(columns["frontBounce"][delivery]),
+        sideBounce=int(columns["sideBounce"][delivery]),
+        progressCoefficients=tuple(columns["progressCoefficients"][delivery].tolist()),
+        lineCoefficients=tuple(columns["lineCoefficients"][delivery].tolist()),
+        heightCoefficients=tuple(columns["heightCoefficients"][delivery].tolist()),
+        frontBounceConfidence=float(columns["frontBounceConfidence"][delivery]),
+        sideBounceConfidence=float(columns["sideBounceConfidence"][delivery]),
+        progressInliers=int(columns["progressInliers"][delivery]),
+        lineInliers=int(columns["lineInliers"][delivery]),
+        heightInliers=int(columns["heightInliers"][delivery]),
+        progressResidual=float(columns["progressResidual"][delivery]),
+        lineResidual=float(columns["lineResidual"][delivery]),
+        heightResidual=float(columns["heightResidual"][delivery]),
+        lineInterval=tuple(columns["lineInterval"][delivery].tolist()),
+        heightInterval=tuple(columns["heightInterval"][delivery].tolist()),
+    )
+    model = Model(videos[View.FRONT], videos[View.SIDE])
+    model.restore(int(columns["stumpPosition"][delivery]), prediction)
+    return model
@@ -0,0 +1,265 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from dataclasses import dataclass
+from library import *
+
+# Number of points in the rolling median used to spot outlying detections
+OUTLIER_WINDOW = 5
+# Number of (scaled) median absolute deviations from the rolling median beyond which a point is an outlier
+OUTLIER_THRESHOLD = 4
+# Smallest deviation in pixels assumed when rejecting outliers, so clean tracks do not lose points to rounding
+MIN_DEVIATION = 1.0
+# Fewest points either side of a bounce, including the bounce itself, which a parabola is fitted through
+BOUNCE_MIN_SEGMENT = 3
+# Smallest fraction of the error of a single parabola which splitting at a bounce must remove
+BOUNCE_MIN_IMPROVEMENT = 0.5
+# Number of random minimal samples tried by a RANSAC fit
+RANSAC_TRIALS = 200
+# Smallest distance in pixels from a RANSAC candidate at which a point still counts as an inlier
+RANSAC_THRESHOLD = 2.0
+# Seed for RANSAC sampling so that repeated fits of the same points agree
+RANSAC_SEED = 0
+# Seed for bootstrap resampling so that repeated predictions from the same points agree
+BOOTSTRAP_SEED = 0
+# Number of scaled median absolute deviations beyond which the Huber loss becomes linear
+HUBER_THRESHOLD = 1.345
+# Maximum number of reweighting passes of a Huber fit
+HUBER_ITERATIONS = 20
+
+@dataclass
+class Fit:
+    coefficients: np.ndarray
+    covariance: np.ndarray
+    inliers: np.ndarray
+    residuals: np.ndarray
+    xs: np.ndarray = None
+    ys: np.ndarray = None
+
+    def inlierCount(self) -> int:
+        """
+        Returns the number of points the fit was made from.
+        """
+        return int(np.count_nonzero(self.inliers))
+
+    def residualError(self) -> float:
+        """
+        Returns the root mean square distance of the inliers from the fit.
+        """
+        if not np.any(self.inliers):
+            return 0.0
+        return float(np.sqrt(np.mean(self.residuals[self.inliers] ** 2)))
+
+    def evaluate(self, x: float) -> float:
+        """
+        Returns the value of the fitted polynomial at x.
+        """
+        return float(np.polyval(self.coefficients, x))
+
+    def slope(self, x: float) -> float:
+        """
+        Returns the derivative of the fitted polynomial at x.
+        """
+        return float(np.polyval(np.polyder(self.coefficients), x))
+
+    def variance(self, x: float) -> float:
+        """
+        Returns the variance of the fitted value at x propagated from the covariance of the coefficients.
+        """
+        gradient = np.vander([x], len(self.coefficients))[0]
+        return float(gradient @ self.covariance @ gradient)
+
+def rejectOutliers(ys: np.ndarray) -> np.ndarray:
+    """
+    Flags points which are far from the rolling median of their neighbours. Distances are judged against
+    the typical movement between consecutive points, so genuine turns such as a bounce are kept.
+
+    parameters:
+        ys (np.ndarray): The values to check, in order.
+    returns:
+        np.ndarray: A boolean mask which is True for points to keep.
+    """
+    if len(ys) < OUTLIER_WINDOW:
+        return np.ones(len(ys), dtype=bool)
+    padded = np.pad(ys, OUTLIER_WINDOW // 2, mode="edge")
+    medians = np.median(sliding_window_view(padded, OUTLIER_WINDOW), axis=1)
+    residuals = np.abs(ys - medians)
+    deviation = max(np.median(residuals) * 1.4826, np.median(np.abs(np.diff(ys))), MIN_DEVIATION)
+    return residuals <= OUTLIER_THRESHOLD * deviation
+
+def _segmentFits(sums: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the coefficients (highest power first) and squared error of the least squares parabola through
+    each segment, given the segment sums of [1, x, x^2, x^3, x^4, y, x*y, x^2*y, y*y] along the last axis.
+    Segments whose parabola is not determined have NaN coefficients and an infinite error.
+    """
+    n, sx, sxx, sx3, sx4, sy, sxy, sxxy, syy = np.moveaxis(sums, -1, 0)
+    normal = np.stack((np.stack((sx4, sx3, sxx), -1), np.stack((sx3, sxx, sx), -1), np.stack((sxx, sx, n), -1)), -2)
+    moment = np.stack((sxxy, sxy, sy), -1)
+    coefficients = np.full(moment.shape, np.nan)
+    errors = np.full(n.shape, np.inf)
+    solvable = np.abs(np.linalg.det(normal)) > 1e-9
+    if np.any(solvable):
+        coefficients[solvable] = np.linalg.solve(normal[solvable], moment[solvable][..., None])[..., 0]
+        errors[solvable] = np.maximum(syy[solvable] - np.sum(coefficients[solvable] * moment[solvable], axis=-1), 0.0)
+    return coefficients, errors
+
+def findBounce(xs: np.ndarray, ys: np.ndarray) -> tuple[int, float]:
+    """
+    Finds the bounce in a trajectory as the point where the vertical velocity changes sign. Outlying
+    detections are discarded, then every split point is scored at once by fitting a parabola either side
+    of it from cumulative sums. The best split where the ball is falling as it reaches the split and rising
+    as it leaves wins, so a rebound which rises and then falls again is still found.
+
+    parameters:
+        xs (np.ndarray): Time (or frame) of each point, in increasing order.
+        ys (np.ndarray): Vertical image position of each point, increasing downwards.
+    returns:
+        tuple[int, float]: Index of the bounce point (0 if no bounce was found) and a confidence between 0 and 1.
+    """
+    xs, ys = np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64)
+    if len(ys) < 2 * BOUNCE_MIN_SEGMENT - 1:
+        return (0, 0.0)
+    inliers = np.flatnonzero(rejectOutliers(ys))
+    x, y = xs[inliers], ys[inliers]
+    if len(y) < 2 * BOUNCE_MIN_SEGMENT - 1:
+        return (0, 0.0)
+
+    # Times are centred and scaled so that the sums of their fourth powers stay well conditioned
+    span = x[-1] - x[0] if x[-1] > x[0] else 1.0
+    x = (x - x.mean()) / span
+    terms = np.stack((np.ones_like(x), x, x ** 2, x ** 3, x ** 4, y, x * y, x ** 2 * y, y * y), axis=1)
+    prefix = np.cumsum(terms, axis=0)
+    total = prefix[-1]
+
+    # Split k shares point k between the falling segment [0, k] and the rising segment [k, end]
+    splits = np.arange(BOUNCE_MIN_SEGMENT - 1, len(y) - BOUNCE_MIN_SEGMENT + 1)
+    fitBefore, errorBefore = _segmentFits(prefix[splits])
+    fitAfter, errorAfter = _segmentFits(total - prefix[splits - 1])
+    at = x[splits]
+    with np.errstate(invalid="ignore"):
+        slopeBefore = 2 * fitBefore[:, 0] * at + fitBefore[:, 1]
+        slopeAfter = 2 * fitAfter[:, 0] * at + fitAfter[:, 1]
+        errors = np.where((slopeBefore > 0) & (slopeAfter < 0), errorBefore + errorAfter, np.inf)
+
+    best = int(np.argmin(errors))
+    if not np.isfinite(errors[best]):
+        return (0, 0.0)
+
+    _, singleError = _segmentFits(total)
+    improvement = 1 - errors[best] / singleError if 0 < singleError < np.inf else 0.0
+    # A split which barely beats one parabola is noise at the end of a fall rather than a bounce
+    if improvement < BOUNCE_MIN_IMPROVEMENT:
+        return (0, 0.0)
+    confidence = float(np.clip(improvement, 0, 1) * len(inliers) / len(ys))
+    return (int(inliers[splits[best]]), confidence)
+
+def fitTrajectory(xs: np.ndarray, ys: np.ndarray, degree: int, mode: FitMode = FitMode.STANDARD) -> Fit:
+    """
+    Fits a polynomial to a tracked trajectory.
+
+    parameters:
+        xs (np.ndarray): Time of each point.
+        ys (np.ndarray): Position of each point.
+        degree (int): Degree of the polynomial, 1 for a line and 2 for a parabola.
+        mode (FitMode): Ordinary least squares, or a robust fit which tolerates outlying detections.
+    returns:
+        Fit: The coefficients (highest power first), their covariance, and which points were inliers.
+    """
+    xs, ys = np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64)
+    design = np.vander(xs, degree + 1)
+    if mode == FitMode.RANSAC:
+        inliers = _ransacInliers(design, ys)
+        weights = inliers.astype(np.float64)
+    elif mode == FitMode.HUBER:
+        weights = _huberWeights(design, ys)
+        inliers = weights >= 1
+    else:
+        weights = np.ones(len(ys))
+        inliers = np.ones(len(ys), dtype=bool)
+    fit = _weightedFit(design, ys, weights, inliers)
+    fit.xs, fit.ys = xs, ys
+    return fit
+
+def bootstrapFit(fit: Fit, samples: int, seed: int = BOOTSTRAP_SEED) -> np.ndarray:
+    """
+    Refits the inliers of a fit to many resamplings of themselves at once, solving every replicate's
+    normal equations in a single batched solve.
+
+    parameters:
+        fit (Fit): The fit to bootstrap.
+        samples (int): Number of bootstrap replicates.
+        seed (int): Seed for the resampling.
+    returns:
+        np.ndarray: Coefficients of each replicate shaped (samples, degree + 1), NaN where a replicate
+            did not have enough distinct points to fit.
+    """
+    xs, ys = fit.xs[fit.inliers], fit.ys[fit.inliers]
+    size = len(fit.coefficients)
+    picks = np.random.default_rng(seed).integers(0, len(xs), (samples, len(xs)))
+    design = np.vander(xs, size)[picks]
+    normal = np.einsum("bni,bnj->bij", design, design)
+    moment = np.einsum("bni,bn->bi", design, ys[picks])
+
+    coefficients = np.full((samples, size), np.nan)
+    solvable = np.abs(np.linalg.det(normal)) > 1e-12
+    if np.any(solvable):
+        coefficients[solvable] = np.linalg.solve(normal[solvable], moment[solvable][..., None])[..., 0]
+    return coefficients
+
+def _weightedFit(design: np.ndarray, ys: np.ndarray, weights: np.ndarray, inliers: np.ndarray) -> Fit:
+    """
+    Solves the weighted least squares problem and estimates the covariance of the coefficients from the
+    scatter of the weighted residuals, as curve_fit does.
+    """
+    root = np.sqrt(weights)
+    coefficients = np.linalg.lstsq(design * root[:, None], ys * root, rcond=None)[0]
+    residuals = ys - design @ coefficients
+
+    freedom = np.count_nonzero(weights) - design.shape[1]
+    if freedom > 0:
+        variance = np.sum(weights * residuals ** 2) / freedom
+        covariance = variance * np.linalg.pinv(design.T @ (design * weights[:, None]))
+    else:
+        covariance = np.full((design.shape[1], design.shape[1]), np.inf)
+    return Fit(coefficients, covariance, inliers, residuals)
+
+def _ransacInliers(design: np.ndarray, ys: np.ndarray) -> np.ndarray:
+    """
+    Finds the largest set of points consistent with one polynomial by fitting many minimal random samples
+    at once and counting the points each explains.
+    """
+    count, size = design.shape
+    if count <= size:
+        return np.ones(count, dtype=bool)
+
+    rng = np.random.default_rng(RANSAC_SEED)
+    samples = np.argsort(rng.random((RANSAC_TRIALS, count)), axis=1)[:, :size]
+    systems = design[samples]
+    solvable = np.abs(np.linalg.det(systems)) > 1e-12
+    if not np.any(solvable):
+        return np.ones(count, dtype=bool)
+    candidates = np.linalg.solve(systems[solvable], ys[samples[solvable]][..., None])[..., 0]
+
+    errors = np.abs(candidates @ design.T - ys)
+    threshold = max(np.median(np.abs(np.diff(ys))) / 2, RANSAC_THRESHOLD)
+    consistent = errors <= threshold
+    # Prefer the candidate explaining the most points, then the one explaining them most closely
+    score = consistent.sum(axis=1) - np.where(consistent, errors, 0).sum(axis=1) / (threshold * count + 1)
+    inliers = consistent[np.argmax(score)]
+    return inliers if np.count_nonzero(inliers) >= size else np.ones(count, dtype=bool)
+
+def _huberWeights(design: np.ndarray, ys: np.ndarray) -> np.ndarray:
+    """
+    Returns the weights of the Huber loss found by iteratively reweighted least squares, which are 1 for
+    points near the fit and shrink in proportion to the distance of those further away.
+    """
+    weights = np.ones(len(ys))
+    for _ in range(HUBER_ITERATIONS):
+        fit = _weightedFit(design, ys, weights, weights >= 1)
+        scale = max(np.median(np.abs(fit.residuals)) * 1.4826, MIN_DEVIATION)
+        limit = HUBER_THRESHOLD * scale
+        updated = np.minimum(1.0, limit / np.maximum(np.abs(fit.residuals), 1e-12))
+        if np.allclose(updated, weights):
+            break
+        weights = updated
+    return weights
@@ -0,0 +1,294 @@
+import os
+import csv
+import time
+import argparse
+import itertools
+import numpy as np
+import cv2 as cv
+from dataclasses import dataclass, fields, replace
+from concurrent.futures import ProcessPoolExecutor
+from library import *
+from Model import Model, Video
+from profiling import profiled
+
+# Name of the file in a dataset directory listing each delivery and its ground truth
+LABELS_FILE = "labels.csv"
+# Largest error in pixels at which a predicted line or height still counts as correct
+DEFAULT_TOLERANCE = 10
+# Fraction of deliveries which must be predicted correctly for a parameter sweep to accept a setting
+DEFAULT_ACCURACY_TARGET = 0.9
+
+@dataclass
+class Delivery:
+    name: str
+    frontPath: str
+    sidePath: str
+    stumpPosition: int
+    line: int
+    height: int
+    offset: float = None
+    ballColour: tuple[int, int, int] = (0, 0, 0)
+
+@dataclass
+class DeliveryResult:
+    name: str
+    line: int = None
+    height: int = None
+    lineError: float = np.nan
+    heightError: float = np.nan
+    latency: float = 0.0
+    frames: int = 0
+    error: str = None
+
+@dataclass
+class HarnessReport:
+    results: list[DeliveryResult]
+    wallTime: float
+    tolerance: float = DEFAULT_TOLERANCE
+
+    def accuracy(self) -> float:
+        """
+        Returns the fraction of deliveries whose line and height were both predicted within the tolerance.
+        """
+        if len(self.results) == 0:
+            return 0.0
+        correct = [result.lineError <= self.tolerance and result.heightError <= self.tolerance for result in self.results]
+        return float(np.mean(correct))
+
+    def failures(self) -> int:
+        """
+        Returns the number of deliveries for which no prediction could be made.
+        """
+        return sum(result.error is not None for result in self.results)
+
+    def meanErrors(self) -> tuple[float, float]:
+        """
+        Returns the mean line and height errors in pixels over the deliveries which were predicted.
+        """
+        predicted = [result for result in self.results if result.error is None]
+        if len(predicted) == 0:
+            return (np.nan, np.nan)
+        return (float(np.mean([result.lineError for result in predicted])), float(np.mean([result.heightError for result in predicted])))
+
+    def latencies(self) -> tuple[float, float]:
+        """
+        Returns the median and 95th percentile time taken to process one delivery in seconds.
+        """
+        if len(self.results) == 0:
+            return (0.0, 0.0)
+        latencies = [result.latency for result in self.results]
+        return (float(np.median(latencies)), float(np.percentile(latencies, 95)))
+
+    def throughput(self) -> tuple[float, float]:
+        """
+        Returns the number of deliveries and frames processed per second of wall time.
+        """
+        if self.wallTime <= 0:
+            return (0.0, 0.0)
+        return (len(self.results) / self.wallTime, sum(result.frames for result in self.results) / self.wallTime)
+
+    def summary(self) -> str:
+        """
+        Returns a human readable summary of the report.
+        """
+        lineError, heightError = self.meanErrors()
+        median, slowest = self.latencies()
+        deliveries, frames = self.throughput()
+        return "\n".join((
+            f"Deliveries: {len(self.results)} ({self.failures()} failed)",
+            f"Accuracy within {self.tolerance:g} px: {self.accuracy():.1%}",
+            f"Mean error: line {lineError:.1f} px, height {heightError:.1f} px",
+            f"Latency: median {median * 1000:.0f} ms, p95 {slowest * 1000:.0f} ms",
+            f"Throughput: {deliveries:.2f} deliveries/s, {frames:.0f} frames/s",
+        ))
+
+def loadDataset(directory: str) -> list[Delivery]:
+    """
+    Loads the deliveries of a dataset directory. The directory holds the clips and a labels.csv file with
+    the columns name, front, side, stump, line and height, and optionally offset (milliseconds to add to
+    a front timestamp to get the side timestamp of the same instant) and ball colour as r, g and b.
+
+    parameters:
+        directory (str): Path to the dataset directory.
+    returns:
+        list[Delivery]: The deliveries, with clip paths resolved against the directory.
+    """
+    deliveries = []
+    with open(os.path.join(directory, LABELS_FILE), newline="") as file:
+        for row in csv.DictReader(file):
+            offset = row.get("offset")
+            colour = tuple(int(row[channel]) for channel in "rgb") if all(row.get(channel) for channel in "rgb") else (0, 0, 0)
+            deliveries.append(Delivery(
+                name=row["name"],
+                frontPath=os.path.join(directory, row["front"]),
+                sidePath=os.path.join(directory, row["side"]),
+                stumpPosition=int(row["stump"]),
+                line=int(row["line"]),
+                height=int(row["height"]),
+                offset=float(offset) if offset else None,
+                ballColour=colour,
+            ))
+    return deliveries
+
+def evaluateDelivery(delivery: Delivery, parameters: Parameters = None, fitMode: FitMode = FitMode.STANDARD) -> DeliveryResult:
+    """
+    Runs the headless tracking and prediction pipeline over one delivery, tracking every frame of both
+    clips from the first.
+
+    parameters:
+        delivery (Delivery): The delivery to evaluate.
+        parameters (Parameters): Ball tracking parameters for both views, defaults to defaultParameters().
+        fitMode (FitMode): How trajectories are fitted.
+    returns:
+        DeliveryResult: The prediction, its errors against the ground truth, and the time taken.
+    """
+    start = time.perf_counter()
+    result = DeliveryResult(delivery.name)
+    try:
+        frontVideo = Video(delivery.frontPath, delivery.ballColour, trackingOnly=True)
+        sideVideo = Video(delivery.sidePath, delivery.ballColour, trackingOnly=True)
+        model = Model(frontVideo, sideVideo)
+        for view in View:
+            model.updateParameters(view, parameters or defaultParameters())
+        model.setFitMode(fitMode)
+        if not (frontVideo.incrementFrame() and sideVideo.incrementFrame()):
+            raise ValueError("Could not read the first frame of both clips.")
+        model.linkVideos(delivery.offset)
+        model.startTracking(View.FRONT)
+        while model.incrementFrame(View.FRONT):
+            pass
+        model.setStumpPosition(delivery.stumpPosition)
+
+        prediction = model.makePrediction()
+        result.line, result.height = prediction.line, prediction.height
+        result.lineError = float(abs(prediction.line - delivery.line))
+        result.heightError = float(abs(prediction.height - delivery.height))
+        result.frames = frontVideo.getFrameCount() + sideVideo.getFrameCount()
+    except (ValueError, OSError, cv.error, np.linalg.LinAlgError) as e:
+        # One bad clip or parameter combination fails its own delivery rather than the whole run
+        result.error = str(e) or type(e).__name__
+        result.lineError = result.heightError = np.inf
+    result.latency = time.perf_counter() - start
+    return result
+
+def evaluateDeliveries(deliveries: list[Delivery], parameters: Parameters = None, fitMode: FitMode = FitMode.STANDARD,
+        workers: int = None, tolerance: float = DEFAULT_TOLERANCE) -> HarnessReport:
+    """
+    Evaluates many deliveries in parallel, one process per delivery at a time.
+
+    parameters:
+        deliveries (list[Delivery]): The deliveries to evaluate.
+        parameters (Parameters): Ball tracking parameters for both views, defaults to defaultParameters().
+        fitMode (FitMode): How trajectories are fitted.
+        workers (int): Number of processes, defaults to the number of CPUs. 1 evaluates in this process.
+        tolerance (float): Largest error in pixels counted as correct.
+    returns:
+        HarnessReport: The result of every delivery, in the given order.
+    """
+    start = time.perf_counter()
+    count = len(deliveries)
+    if workers == 1 or count <= 1:
+        results = [evaluateDelivery(delivery, parameters, fitMode) for delivery in deliveries]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(evaluateDelivery, deliveries, [parameters] * count, [fitMode] * count))
+    return HarnessReport(results, time.perf_counter() - start, tolerance)
+
+def parameterGrid(grid: dict[str, list]) -> list[Parameters]:
+    """
+    Expands lists of values for some Parameters fields into every combination, with the remaining fields
+    left at their defaults.
+
+    parameters:
+        grid (dict[str, list]): Values to try, keyed by Parameters field name.
+    returns:
+        list[Parameters]: Every combination of the given values.
+    """
+    names = {field.name for field in fields(Parameters)}
+    unknown = set(grid) - names
+    if unknown:
+        raise ValueError(f"Unknown parameters: {', '.join(sorted(unknown))}")
+    keys = list(grid)
+    return [replace(defaultParameters(), **dict(zip(keys, values))) for values in itertools.product(*(grid[key] for key in keys))]
+
+def sweepParameters(deliveries: list[Delivery], grid: dict[str, list], target: float = DEFAULT_ACCURACY_TARGET,
+        workers: int = None, tolerance: float = DEFAULT_TOLERANCE, fitMode: FitMode = FitMode.STANDARD) -> tuple[Parameters | None, list[tuple[Parameters, HarnessReport]]]:
+    """
+    Evaluates every combination of parameter values and picks the cheapest setting which meets the
+    accuracy target, judged by the median time taken per delivery.
+
+    parameters:
+        deliveries (list[Delivery]): The deliveries to evaluate.
+        grid (dict[str, list]): Values to try, keyed by Parameters field name.
+        target (float): Fraction of deliveries which must be predicted within the tolerance.
+        workers (int): Number of processes used for each evaluation.
+        tolerance (float): Largest error in pixels counted as correct.
+        fitMode (FitMode): How trajectories are fitted.
+    returns:
+        tuple: The cheapest accepted parameters (None if no setting met the target), and every setting
+            with its report.
+    """
+    reports = [(parameters, evaluateDeliveries(deliveries, parameters, fitMode, workers, tolerance)) for parameters in parameterGrid(grid)]
+    accepted = [(report.latencies()[0], i) for i, (_, report) in enumerate(reports) if report.accuracy() >= target]
+    if len(accepted) == 0:
+        return (None, reports)
+    return (reports[min(accepted)[1]][0], reports)
+
+def parseSweep(values: list[str]) -> dict[str, list]:
+    """
+    Parses sweep options of the form name=value,value,... into a parameter grid.
+    """
+    types = {field.name: field.type for field in fields(Parameters)}
+    grid = {}
+    for value in values:
+        name, _, options = value.partition("=")
+        if name not in types or not options:
+            raise ValueError(f"Invalid sweep option: {value}")
+        grid[name] = [types[name](option) for option in options.split(",")]
+    return grid
+
+def main(argv: list[str] = None) -> None:
+    """
+    Evaluates a dataset from the command line, optionally sweeping the tracking parameters.
+    """
+    parser = argparse.ArgumentParser(description="Measure the accuracy and speed of Backyard DRS over labelled deliveries")
+    parser.add_argument("dataset", help=f"directory holding the clips and {LABELS_FILE}")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes, defaults to the number of CPUs")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="largest error in pixels counted as correct")
+    parser.add_argument("--fit-mode", choices=[mode.name.lower() for mode in FitMode], default=FitMode.STANDARD.name.lower(),
+        help="how trajectories are fitted")
+    parser.add_argument("--sweep", nargs="+", metavar="NAME=V1,V2", default=[],
+        help="parameter values to sweep, such as param2=20,30,40")
+    parser.add_argument("--target", type=float, default=DEFAULT_ACCURACY_TARGET, help="accuracy a swept setting must reach")
+    parser.add_argument("--profile", default=None, metavar="PATH",
+        help="evaluate in this process and write collapsed stacks for a flame graph to PATH, with a summary of hot functions beside it")
+    arguments = parser.parse_args(argv)
+    if arguments.profile is None:
+        run(arguments)
+        return
+    # Only this process is sampled, so deliveries must not be handed to worker processes
+    arguments.workers = 1
+    with profiled(arguments.profile):
+        run(arguments)
+
+def run(arguments: argparse.Namespace) -> None:
+    """
+    Evaluates or sweeps a dataset with the parsed command line options.
+    """
+    deliveries = loadDataset(arguments.dataset)
+    if not arguments.sweep:
+        report = evaluateDeliveries(deliveries, fitMode=FitMode[arguments.fit_mode.upper()], workers=arguments.workers, tolerance=arguments.tolerance)
+        for result in report.results:
+            outcome = result.error or f"line {result.line} (off by {result.lineError:.0f}), height {result.height} (off by {result.heightError:.0f})"
+            print(f"{result.name}: {outcome} in {result.latency * 1000:.0f} ms")
+        print(report.summary())
+        return
+
+    best, reports = sweepParameters(deliveries, parseSweep(arguments.sweep), arguments.target, arguments.workers, arguments.tolerance,
+        FitMode[arguments.fit_mode.upper()])
+    for parameters, report in reports:
+        print(f"{parameters}: accuracy {report.accuracy():.1%}, median latency {report.latencies()[0] * 1000:.0f} ms")
+    print(f"Cheapest setting meeting {arguments.target:.0%}: {best}" if best is not None else "No setting met the accuracy target.")
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,15 @@ class View(Enum):
     FRONT = 1
     SIDE = 2
 
+class Backend(Enum):
+    OPENCV = "opencv"
+    PYAV = "pyav"
+
+class FitMode(Enum):
+    STANDARD = "Least Squares"
+    RANSAC = "RANSAC"
+    HUBER = "Huber"
+
 class Parameter(Enum):
     BLUR_SQR_SIZE = "Blur Square Size"
     DP = "DP"
@@ -13,6 +22,10 @@ class Parameter(Enum):
     MAX_RADIUS = "Max Radius"
     PARAM1 = "Param1"
     PARAM2 = "Param2"
+    MAX_STEP = "Max Step"
+
+# Largest distance in pixels the ball is expected to move between consecutive frames unless set otherwise
+DEFAULT_MAX_STEP = 150
 
 @dataclass
 class Parameters:
@@ -23,6 +36,7 @@ class Parameters:
     maxRadius: int
     param1: int
     param2: int
+    maxStep: int = DEFAULT_MAX_STEP
 
 @dataclass
 class Render:
@@ -31,17 +45,77 @@ class Render:
     cropRegion: tuple[tuple[int, int], tuple[int, int]] = None
     verticalLines: tuple[int] = ()
     horizontalLines: list[int] = ()
+    verticalBands: list[tuple[int, int]] = ()
+    horizontalBands: list[tuple[int, int]] = ()
+
+
+@dataclass
+class Prediction:
+    line: int
+    height: int
+    impactTime: float
+    frontBounce: int
+    sideBounce: int
+    progressCoefficients: tuple[float]
+    lineCoefficients: tuple[float]
+    heightCoefficients: tuple[float]
+    frontBounceConfidence: float = 0.0
+    sideBounceConfidence: float = 0.0
+    progressInliers: int = 0
+    lineInliers: int = 0
+    heightInliers: int = 0
+    progressResidual: float = 0.0
+    lineResidual: float = 0.0
+    heightResidual: float = 0.0
+    lineInterval: tuple[float, float] = None
+    heightInterval: tuple[float, float] = None
+
+
+@dataclass
+class MemoryUsage:
+    frames: int
+    planes: int
+    caches: int
+    tracking: int
+
+    @property
+    def total(self) -> int:
+        """
+        Returns the total number of bytes used.
+        """
+        return self.frames + self.planes + self.caches + self.tracking
+
+
+@dataclass
+class VideoState:
+    """
+    The state of a video read on the worker thread, so the Tk thread never reads a video being changed.
+    """
+    frameIndex: int | None
+    timestamp: float | None
+    memoryUsage: MemoryUsage
+    memoryLimit: int | None
 
 
 @dataclass
 class Callbacks:
     incrementFrame: callable
+    togglePlayback: callable
+    skipToDelivery: callable
     updateParameters: callable
+    setRefinement: callable
+    addTuningClick: callable
+    autoTune: callable
     cropRegion: callable
     startTracking: callable
     setStumpPosition: callable
     makePrediction: callable
+    exportDelivery: callable
+    exportReplay: callable
+    saveSession: callable
     linkVideos: callable
+    setFitMode: callable
+    autoLink: callable
 
 def defaultParameters() -> Parameters:
     """
@@ -57,10 +131,62 @@ def defaultParameters() -> Parameters:
         minRadius=10,
         maxRadius=30,
         param1=100,
-        param2=30
+        param2=30,
+        maxStep=DEFAULT_MAX_STEP
     )
 
-dist = lambda x1,x2,y1,y2: (x1-x2)**2 + (y1-y2)**2
+def scaleParameters(params: Parameters, factor: float) -> Parameters:
+    """
+    Returns ball tracking parameters for frames resized by the given factor, scaling the sizes and
+    distances measured in pixels. The accumulator threshold is scaled too, since a circle gathers votes
+    from edge pixels along its circumference. The blur size is kept odd, as OpenCV requires.
+
+    parameters:
+        params (Parameters): The parameters for frames at their original size.
+        factor (float): Factor by which the frames are resized.
+    returns:
+        Parameters: The parameters for the resized frames.
+    """
+    if factor == 1:
+        return params
+    return Parameters(
+        blurSqrSize=max(1, int(round(params.blurSqrSize * factor)) | 1),
+        dp=params.dp,
+        minDist=max(1, int(round(params.minDist * factor))),
+        minRadius=max(0, int(round(params.minRadius * factor))),
+        maxRadius=max(1, int(round(params.maxRadius * factor))) if params.maxRadius > 0 else params.maxRadius,
+        param1=params.param1,
+        param2=max(1, int(round(params.param2 * factor))),
+        maxStep=max(1, int(round(params.maxStep * factor)))
+    )
+
+# Number of recent frames used to estimate the frame interval of variable frame rate footage
+FRAME_INTERVAL_WINDOW = 16
+# Frame interval in milliseconds assumed when a video reports neither timestamps nor a frame rate
+DEFAULT_FRAME_INTERVAL = 1000 / 30
+
+# Confidence level, in percent, of prediction intervals and the matching number of standard deviations
+CONFIDENCE_LEVEL = 95
+CONFIDENCE_Z = 1.96
+
+# Bytes taken by each number held in a tracked point or timestamp
+POINT_FIELD_BYTES = 24
+
+# Radius, relative to the detected radius, of the patch used to refine a ball centre
+REFINE_REACH = 1.5
+
+# Largest number of candidate circles kept per frame, strongest first
+TRACKING_MAX_CANDIDATES = 8
+# Cost of choosing each weaker candidate over the strongest circle in a frame
+TRACKING_RANK_COST = 0.2
+# Cost of a change in radius between consecutive tracked circles, per unit of relative change
+TRACKING_RADIUS_COST = 0.5
+# Cost of a step between consecutive tracked circles which is longer than the largest expected step
+TRACKING_GATE_COST = 10.0
+# Distance in pixels per frame below which a circle counts as still, such as a round object in the background
+TRACKING_MIN_STEP = 1.0
+# Cost of a step between consecutive tracked circles which is shorter than the smallest step of a moving ball
+TRACKING_STILL_COST = 0.5
 
 def linear(xs: list[float], m: float, c: float) -> list[float]:
     return [m*x + c for x in xs]
@@ -2,6 +2,10 @@ from Model import *
 from View import *
 from Controller import *
 from tkinter import messagebox
+from session import loadSession
+from profiling import profiled
+from server import connectModel, connectSession
+import argparse
 
 def getInitialInformation() -> tuple[str, str, tuple[int]]:
     """
@@ -65,10 +69,54 @@ def validateInformation(frontPath: str, sidePath: str, colour: tuple[int]) -> tu
     return (frontPath, sidePath, colour)
 
 
-def main() -> None:
+def parseArguments(argv: list[str] = None) -> argparse.Namespace:
     """
-    Runs the main execution of the program.
+    Parses the command line options of the program.
+    Args:
+        argv (list[str]): The arguments to parse, defaults to the process arguments.
+    """
+    parser = argparse.ArgumentParser(description="Backyard DRS")
+    parser.add_argument("--backend", choices=[backend.value for backend in Backend], default=Backend.OPENCV.value,
+        help="library used to decode the videos")
+    parser.add_argument("--decode-scale", type=float, default=1.0,
+        help="factor by which to shrink frames as they are decoded")
+    parser.add_argument("--grayscale", action="store_true",
+        help="decode frames to a single grayscale channel")
+    parser.add_argument("--tracking-only", action="store_true",
+        help="keep only the channel tracking needs of frames which are no longer displayed")
+    parser.add_argument("--session", default=None,
+        help="resume a review saved with Save Session instead of choosing videos")
+    parser.add_argument("--memory-limit", type=float, default=None,
+        help="largest number of megabytes the frames of both videos may use before old frames are reduced or dropped")
+    parser.add_argument("--server", default=None, metavar="SOCKET",
+        help="track on the tracking server listening on SOCKET instead of in this process")
+    parser.add_argument("--profile", default=None, metavar="PATH",
+        help="sample the whole run and write collapsed stacks for a flame graph to PATH, with a summary of hot functions beside it")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] = None) -> None:
+    """
+    Runs the main execution of the program, profiling it if asked to.
     """
+    arguments = parseArguments(argv)
+    if arguments.profile is None:
+        run(arguments)
+        return
+    with profiled(arguments.profile):
+        run(arguments)
+
+
+def run(arguments: argparse.Namespace) -> None:
+    """
+    Runs the program with the parsed command line options.
+    Args:
+        arguments (argparse.Namespace): The options returned by parseArguments.
+    """
+    memoryLimit = int(arguments.memory_limit * 2**20) if arguments.memory_limit is not None else None
+    if arguments.session is not None:
+        resumeSession(arguments.session, memoryLimit, arguments.server)
+        return
     parameters = getInitialInformation()
 
     # User quits the window
@@ -76,8 +124,18 @@ def main() -> None:
         quit()
 
     frontPath, sidePath, ballColour = parameters
-    frontVideo = Video(frontPath, ballColour)
-    sideVideo = Video(sidePath, ballColour)
+    decodeOptions = (Backend(arguments.backend), arguments.decode_scale, arguments.grayscale, arguments.tracking_only)
+    model = None
+    if arguments.server is None:
+        frontVideo = Video(frontPath, ballColour, *decodeOptions)
+        sideVideo = Video(sidePath, ballColour, *decodeOptions)
+    else:
+        try:
+            model = connectModel(arguments.server, frontPath, sidePath, ballColour, *decodeOptions)
+        except (ValueError, OSError) as e:
+            messagebox.showerror("Server Error", f"Could not open the videos on the tracking server: {e}")
+            quit()
+        frontVideo, sideVideo = model.getVideo(View.FRONT), model.getVideo(View.SIDE)
 
     # Ensure video can be read from the files before booting the program
     if not (frontVideo.incrementFrame() and sideVideo.incrementFrame()):
@@ -87,12 +145,31 @@ def main() -> None:
     # Run the program and display any unexpected errors.
     try:
         root = tk.Tk()
-        Controller(root, frontVideo, sideVideo)
+        Controller(root, frontVideo, sideVideo, model, memoryLimit)
         root.mainloop()
     except Exception as e:
         root.destroy()
         messagebox.showerror("Error", f"An unexpected error occurred: {e}")
 
 
+def resumeSession(path: str, memoryLimit: int = None, server: str = None) -> None:
+    """
+    Runs the program from a saved session.
+    Args:
+        path (str): Path to the session file.
+        memoryLimit (int): Largest number of bytes the frames of both videos may use, or None for no limit.
+        server (str): Socket of the tracking server to resume the session on, or None to track in this process.
+    """
+    try:
+        model = loadSession(path) if server is None else connectSession(server, path)
+    except (ValueError, OSError, KeyError) as e:
+        messagebox.showerror("Session Error", f"Could not resume session: {e}")
+        return
+
+    root = tk.Tk()
+    Controller(root, model.getVideo(View.FRONT), model.getVideo(View.SIDE), model, memoryLimit)
+    root.mainloop()
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
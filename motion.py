@@ -0,0 +1,150 @@
+import cv2 as cv
+import numpy as np
+from dataclasses import dataclass
+
+# Factor by which frames are shrunk before measuring motion, trading precision for decode-side speed
+MOTION_SCAN_SCALE = 0.25
+# Time (ms) between the frames measured by a delivery pre-scan, the frames in between are grabbed without decoding
+MOTION_SCAN_INTERVAL = 50
+# Number of median absolute deviations above the median energy at which a frame counts as active
+DELIVERY_THRESHOLD = 6
+# Quiet gaps shorter than this (ms) do not split a delivery window
+DELIVERY_MAX_GAP = 250
+# Active runs shorter than this (ms) are treated as noise rather than a delivery
+DELIVERY_MIN_DURATION = 150
+# Time (ms) added before and after each delivery window
+DELIVERY_PADDING = 300
+
+@dataclass
+class MotionScan:
+    frames: np.ndarray
+    times: np.ndarray
+    energy: np.ndarray
+
+def downsample(frame, cropRegion: tuple[tuple[int, int], tuple[int, int]], scale: float = MOTION_SCAN_SCALE) -> np.ndarray:
+    """
+    Reduces a frame to a small grayscale image of its crop region for cheap motion measurements.
+
+    parameters:
+        frame: The BGR (or already single channel) frame.
+        cropRegion: Top-left and bottom-right coordinates of the region to keep.
+        scale: Factor by which to shrink the cropped region.
+    returns:
+        np.ndarray: The downsampled grayscale image.
+    """
+    (left, top), (right, bottom) = cropRegion
+    cropped = frame[top:bottom, left:right]
+    if cropped.ndim == 3:
+        cropped = cv.cvtColor(cropped, cv.COLOR_BGR2GRAY)
+    width = max(1, int(cropped.shape[1] * scale))
+    height = max(1, int(cropped.shape[0] * scale))
+    return cv.resize(cropped, (width, height), interpolation=cv.INTER_AREA)
+
+def motionEnergy(previous: np.ndarray, current: np.ndarray) -> float:
+    """
+    Returns the mean absolute difference between two downsampled frames.
+
+    parameters:
+        previous: The earlier downsampled frame.
+        current: The later downsampled frame.
+    returns:
+        float: The motion energy, zero if nothing changed.
+    """
+    return float(cv.absdiff(previous, current).mean())
+
+def resample(times: np.ndarray, signal: np.ndarray, start: float, step: float, length: int) -> np.ndarray:
+    """
+    Linearly resamples an irregularly timed signal onto a uniform grid.
+
+    parameters:
+        times: Sample times of the signal.
+        signal: Values of the signal.
+        start: Time of the first grid point.
+        step: Spacing of the grid.
+        length: Number of grid points.
+    returns:
+        np.ndarray: The resampled signal.
+    """
+    return np.interp(start + step * np.arange(length), times, signal)
+
+def estimateOffset(frontTimes: np.ndarray, frontSignal: np.ndarray, sideTimes: np.ndarray, sideSignal: np.ndarray, resolution: float = None) -> float:
+    """
+    Estimates the time offset between two cameras by cross-correlating their motion energy signals.
+    Both signals are resampled onto a common uniform grid and correlated with an FFT, and the peak is
+    refined with a parabolic fit so the offset is not limited to whole samples.
+
+    parameters:
+        frontTimes: Timestamps of the front signal in milliseconds.
+        frontSignal: Motion energy of the front video.
+        sideTimes: Timestamps of the side signal in milliseconds.
+        sideSignal: Motion energy of the side video.
+        resolution: Grid spacing in milliseconds, defaults to half the smallest frame interval.
+    returns:
+        float: Milliseconds to add to a front timestamp to get the side timestamp of the same instant.
+    """
+    frontTimes, frontSignal = np.asarray(frontTimes, dtype=np.float64), np.asarray(frontSignal, dtype=np.float64)
+    sideTimes, sideSignal = np.asarray(sideTimes, dtype=np.float64), np.asarray(sideSignal, dtype=np.float64)
+    if len(frontTimes) < 2 or len(sideTimes) < 2:
+        raise ValueError("Not enough frames to estimate the offset between videos.")
+    if resolution is None:
+        resolution = min(np.median(np.diff(frontTimes)), np.median(np.diff(sideTimes))) / 2
+
+    frontLength = int((frontTimes[-1] - frontTimes[0]) / resolution) + 1
+    sideLength = int((sideTimes[-1] - sideTimes[0]) / resolution) + 1
+    front = resample(frontTimes, frontSignal, frontTimes[0], resolution, frontLength)
+    side = resample(sideTimes, sideSignal, sideTimes[0], resolution, sideLength)
+    front = (front - front.mean()) / (front.std() or 1)
+    side = (side - side.mean()) / (side.std() or 1)
+
+    size = 1 << int(np.ceil(np.log2(frontLength + sideLength - 1)))
+    correlation = np.fft.irfft(np.fft.rfft(front, size) * np.conj(np.fft.rfft(side, size)), size)
+    peak = int(np.argmax(correlation))
+
+    # Fit a parabola through the peak and its neighbours to locate it between grid points
+    before, after = correlation[peak - 1], correlation[(peak + 1) % size]
+    curvature = before - 2 * correlation[peak] + after
+    shift = 0.5 * (before - after) / curvature if curvature != 0 else 0.0
+
+    lag = peak + shift
+    if lag > size / 2:
+        lag -= size
+    return float(sideTimes[0] - frontTimes[0] - lag * resolution)
+
+def findDeliveryWindows(scan: MotionScan, threshold: float = None) -> list[tuple[int, int]]:
+    """
+    Finds the stretches of a motion scan where something is moving, merging runs separated by short
+    quiet gaps and discarding runs too short to be a delivery.
+
+    parameters:
+        scan: The motion scan of the video.
+        threshold: Energy above which a frame counts as active, defaults to a robust estimate from
+            the median and median absolute deviation of the scan.
+    returns:
+        list[tuple[int, int]]: First and last frame index of each candidate delivery window.
+    """
+    if len(scan.energy) < 2:
+        return []
+    if threshold is None:
+        median = np.median(scan.energy)
+        deviation = np.median(np.abs(scan.energy - median)) * 1.4826
+        threshold = median + DELIVERY_THRESHOLD * max(deviation, 1e-3)
+
+    # Locate the start and end of each active run in one pass over the padded mask
+    active = np.concatenate(([False], scan.energy > threshold, [False]))
+    edges = np.flatnonzero(np.diff(active.astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2] - 1
+    if len(starts) == 0:
+        return []
+
+    keep = np.concatenate(([True], scan.times[starts[1:]] - scan.times[ends[:-1]] > DELIVERY_MAX_GAP))
+    groupStarts = starts[keep]
+    groupEnds = ends[np.concatenate((keep[1:], [True]))]
+
+    windows = []
+    for start, end in zip(groupStarts, groupEnds):
+        if scan.times[end] - scan.times[start] < DELIVERY_MIN_DURATION:
+            continue
+        first = np.searchsorted(scan.times, scan.times[start] - DELIVERY_PADDING)
+        last = np.searchsorted(scan.times, scan.times[end] + DELIVERY_PADDING, side="right") - 1
+        windows.append((int(scan.frames[first]), int(scan.frames[last])))
+    return windows
@@ -0,0 +1,73 @@
+import time
+from collections import deque
+
+# Number of frames per second shown while playing a video
+DISPLAY_RATE = 30
+# Number of recent renders used to measure the achieved display rate
+PLAYBACK_RATE_WINDOW = 16
+
+class PlaybackScheduler:
+    """
+    Keeps a playing video in step with the wall clock. Every frame up to the current playback time is
+    decoded and tracked, but only one frame is rendered per display tick, so when decoding falls behind
+    renders are dropped rather than frames.
+    """
+    def __init__(self, startTime: float, targetRate: float = DISPLAY_RATE, clock=time.perf_counter) -> None:
+        """
+        Initializes the PlaybackScheduler and starts its clock.
+        parameters:
+            startTime (float): Timestamp of the frame playback starts from in milliseconds.
+            targetRate (float): Number of renders per second to aim for.
+            clock: A function returning the wall clock time in seconds.
+        """
+        self._startTime = startTime
+        self._targetRate = targetRate
+        self._clock = clock
+        self._wallStart = clock()
+        self._renders = deque(maxlen=PLAYBACK_RATE_WINDOW)
+        self._dropped = 0
+
+    def getTargetRate(self) -> float:
+        """
+        Returns the number of renders per second playback aims for.
+        """
+        return self._targetRate
+
+    def getTickInterval(self) -> int:
+        """
+        Returns the number of milliseconds between display ticks.
+        """
+        return max(1, round(1000 / self._targetRate))
+
+    def dueTime(self) -> float:
+        """
+        Returns the timestamp in milliseconds of the frame which should be on screen now.
+        """
+        return self._startTime + (self._clock() - self._wallStart) * 1000
+
+    def recordRender(self) -> None:
+        """
+        Records that a frame has been rendered.
+        """
+        self._renders.append(self._clock())
+
+    def dropRender(self) -> None:
+        """
+        Records that a display tick passed without a render because decoding had not caught up.
+        """
+        self._dropped += 1
+
+    def getDroppedRenders(self) -> int:
+        """
+        Returns the number of display ticks which passed without a render.
+        """
+        return self._dropped
+
+    def achievedRate(self) -> float:
+        """
+        Returns the number of renders per second over the most recent renders, or 0 until two renders
+        have been made.
+        """
+        if len(self._renders) < 2 or self._renders[-1] <= self._renders[0]:
+            return 0.0
+        return (len(self._renders) - 1) / (self._renders[-1] - self._renders[0])
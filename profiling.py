@@ -0,0 +1,194 @@
+import os
+import sys
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+# Seconds between samples of every thread's stack
+PROFILE_INTERVAL = 0.005
+# Number of functions listed in a profile summary
+PROFILE_TOP_FUNCTIONS = 15
+# Source files whose functions are listed in a profile summary
+PROFILED_FILES = ("Model.py", "View.py")
+# Appended to the name of a collapsed stack file, without its extension, to name its summary
+PROFILE_SUMMARY_SUFFIX = ".summary.txt"
+
+@dataclass
+class HotFunction:
+    name: str
+    # Time spent in the function itself, including the native code it calls
+    selfTime: float
+    # Time spent in the function and everything it calls
+    totalTime: float
+
+class StackSampler:
+    """
+    Samples the Python stack of every thread at a fixed interval on a background thread, so that work
+    done on the Tk thread, the worker thread and pipeline threads is all profiled. Time spent in native
+    code such as OpenCV is counted against the Python function which called it.
+    """
+    def __init__(self, interval: float = PROFILE_INTERVAL) -> None:
+        """
+        parameters:
+            interval (float): Seconds between samples.
+        """
+        self._interval = interval
+        self._stacks = Counter()
+        self._labels = {}
+        self._ticks = 0
+        self._elapsed = 0.0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        """
+        Starts sampling.
+        """
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops sampling and waits for the sampling thread to finish.
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def getSampleCount(self) -> int:
+        """
+        Returns the number of stacks sampled over all threads.
+        """
+        return sum(self._stacks.values())
+
+    def getSampleTime(self) -> float:
+        """
+        Returns the measured time in seconds between samples, which is longer than the interval asked for
+        when the sampling thread waits on other threads.
+        """
+        return self._elapsed / self._ticks if self._ticks > 0 else self._interval
+
+    def collapsedStacks(self) -> dict[str, int]:
+        """
+        Returns the sampled stacks in the collapsed format read by flame graph tools, with the thread name
+        first and the innermost function last, separated by semicolons.
+
+        returns:
+            dict[str, int]: Number of samples of each stack.
+        """
+        return {";".join((thread,) + frames): count for (thread, frames), count in self._stacks.items()}
+
+    def writeCollapsed(self, path: str) -> None:
+        """
+        Writes the sampled stacks to a file with one stack and its sample count per line, which can be
+        passed to flamegraph.pl, speedscope or inferno.
+        """
+        with open(path, "w") as file:
+            for stack, count in sorted(self.collapsedStacks().items()):
+                file.write(f"{stack} {count}\n")
+
+    def hotFunctions(self, files: tuple[str, ...] = PROFILED_FILES, count: int = PROFILE_TOP_FUNCTIONS) -> list[HotFunction]:
+        """
+        Returns the functions from the given source files in which the most time was spent.
+
+        parameters:
+            files (tuple[str, ...]): Names of the source files whose functions are included.
+            count (int): Largest number of functions returned.
+        returns:
+            list[HotFunction]: The functions, slowest first by total time.
+        """
+        selfSamples, totalSamples = Counter(), Counter()
+        for (_, frames), samples in self._stacks.items():
+            for frame in set(frames):
+                totalSamples[frame] += samples
+            selfSamples[frames[-1]] += samples
+        sampleTime = self.getSampleTime()
+        hot = [HotFunction(frame, selfSamples[frame] * sampleTime, samples * sampleTime)
+            for frame, samples in totalSamples.items() if self._fileOf(frame) in files]
+        hot.sort(key=lambda function: (-function.totalTime, -function.selfTime, function.name))
+        return hot[:count]
+
+    def summary(self, files: tuple[str, ...] = PROFILED_FILES, count: int = PROFILE_TOP_FUNCTIONS) -> str:
+        """
+        Returns a human readable table of the hot functions from the given source files.
+        """
+        lines = [f"{self.getSampleCount()} samples every {self.getSampleTime() * 1000:.1f} ms",
+            f"{'total ms':>10} {'self ms':>10}  function"]
+        for function in self.hotFunctions(files, count):
+            lines.append(f"{function.totalTime * 1000:10.0f} {function.selfTime * 1000:10.0f}  {function.name}")
+        return "\n".join(lines)
+
+    def _run(self) -> None:
+        """
+        Samples every other thread until stopped.
+        """
+        last = time.perf_counter()
+        while not self._stopped.wait(self._interval):
+            self._sample()
+            now = time.perf_counter()
+            self._elapsed += now - last
+            self._ticks += 1
+            last = now
+
+    def _sample(self) -> None:
+        """
+        Records the current stack of every thread other than the sampling thread.
+        """
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        own = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            frames = []
+            while frame is not None:
+                frames.append(self._label(frame.f_code))
+                frame = frame.f_back
+            self._stacks[(names.get(ident, str(ident)), tuple(reversed(frames)))] += 1
+
+    def _label(self, code) -> str:
+        """
+        Returns the name a code object is shown with, such as Video._extendTrack (Model.py:420).
+        """
+        label = self._labels.get(code)
+        if label is None:
+            # Qualified names, which include the class, are only recorded from Python 3.11
+            name = getattr(code, "co_qualname", code.co_name)
+            label = f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    @staticmethod
+    def _fileOf(label: str) -> str:
+        """
+        Returns the source file name of a frame label.
+        """
+        return label.rpartition("(")[2].partition(":")[0]
+
+@contextmanager
+def profiled(path: str, interval: float = PROFILE_INTERVAL):
+    """
+    Samples every thread while the enclosed code runs, then writes the collapsed stacks to the given path
+    and a summary of the hot functions in Model.py and View.py next to it. The files are written even if
+    the enclosed code raises or exits.
+
+    parameters:
+        path (str): Path of the collapsed stack file.
+        interval (float): Seconds between samples.
+    returns:
+        StackSampler: The sampler, whose results are complete once the block ends.
+    """
+    sampler = StackSampler(interval)
+    sampler.start()
+    try:
+        yield sampler
+    finally:
+        sampler.stop()
+        sampler.writeCollapsed(path)
+        summary = sampler.summary()
+        with open(os.path.splitext(path)[0] + PROFILE_SUMMARY_SUFFIX, "w") as file:
+            file.write(summary + "\n")
+        print(summary)
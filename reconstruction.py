@@ -0,0 +1,145 @@
+import numpy as np
+from dataclasses import dataclass
+
+# World coordinates are in metres: X runs across the pitch, Y along it from the bowler's stumps towards
+# the batter's stumps, and Z upwards from the pitch surface.
+GRAVITY = 9.81
+# Distance between the bowler's and batter's stumps
+PITCH_LENGTH = 20.12
+# Number of passes used to reweight the reconstruction by each observation's depth
+RECONSTRUCTION_PASSES = 3
+
+@dataclass
+class Reconstruction:
+    position: np.ndarray
+    velocity: np.ndarray
+    referenceTime: float
+    impactTime: float
+    impactPoint: np.ndarray
+    residual: float
+
+    def positionAt(self, times: np.ndarray) -> np.ndarray:
+        """
+        Returns the position of the ball in metres at the given times since linking in seconds.
+        """
+        t = np.asarray(times, dtype=np.float64)[..., None] - self.referenceTime
+        return self.position + self.velocity * t + np.array([0, 0, -GRAVITY / 2]) * t ** 2
+
+def calibrateCamera(imagePoints: np.ndarray, worldPoints: np.ndarray) -> np.ndarray:
+    """
+    Finds the projection matrix of a camera from reference points with known world positions, such as
+    the pitch corners and the tops of the stumps, by the direct linear transform.
+
+    parameters:
+        imagePoints (np.ndarray): Pixel coordinates of the reference points, shaped (n, 2).
+        worldPoints (np.ndarray): World coordinates of the same points in metres, shaped (n, 3).
+    returns:
+        np.ndarray: The 3x4 projection matrix from homogeneous world to homogeneous pixel coordinates.
+    """
+    imagePoints = np.asarray(imagePoints, dtype=np.float64)
+    worldPoints = np.asarray(worldPoints, dtype=np.float64)
+    if len(imagePoints) < 6 or len(imagePoints) != len(worldPoints):
+        raise ValueError("At least six matching reference points are needed to calibrate a view.")
+
+    # Normalise both point sets so the linear system is well conditioned
+    imageTransform = _normalisingTransform(imagePoints)
+    worldTransform = _normalisingTransform(worldPoints)
+    image = _homogeneous(imagePoints) @ imageTransform.T
+    world = _homogeneous(worldPoints) @ worldTransform.T
+
+    rows = np.zeros((2 * len(image), 12))
+    rows[0::2, 0:4] = world
+    rows[0::2, 8:12] = -image[:, [0]] * world
+    rows[1::2, 4:8] = world
+    rows[1::2, 8:12] = -image[:, [1]] * world
+    _, singular, vectors = np.linalg.svd(rows)
+    if singular[-2] < 1e-9 * singular[0]:
+        raise ValueError("Reference points must not all lie in one plane.")
+
+    projection = np.linalg.inv(imageTransform) @ vectors[-1].reshape(3, 4) @ worldTransform
+    return projection / np.linalg.norm(projection[2, :3])
+
+def project(projection: np.ndarray, worldPoints: np.ndarray) -> np.ndarray:
+    """
+    Projects world points into a calibrated view.
+
+    parameters:
+        projection (np.ndarray): The 3x4 projection matrix of the view.
+        worldPoints (np.ndarray): World coordinates in metres, shaped (n, 3).
+    returns:
+        np.ndarray: Pixel coordinates, shaped (n, 2).
+    """
+    image = _homogeneous(np.asarray(worldPoints, dtype=np.float64)) @ projection.T
+    return image[:, :2] / image[:, [2]]
+
+def reconstructTrajectory(observations: list[tuple[np.ndarray, np.ndarray, np.ndarray]], stumpDistance: float = PITCH_LENGTH) -> Reconstruction:
+    """
+    Fits a ballistic trajectory to observations of the ball from any number of calibrated views. Every
+    pixel observation gives two equations which are linear in the launch position and velocity, so all
+    views are fused in a single batched least squares solve, repeated a few times to weight each
+    observation by its depth so that the fit minimises error in pixels.
+
+    parameters:
+        observations: For each view, its projection matrix, the observation times since linking in seconds
+            shaped (n,), and the pixel positions of the ball shaped (n, 2).
+        stumpDistance (float): Distance along the pitch of the batter's stumps in metres.
+    returns:
+        Reconstruction: The fitted trajectory and the point where it reaches the batter's stumps.
+    """
+    projections = np.concatenate([np.broadcast_to(P, (len(t), 3, 4)) for P, t, _ in observations])
+    times = np.concatenate([np.asarray(t, dtype=np.float64) for _, t, _ in observations])
+    pixels = np.concatenate([np.asarray(uv, dtype=np.float64) for _, _, uv in observations])
+    if len(times) < 4:
+        raise ValueError("Not enough points to reconstruct the trajectory.")
+
+    referenceTime = float(times.min())
+    t = times - referenceTime
+    # Each pixel (u, v) requires (P0 - u P2) . X = 0 and (P1 - v P2) . X = 0 for homogeneous position X
+    constraints = np.concatenate((
+        projections[:, 0] - pixels[:, [0]] * projections[:, 2],
+        projections[:, 1] - pixels[:, [1]] * projections[:, 2],
+    ))
+    rowTimes = np.concatenate((t, t))
+    rowProjections = np.concatenate((projections[:, 2], projections[:, 2]))
+
+    fall = np.zeros((len(rowTimes), 3))
+    fall[:, 2] = -GRAVITY / 2 * rowTimes ** 2
+    design = np.concatenate((constraints[:, :3], constraints[:, :3] * rowTimes[:, None]), axis=1)
+    target = -np.einsum("ij,ij->i", constraints[:, :3], fall) - constraints[:, 3]
+
+    weights = np.ones(len(rowTimes))
+    for _ in range(RECONSTRUCTION_PASSES):
+        solution = np.linalg.lstsq(design * weights[:, None], target * weights, rcond=None)[0]
+        positions = solution[:3] + solution[3:] * rowTimes[:, None] + fall
+        depths = np.einsum("ij,ij->i", rowProjections[:, :3], positions) + rowProjections[:, 3]
+        weights = 1 / np.maximum(np.abs(depths), 1e-9)
+
+    observed = solution[:3] + solution[3:] * t[:, None] + fall[:len(t)]
+    reprojected = np.einsum("nij,nj->ni", projections, _homogeneous(observed))
+    residual = float(np.sqrt(np.mean(np.sum((reprojected[:, :2] / reprojected[:, [2]] - pixels) ** 2, axis=1))))
+    position, velocity = solution[:3], solution[3:]
+    if abs(velocity[1]) < 1e-9:
+        raise ValueError("The ball is not moving towards the stumps.")
+    impactTime = (stumpDistance - position[1]) / velocity[1] + referenceTime
+
+    reconstruction = Reconstruction(position, velocity, referenceTime, impactTime, None, residual)
+    reconstruction.impactPoint = reconstruction.positionAt(impactTime)
+    return reconstruction
+
+def _homogeneous(points: np.ndarray) -> np.ndarray:
+    """
+    Appends a column of ones to a set of points.
+    """
+    return np.concatenate((points, np.ones((len(points), 1))), axis=1)
+
+def _normalisingTransform(points: np.ndarray) -> np.ndarray:
+    """
+    Returns the similarity transform which centres the points on the origin with an average distance of one.
+    """
+    centre = points.mean(axis=0)
+    scale = np.mean(np.linalg.norm(points - centre, axis=1)) or 1.0
+    size = points.shape[1]
+    transform = np.eye(size + 1)
+    transform[:size, :size] /= scale
+    transform[:size, size] = -centre / scale
+    return transform
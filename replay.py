@@ -0,0 +1,236 @@
+import queue
+import argparse
+import threading
+import cv2 as cv
+import numpy as np
+from library import *
+from Model import Model
+from View import drawOverlays
+from session import loadSession
+
+# Largest number of frames waiting between each stage of the replay pipeline, which bounds its memory use
+REPLAY_QUEUE_SIZE = 8
+# Time (ms) of video shown before the first and after the last tracked ball position
+REPLAY_PADDING = 500
+# Time (ms) the final frame is held with the prediction drawn over it
+REPLAY_HOLD = 2000
+# Number of points drawn along the predicted path of the ball to the stumps
+REPLAY_TRAJECTORY_POINTS = 20
+# Codec of replay videos
+REPLAY_FOURCC = "mp4v"
+
+# Marks the end of the items passed between pipeline stages
+_END = object()
+
+def exportReplay(model: Model, path: str, queueSize: int = REPLAY_QUEUE_SIZE) -> int:
+    """
+    Writes a replay of a delivery with the front and side views side by side, marking the tracked ball
+    positions as they are found and holding the final frame with the prediction drawn over it.
+    Frames are decoded, annotated and encoded on separate threads connected by bounded queues, so the
+    replay never holds more than a few frames in memory however long it is.
+
+    parameters:
+        model (Model): A linked model which has made a prediction.
+        path (str): Path to the replay video.
+        queueSize (int): Largest number of frames waiting between stages.
+    returns:
+        int: Number of frames written.
+    """
+    prediction = model.getPrediction()
+    if prediction is None:
+        raise ValueError("Must make a prediction before exporting a replay.")
+    front = model.getVideo(View.FRONT)
+    frontPoints = front.getPoints()
+    if len(frontPoints) == 0:
+        raise ValueError("Must track the ball before exporting a replay.")
+
+    padding = int(np.ceil(REPLAY_PADDING / front.getFrameInterval()))
+    start = max(0, frontPoints[0][3] - padding)
+    stop = min(front.getFrameCount(), frontPoints[-1][3] + padding + 1)
+    fps = 1000 / front.getFrameInterval()
+
+    decoded = queue.Queue(queueSize)
+    annotated = queue.Queue(queueSize)
+    stopped = threading.Event()
+    errors = []
+    threads = [
+        threading.Thread(target=_runStage, args=(_decodePairs(model, start, stop), decoded, stopped, errors), daemon=True),
+        threading.Thread(target=_runStage, args=(
+            (replayFrame(model, *pair) for pair in _drain(decoded)), annotated, stopped, errors), daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+
+    writer = None
+    count = 0
+    try:
+        for frame in _drain(annotated):
+            if writer is None:
+                writer = cv.VideoWriter(path, cv.VideoWriter_fourcc(*REPLAY_FOURCC), fps, (frame.shape[1], frame.shape[0]))
+                if not writer.isOpened():
+                    raise ValueError(f"Could not write replay to {path}.")
+            writer.write(frame)
+            count += 1
+            last = frame
+        if errors:
+            raise errors[0]
+        if writer is None:
+            raise ValueError("No frames of the delivery could be decoded.")
+
+        final = replayFrame(model, stop - 1, None, model.getPairedFrame(View.FRONT, stop - 1), None, showPrediction=True, base=last)
+        for _ in range(round(REPLAY_HOLD / 1000 * fps)):
+            writer.write(final)
+            count += 1
+    finally:
+        stopped.set()
+        # Unblock stages waiting to pass on frames which will no longer be written
+        while any(thread.is_alive() for thread in threads):
+            for stage in (decoded, annotated):
+                try:
+                    stage.get_nowait()
+                except queue.Empty:
+                    pass
+            threads[-1].join(0.01)
+        if writer is not None:
+            writer.release()
+    return count
+
+def replayFrame(model: Model, frontIndex: int, frontFrame: np.ndarray, sideIndex: int, sideFrame: np.ndarray, showPrediction: bool = False, base: np.ndarray = None) -> np.ndarray:
+    """
+    Draws the markings of one frame of a replay and places the front and side views side by side, with
+    the side view scaled to the height of the front view.
+
+    parameters:
+        model (Model): The model the replay is of.
+        frontIndex (int): Index of the front frame.
+        frontFrame (np.ndarray): The decoded front frame.
+        sideIndex (int): Index of the paired side frame.
+        sideFrame (np.ndarray): The decoded side frame.
+        showPrediction (bool): Whether to also draw the prediction and the predicted path of the ball.
+        base (np.ndarray): A replay frame whose images are reused instead of the decoded frames.
+    returns:
+        np.ndarray: The BGR replay frame.
+    """
+    front, side = model.getVideo(View.FRONT), model.getVideo(View.SIDE)
+    frontWidth, frontHeight = front.getDimensions()
+    sideWidth, sideHeight = side.getDimensions()
+    sideScale = frontHeight / sideHeight
+    scaledWidth = max(1, round(sideWidth * sideScale))
+
+    if base is not None:
+        frontImage = base[:, :frontWidth].copy()
+        sideImage = base[:, frontWidth:].copy()
+    else:
+        frontImage = _toBGR(frontFrame)
+        sideImage = cv.resize(_toBGR(sideFrame), (scaledWidth, frontHeight), interpolation=cv.INTER_AREA)
+
+    stump = model.getStumpPosition()
+    frontRender = Render(frame=frontImage, circles=[point for point in front.getPoints() if point[3] <= frontIndex])
+    sideRender = Render(frame=sideImage, circles=[point for point in side.getPoints() if point[3] <= sideIndex],
+        verticalLines=[stump] if stump is not None else [])
+    if showPrediction:
+        prediction = model.getPrediction()
+        frontRender.verticalLines = [prediction.line]
+        frontRender.verticalBands = confidenceBand(prediction.lineInterval)
+        sideRender.horizontalLines = [prediction.height]
+        sideRender.horizontalBands = confidenceBand(prediction.heightInterval)
+        sideRender.circles = sideRender.circles + _predictedPath(model)
+        if stump is not None:
+            # Mark where the ball is predicted to reach the stumps, at the size it was tracked at
+            radius = np.median([point[2] for point in side.getPoints()]) if side.getPoints() else 1
+            sideRender.circles.append((stump, prediction.height, radius))
+    drawOverlays(frontRender)
+    drawOverlays(sideRender, (sideScale, sideScale))
+    return np.hstack((frontRender.frame, sideRender.frame))
+
+def _predictedPath(model: Model) -> list[tuple[float, float, float]]:
+    """
+    Returns small circles along the predicted path of the ball in the side view, from its last tracked
+    position to the stumps.
+    """
+    prediction = model.getPrediction()
+    side = model.getVideo(View.SIDE)
+    if len(side.getPoints()) == 0:
+        return []
+    lastTime = (side.getPointTimes()[-1] - model.getLinkTime(View.SIDE)) / 1000
+    times = np.linspace(lastTime, prediction.impactTime, REPLAY_TRAJECTORY_POINTS)
+    xs = linear(times, *prediction.progressCoefficients)
+    ys = quadratic(times, *prediction.heightCoefficients)
+    return [(x, y, 2) for x, y in zip(xs, ys)]
+
+def confidenceBand(interval: tuple[float, float]) -> list[tuple[int, int]]:
+    """
+    Converts a confidence interval to a band which can be drawn, or no band if the interval is unbounded.
+
+    parameters:
+        interval (tuple[float, float]): The lower and upper bounds of the interval.
+    """
+    if interval is None or not np.all(np.isfinite(interval)):
+        return []
+    return [(int(interval[0]), int(interval[1]))]
+
+def _toBGR(frame: np.ndarray) -> np.ndarray:
+    """
+    Returns a BGR copy of a decoded frame which can be drawn on.
+    """
+    if frame.ndim == 2:
+        return cv.cvtColor(frame, cv.COLOR_GRAY2BGR)
+    return frame.copy()
+
+def _decodePairs(model: Model, start: int, stop: int):
+    """
+    Yields each front frame in a range along with the side frame paired with it, decoding frames which
+    are no longer held in memory without keeping them.
+    """
+    front, side = model.getVideo(View.FRONT), model.getVideo(View.SIDE)
+    sideFrames = side.readFrames(model.getPairedFrame(View.FRONT, start))
+    try:
+        sideIndex, sideFrame = next(sideFrames, (None, None))
+        for frontIndex, frontFrame in front.readFrames(start, stop):
+            target = model.getPairedFrame(View.FRONT, frontIndex)
+            while sideIndex is not None and sideIndex < target:
+                following = next(sideFrames, None)
+                if following is None:
+                    break
+                sideIndex, sideFrame = following
+            if sideFrame is None:
+                return
+            yield frontIndex, frontFrame, sideIndex, sideFrame
+    finally:
+        sideFrames.close()
+
+def _runStage(items, output: queue.Queue, stopped: threading.Event, errors: list) -> None:
+    """
+    Passes each item produced by a pipeline stage on to the next stage until the items run out or the
+    pipeline is stopped, recording any error raised while producing them.
+    """
+    try:
+        for item in items:
+            if stopped.is_set():
+                break
+            output.put(item)
+    except Exception as e:
+        errors.append(e)
+    finally:
+        output.put(_END)
+
+def _drain(stage: queue.Queue):
+    """
+    Yields the items passed through a pipeline queue until the stage feeding it ends.
+    """
+    while (item := stage.get()) is not _END:
+        yield item
+
+def main(argv: list[str] = None) -> None:
+    """
+    Writes the replay of a saved review session without opening the review window.
+    """
+    parser = argparse.ArgumentParser(description="Export an annotated replay of a saved review session")
+    parser.add_argument("session", help="session file saved from a review with a prediction")
+    parser.add_argument("output", help="path of the replay video to write")
+    arguments = parser.parse_args(argv)
+    count = exportReplay(loadSession(arguments.session), arguments.output)
+    print(f"Wrote {count} frames to {arguments.output}")
+
+if __name__ == "__main__":
+    main()
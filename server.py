@@ -0,0 +1,623 @@
+import os
+import mmap
+import pickle
+import getpass
+import secrets
+import argparse
+import tempfile
+import threading
+import numpy as np
+from dataclasses import dataclass, replace, fields
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+from library import *
+from Model import Model, Video, plotPoints
+from export import exportDelivery
+from replay import exportReplay
+from session import loadSession, saveSession
+
+# Socket the tracking server listens on when no other address is given, in a directory only its user can open
+DEFAULT_SERVER_ADDRESS = os.path.join(tempfile.gettempdir(), f"backyard-drs-{getpass.getuser()}", "server.sock")
+# File holding the key clients must prove they know before the server reads anything they send
+DEFAULT_KEY_PATH = os.path.join(os.path.expanduser("~"), ".backyard-drs.key")
+# Number of random bytes in a new key
+KEY_BYTES = 32
+# Directory the shared memory blocks are created in, which is held in memory rather than on disk where available
+SHARED_MEMORY_DIRECTORY = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+# Functions taking the model as their first argument which clients may run on the server, as they read
+# frames and points from the model directly
+SERVER_TASKS = {function.__name__: function for function in (exportDelivery, exportReplay, saveSession)}
+# Model methods clients may call on the server
+SERVER_MODEL_METHODS = frozenset((
+    "advanceTo", "autoLink", "autoTune", "cropRegion", "estimateSyncOffset", "getLinkTime", "getMemoryUsage",
+    "getPairedFrame", "getPlots", "getPrediction", "getStumpPosition", "incrementFrame", "invalidate",
+    "linkVideos", "makePrediction", "markFirstFrame", "reconstructTrajectory", "render", "setCalibration",
+    "setFitMode", "setMemoryLimit", "setRefinement", "setStumpPosition", "skipToDelivery", "startTracking",
+    "updateParameters"))
+# Video methods clients may call on the server
+SERVER_VIDEO_METHODS = frozenset((
+    "getCropRegion", "getCurrentFrame", "getDimensions", "getFPS", "getFilePath", "getFrameCount",
+    "getFrameIndex", "getFrameInterval", "getMemoryLimit", "getMemoryUsage", "getParameters", "getPointTimes",
+    "getPoints", "getTimestamp", "getTimestamps", "incrementFrame", "isTracking"))
+
+def loadAuthKey(path: str = DEFAULT_KEY_PATH, create: bool = False) -> bytes:
+    """
+    Reads the key shared by the tracking server and its clients. The key file must only be readable by its
+    owner, as anyone holding the key can run code on the server as the user running it.
+
+    parameters:
+        path (str): Path of the key file.
+        create (bool): Whether to create the file with a new random key if it does not exist.
+    returns:
+        bytes: The key.
+    """
+    if create:
+        try:
+            descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass
+        else:
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(secrets.token_bytes(KEY_BYTES))
+    if os.stat(path).st_mode & 0o077:
+        raise ValueError(f"The key file {path} can be read by other users; restrict it with chmod 600.")
+    with open(path, "rb") as file:
+        key = file.read()
+    if not key:
+        raise ValueError(f"The key file {path} is empty.")
+    return key
+
+@dataclass
+class SharedArray:
+    """
+    Describes an array written to a shared memory block instead of being sent through the socket.
+    """
+    slot: str
+    path: str
+    shape: tuple[int, ...]
+    dtype: str
+
+@dataclass
+class SharedPoints:
+    """
+    Tracked ball positions sent as an (n, 4) array of x, y, radius and frame index.
+    """
+    array: SharedArray
+
+class SharedBlock:
+    """
+    A block of memory shared between processes, backed by a file in SHARED_MEMORY_DIRECTORY. The file is
+    only readable by the user who created it, so the server and its clients must run as the same user. It
+    is removed by the process which created it; blocks left behind by a server which crashed can be deleted.
+    """
+    def __init__(self, path: str, size: int = None) -> None:
+        """
+        Attaches to the block backed by an existing file, first resizing the file if a size is given.
+
+        parameters:
+            path (str): Path of the file backing the block.
+            size (int): Size of a new block in bytes.
+        """
+        self.path = path
+        descriptor = os.open(path, os.O_RDWR)
+        try:
+            if size is not None:
+                os.ftruncate(descriptor, size)
+            self.size = os.fstat(descriptor).st_size
+            self._map = mmap.mmap(descriptor, self.size)
+        finally:
+            os.close(descriptor)
+
+    @staticmethod
+    def create(size: int) -> "SharedBlock":
+        """
+        Creates a block with a new unique name.
+        """
+        descriptor, path = tempfile.mkstemp(prefix="backyard-drs-", dir=SHARED_MEMORY_DIRECTORY)
+        os.close(descriptor)
+        return SharedBlock(path, max(size, 1))
+
+    def array(self, shape: tuple[int, ...], dtype: np.dtype) -> np.ndarray:
+        """
+        Returns an array viewing the start of the block.
+        """
+        return np.ndarray(shape, dtype, buffer=self._map)
+
+    def close(self, unlink: bool = False) -> None:
+        """
+        Unmaps the block, and removes it if this process created it.
+        """
+        self._map.close()
+        if unlink:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+class SharedArrays:
+    """
+    The shared memory blocks one connection passes arrays through. Each kind of result has its own block,
+    which is reused between calls and only replaced when a larger array must be passed.
+    """
+    def __init__(self) -> None:
+        self._blocks = {}
+
+    def share(self, slot: str, array: np.ndarray) -> SharedArray:
+        """
+        Writes an array to the block of the given slot, replacing the block if it is too small.
+
+        parameters:
+            slot (str): Name of the kind of result the array is part of.
+            array (np.ndarray): The array.
+        returns:
+            SharedArray: Where the receiver can read the array from.
+        """
+        array = np.ascontiguousarray(array)
+        block = self._blocks.get(slot)
+        if block is None or block.size < array.nbytes:
+            if block is not None:
+                block.close(unlink=True)
+            block = SharedBlock.create(array.nbytes)
+            self._blocks[slot] = block
+        block.array(array.shape, array.dtype)[...] = array
+        return SharedArray(slot, block.path, array.shape, array.dtype.str)
+
+    def read(self, shared: SharedArray) -> np.ndarray:
+        """
+        Returns a copy of an array shared by the other process. The array is copied because the block is
+        overwritten by the next call, while the frame may still be waiting to be drawn.
+        """
+        block = self._blocks.get(shared.slot)
+        if block is None or block.path != shared.path:
+            if block is not None:
+                block.close()
+            block = SharedBlock(shared.path)
+            self._blocks[shared.slot] = block
+        return block.array(shared.shape, np.dtype(shared.dtype)).copy()
+
+    def close(self, unlink: bool = False) -> None:
+        """
+        Unmaps every block, removing them if this process created them.
+        """
+        for block in self._blocks.values():
+            block.close(unlink)
+        self._blocks = {}
+
+def packResult(value, arrays: SharedArrays, slot: str):
+    """
+    Replaces the frames and point lists within a result by the shared memory they were written to, so that
+    only their descriptions are sent through the socket.
+    """
+    if isinstance(value, np.ndarray):
+        return arrays.share(slot, value)
+    if isinstance(value, Render):
+        return replace(value, frame=packResult(value.frame, arrays, f"{slot}.frame"),
+            circles=_packPoints(value.circles, arrays, f"{slot}.circles"))
+    if isinstance(value, dict):
+        return {key: packResult(item, arrays, f"{slot}.{key}") for key, item in value.items()}
+    if isinstance(value, list):
+        return [packResult(item, arrays, f"{slot}.{i}") for i, item in enumerate(value)]
+    if isinstance(value, tuple):
+        return tuple(packResult(item, arrays, f"{slot}.{i}") for i, item in enumerate(value))
+    return value
+
+def unpackResult(value, arrays: SharedArrays):
+    """
+    Reads the frames and point lists of a result packed by packResult back out of shared memory.
+    """
+    if isinstance(value, SharedArray):
+        return arrays.read(value)
+    if isinstance(value, SharedPoints):
+        return [(float(x), float(y), float(r), int(index)) for x, y, r, index in arrays.read(value.array)]
+    if isinstance(value, Render):
+        return replace(value, **{field.name: unpackResult(getattr(value, field.name), arrays) for field in fields(value)})
+    if isinstance(value, dict):
+        return {key: unpackResult(item, arrays) for key, item in value.items()}
+    if isinstance(value, list):
+        return [unpackResult(item, arrays) for item in value]
+    if isinstance(value, tuple):
+        return tuple(unpackResult(item, arrays) for item in value)
+    return value
+
+def _packPoints(points: list[tuple], arrays: SharedArrays, slot: str) -> SharedPoints:
+    """
+    Writes tracked ball positions to shared memory as one array.
+    """
+    return SharedPoints(arrays.share(slot, np.array(points, dtype=np.float64).reshape(-1, 4)))
+
+class _Session:
+    """
+    A model opened by a client, along with the connections using it. A client uses one connection per
+    thread, so that reading the state of a video on the Tk thread does not wait for tracking to finish
+    on the worker thread, just as with a local model.
+    """
+    def __init__(self, model: Model) -> None:
+        self.model = model
+        self.connections = 0
+        self._lock = threading.Lock()
+        # Connections running a call, most recent last, which progress is reported to
+        self._calls = []
+
+    def begin(self, connection: "_Connection") -> None:
+        with self._lock:
+            self._calls.append(connection)
+
+    def end(self, connection: "_Connection") -> None:
+        with self._lock:
+            self._calls.remove(connection)
+
+    def reportProgress(self, done: int, total: int) -> None:
+        """
+        Sends the progress of retracking to the client through a connection it is waiting on.
+        """
+        with self._lock:
+            connection = self._calls[-1] if self._calls else None
+        if connection is not None:
+            connection.send(("progress", (done, total)))
+
+class _Connection:
+    """
+    One client connection and the shared memory its results are passed through.
+    """
+    def __init__(self, connection) -> None:
+        self._connection = connection
+        self._sendLock = threading.Lock()
+        self.arrays = SharedArrays()
+
+    def send(self, message) -> None:
+        # Progress can be reported through a connection from another call's thread while it replies
+        with self._sendLock:
+            self._connection.send(message)
+
+    def receive(self):
+        return self._connection.recv()
+
+    def close(self) -> None:
+        self._connection.close()
+        self.arrays.close(unlink=True)
+
+class TrackingServer:
+    """
+    Runs models for a GUI client in a process of their own, so that decoding, tracking and fitting do not
+    compete with drawing for the GIL. Clients call the Model and Video methods in SERVER_MODEL_METHODS and
+    SERVER_VIDEO_METHODS through a Unix socket, and frames and points are returned through shared memory.
+
+    The server is for one user: messages are pickled, so a client can run any code as the server's user, and
+    tasks write to whatever paths the client gives. The socket and shared memory are therefore only open to
+    the server's user, and clients must also prove they hold the server's key before anything they send is
+    read. Each session opens its own videos, so sessions do not share decoders or caches.
+    """
+    def __init__(self, address: str = DEFAULT_SERVER_ADDRESS, keyPath: str = DEFAULT_KEY_PATH) -> None:
+        """
+        Starts listening for clients.
+
+        parameters:
+            address (str): Path of the Unix socket to listen on. A socket left behind by a previous server
+                is replaced.
+            keyPath (str): Path of the key file, which is created if it does not exist.
+        """
+        self._authKey = loadAuthKey(keyPath, create=True)
+        directory = os.path.dirname(address)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory, mode=0o700)
+        if os.path.exists(address):
+            os.unlink(address)
+        self._address = address
+        self._listener = Listener(address, family="AF_UNIX", authkey=self._authKey)
+        os.chmod(address, 0o600)
+        self._sessions = {}
+        self._nextSession = 0
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+
+    def getAddress(self) -> str:
+        """
+        Returns the path of the socket the server listens on.
+        """
+        return self._address
+
+    def serveForever(self) -> None:
+        """
+        Accepts clients until the server is closed, serving each connection on a thread of its own.
+        """
+        while not self._closed.is_set():
+            try:
+                connection = self._listener.accept()
+            except (OSError, AuthenticationError):
+                if self._closed.is_set():
+                    return
+                continue
+            if self._closed.is_set():
+                connection.close()
+                return
+            threading.Thread(target=self._serveConnection, args=(_Connection(connection),), daemon=True).start()
+
+    def start(self) -> threading.Thread:
+        """
+        Serves clients on a background thread.
+        """
+        thread = threading.Thread(target=self.serveForever, daemon=True)
+        thread.start()
+        return thread
+
+    def close(self) -> None:
+        """
+        Stops accepting clients and removes the socket.
+        """
+        self._closed.set()
+        # Closing the listener does not wake a thread waiting to accept, but a connection does
+        try:
+            Client(self._address, family="AF_UNIX", authkey=self._authKey).close()
+        except (OSError, AuthenticationError):
+            pass
+        self._listener.close()
+
+    def _serveConnection(self, connection: _Connection) -> None:
+        """
+        Opens or joins the session a connection asks for, then answers its calls until it disconnects.
+        """
+        session = None
+        try:
+            session, sessionId = self._openSession(connection.receive())
+            connection.send(("result", sessionId))
+            while True:
+                request = connection.receive()
+                session.begin(connection)
+                try:
+                    connection.send(("result", self._handle(session, connection, request)))
+                except (EOFError, OSError):
+                    raise
+                except Exception as e:
+                    connection.send(("error", e if _picklable(e) else ValueError(str(e))))
+                finally:
+                    session.end(connection)
+        except (EOFError, OSError):
+            pass
+        except Exception as e:
+            # The session could not be opened
+            try:
+                connection.send(("error", e if _picklable(e) else ValueError(str(e))))
+            except OSError:
+                pass
+        finally:
+            connection.close()
+            if session is not None:
+                self._leaveSession(session)
+
+    def _openSession(self, request: tuple) -> tuple[_Session, int]:
+        """
+        Creates the model a client asks for, or finds the session another of its connections opened.
+        """
+        kind, arguments = request
+        with self._lock:
+            if kind == "join":
+                session, sessionId = self._sessions[arguments], arguments
+                session.connections += 1
+                return session, sessionId
+        if kind == "open":
+            frontPath, sidePath, ballColour, decodeOptions = arguments
+            model = Model(Video(frontPath, ballColour, *decodeOptions), Video(sidePath, ballColour, *decodeOptions))
+        elif kind == "resume":
+            model = loadSession(arguments)
+        else:
+            raise ValueError(f"Unknown request: {kind}")
+        session = _Session(model)
+        session.connections = 1
+        with self._lock:
+            sessionId = self._nextSession
+            self._nextSession += 1
+            self._sessions[sessionId] = session
+        return session, sessionId
+
+    def _leaveSession(self, session: _Session) -> None:
+        """
+        Forgets a session once none of its connections are open.
+        """
+        with self._lock:
+            session.connections -= 1
+            if session.connections == 0:
+                self._sessions = {key: value for key, value in self._sessions.items() if value is not session}
+
+    def _handle(self, session: _Session, connection: _Connection, request: tuple):
+        """
+        Runs one call of a client on its model and returns the packed result.
+        """
+        kind, view, name, arguments, options = request
+        if kind == "progress":
+            session.model.setProgressCallback(session.reportProgress if arguments else None)
+            return None
+        if kind == "task":
+            if name not in SERVER_TASKS:
+                raise ValueError(f"Unknown task: {name}")
+            return packResult(SERVER_TASKS[name](session.model, *arguments, **options), connection.arrays, name)
+        if name not in (SERVER_MODEL_METHODS if view is None else SERVER_VIDEO_METHODS):
+            raise ValueError(f"Cannot call {name} through the tracking server.")
+        target = session.model if view is None else session.model.getVideo(view)
+        result = getattr(target, name)(*arguments, **options)
+        slot = name if view is None else f"{view.name}.{name}"
+        if name == "getPoints":
+            return _packPoints(result, connection.arrays, slot)
+        return packResult(result, connection.arrays, slot)
+
+def _picklable(error: Exception) -> bool:
+    """
+    Returns whether an exception can be sent to the client as it is.
+    """
+    try:
+        pickle.loads(pickle.dumps(error))
+        return True
+    except Exception:
+        return False
+
+class RemoteVideo:
+    """
+    Stands in for a Video of a model on the tracking server, calling the methods of the server's video.
+    """
+    def __init__(self, model: "RemoteModel", view: View) -> None:
+        self._model = model
+        self._view = view
+
+    def __getattr__(self, name: str):
+        if name not in SERVER_VIDEO_METHODS:
+            raise AttributeError(name)
+        return lambda *arguments, **options: self._model._call("call", self._view, name, arguments, options)
+
+class RemoteModel:
+    """
+    Stands in for a Model on the tracking server. Model methods are called on the server, and the frames
+    and points they return are read from shared memory. Each thread calling the model uses a connection
+    of its own.
+    """
+    def __init__(self, address: str, request: tuple, keyPath: str = DEFAULT_KEY_PATH) -> None:
+        """
+        Connects to the tracking server and opens a session.
+
+        parameters:
+            address (str): Path of the server's socket.
+            request (tuple): The kind of session to open and its arguments.
+            keyPath (str): Path of the server's key file.
+        """
+        self._address = address
+        self._authKey = loadAuthKey(keyPath)
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._progressCallback = None
+        self._sessionId = None
+        self._sessionId = self._connect(request)
+
+    def getVideo(self, view: View) -> RemoteVideo:
+        """
+        Returns a stand in for the video of the specified view (FRONT or SIDE).
+        """
+        return RemoteVideo(self, view)
+
+    def setProgressCallback(self, callback) -> None:
+        """
+        Sets a function to be called with (done, total) as either video retracks its frames, on the thread
+        waiting for the server when progress is reported.
+        """
+        self._progressCallback = callback
+        self._call("progress", None, None, callback is not None, {})
+
+    def showPlots(self) -> None:
+        """
+        Plots the tracked points used by the most recent prediction. Must be called from the main thread.
+        """
+        plotPoints(self.getPlots())
+
+    def runTask(self, function, *arguments):
+        """
+        Runs one of the SERVER_TASKS on the server with the model as its first argument.
+
+        parameters:
+            function: The task, such as exportReplay.
+        returns:
+            The task's result.
+        """
+        return self._call("task", None, function.__name__, arguments, {})
+
+    def close(self) -> None:
+        """
+        Disconnects every connection, which ends the session on the server.
+        """
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection, arrays in connections:
+            connection.close()
+            arrays.close()
+        self._local = threading.local()
+
+    def __getattr__(self, name: str):
+        if name not in SERVER_MODEL_METHODS:
+            raise AttributeError(name)
+        return lambda *arguments, **options: self._call("call", None, name, arguments, options)
+
+    def _connect(self, request: tuple) -> int:
+        """
+        Opens a connection for the calling thread, and returns the id of the session it joined or opened.
+        """
+        try:
+            connection = Client(self._address, family="AF_UNIX", authkey=self._authKey)
+        except AuthenticationError:
+            raise ValueError("The tracking server did not accept the key.")
+        arrays = SharedArrays()
+        self._local.connection = (connection, arrays)
+        with self._lock:
+            self._connections.append((connection, arrays))
+        connection.send(request)
+        return self._receive(connection, arrays)
+
+    def _call(self, kind: str, view: View, name: str, arguments: tuple, options: dict):
+        """
+        Sends a call to the server through the calling thread's connection and waits for its result.
+        """
+        if getattr(self._local, "connection", None) is None:
+            self._connect(("join", self._sessionId))
+        connection, arrays = self._local.connection
+        connection.send((kind, view, name, arguments, options))
+        return self._receive(connection, arrays)
+
+    def _receive(self, connection, arrays: SharedArrays):
+        """
+        Waits for the result of a call, passing on any progress reported while it runs.
+        """
+        while True:
+            kind, value = connection.recv()
+            if kind == "progress":
+                if self._progressCallback is not None:
+                    self._progressCallback(*value)
+            elif kind == "error":
+                raise value
+            else:
+                return unpackResult(value, arrays)
+
+def connectModel(address: str, frontPath: str, sidePath: str, ballColour: tuple[int], backend: Backend = Backend.OPENCV,
+        scale: float = 1.0, grayscale: bool = False, trackingOnly: bool = False, keyPath: str = DEFAULT_KEY_PATH) -> RemoteModel:
+    """
+    Opens a model of two videos on the tracking server, taking the same options as Video.
+
+    parameters:
+        address (str): Path of the server's socket.
+        frontPath (str): Path to the front video, as seen by the server.
+        sidePath (str): Path to the side video, as seen by the server.
+        ballColour (tuple[int]): RGB color of the ball to track.
+        keyPath (str): Path of the server's key file.
+    returns:
+        RemoteModel: The model.
+    """
+    return RemoteModel(address, ("open", (frontPath, sidePath, ballColour, (backend, scale, grayscale, trackingOnly))), keyPath)
+
+def connectSession(address: str, path: str, keyPath: str = DEFAULT_KEY_PATH) -> RemoteModel:
+    """
+    Resumes a saved session on the tracking server.
+
+    parameters:
+        address (str): Path of the server's socket.
+        path (str): Path to the session file, as seen by the server.
+        keyPath (str): Path of the server's key file.
+    returns:
+        RemoteModel: The restored model.
+    """
+    return RemoteModel(address, ("resume", path), keyPath)
+
+def main(argv: list[str] = None) -> None:
+    """
+    Runs the tracking server until interrupted.
+    """
+    parser = argparse.ArgumentParser(description="Serve Backyard DRS tracking to GUI clients of the same user on this machine")
+    parser.add_argument("--address", default=DEFAULT_SERVER_ADDRESS, help="path of the Unix socket to listen on")
+    parser.add_argument("--key", default=DEFAULT_KEY_PATH,
+        help="path of the file holding the key clients must know, created if it does not exist")
+    arguments = parser.parse_args(argv)
+    server = TrackingServer(arguments.address, arguments.key)
+    print(f"Listening on {server.getAddress()}")
+    try:
+        server.serveForever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import os
+import json
+from library import *
+from Model import Model, Video
+
+# Version of the session file format, bumped whenever saved fields change meaning
+SESSION_VERSION = 1
+
+def saveSession(model: Model, path: str) -> None:
+    """
+    Saves the complete state of a model and both of its videos, including tracked points and playback
+    positions, so that a review can be resumed later. The file is replaced atomically so an interrupted
+    save never corrupts an earlier session.
+
+    parameters:
+        model (Model): The model to save.
+        path (str): Path to the session file.
+    """
+    session = {"version": SESSION_VERSION, **model.getSession()}
+    temporaryPath = path + ".tmp"
+    with open(temporaryPath, "w") as file:
+        json.dump(session, file)
+    os.replace(temporaryPath, path)
+
+def loadSession(path: str) -> Model:
+    """
+    Reopens both videos of a saved session at their saved frames, reusing the saved detections rather
+    than decoding and tracking the videos again.
+
+    parameters:
+        path (str): Path to the session file.
+    returns:
+        Model: A model in the state it was saved in.
+    """
+    with open(path) as file:
+        session = json.load(file)
+    if session.get("version") != SESSION_VERSION:
+        raise ValueError(f"Unsupported session version: {session.get('version')}")
+
+    videos = []
+    for state in (session["front"], session["side"]):
+        if not os.path.exists(state["filePath"]):
+            raise ValueError(f"Video not found: {state['filePath']}")
+        videos.append(Video(state["filePath"], tuple(state["ballColour"]), Backend(state["backend"]), state["scale"], state["grayscale"],
+            state.get("trackingOnly", False)))
+    model = Model(*videos)
+    model.restoreSession(session)
+    return model
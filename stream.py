@@ -0,0 +1,477 @@
+import time
+import argparse
+import threading
+import numpy as np
+import cv2 as cv
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from library import *
+from motion import *
+from Model import Model, Video
+
+# Seconds of recent frames kept from a live stream
+STREAM_BUFFER_SECONDS = 10
+# Largest number of bytes the recent frames of one stream may take, which shortens the buffer of large frames
+STREAM_MEMORY_LIMIT = 512 * 2**20
+# Number of recent frames whose motion energy sets the baseline a delivery must stand out from
+STREAM_BASELINE_FRAMES = 90
+# Milliseconds by which a delivery seen by one camera may start or end outside the other camera's window
+STREAM_PAIRING_SLACK = 500
+
+@dataclass
+class StreamClip:
+    frames: list[np.ndarray]
+    times: list[float]
+    fps: float
+    # Whether the times come from the clock shared by every live camera, rather than from the source itself
+    sharedClock: bool = False
+
+class FrameRing:
+    """
+    A fixed size buffer of the most recent frames of a stream, stored in one preallocated array so that
+    a long running stream does not allocate per frame. The array is sized once the first frame shows how
+    large frames are, holding fewer frames than asked for if they would not fit in the memory limit.
+    """
+    def __init__(self, capacity: int, memoryLimit: int | None = None) -> None:
+        """
+        Initializes the FrameRing object.
+
+        parameters:
+            capacity (int): Largest number of frames kept.
+            memoryLimit (int | None): Largest number of bytes the frames may take, or None for no limit.
+        """
+        self._maxCapacity = capacity
+        self._memoryLimit = memoryLimit
+        self._capacity = capacity
+        self._frames = None
+        self._times = np.zeros(capacity, dtype=np.float64)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def append(self, frame: np.ndarray, timestamp: float) -> int:
+        """
+        Copies a frame into the buffer, overwriting the oldest frame once the buffer is full.
+
+        parameters:
+            frame (np.ndarray): The frame.
+            timestamp (float): Time of the frame in milliseconds.
+        returns:
+            int: Index of the frame in the stream.
+        """
+        with self._lock:
+            if self._frames is None or self._frames.shape[1:] != frame.shape:
+                self._capacity = self._maxCapacity
+                if self._memoryLimit is not None:
+                    self._capacity = max(2, min(self._capacity, self._memoryLimit // max(frame.nbytes, 1)))
+                self._frames = np.empty((self._capacity, *frame.shape), dtype=frame.dtype)
+                self._times = np.zeros(self._capacity, dtype=np.float64)
+                self._count = 0
+            slot = self._count % self._capacity
+            np.copyto(self._frames[slot], frame)
+            self._times[slot] = timestamp
+            self._count += 1
+            return self._count - 1
+
+    def getCapacity(self) -> int:
+        """
+        Returns the number of frames the buffer holds once full.
+        """
+        return self._capacity
+
+    def oldest(self) -> int:
+        """
+        Returns the index of the oldest frame still held.
+        """
+        return max(0, self._count - self._capacity)
+
+    def newest(self) -> int:
+        """
+        Returns the index of the newest frame, or -1 if no frames have been added.
+        """
+        return self._count - 1
+
+    def clip(self, first: int, last: int, fps: float) -> StreamClip:
+        """
+        Copies a range of frames out of the buffer, clamped to the frames still held.
+
+        parameters:
+            first (int): Index of the first frame.
+            last (int): Index of the last frame.
+            fps (float): Nominal frame rate of the stream.
+        returns:
+            StreamClip: Copies of the frames and their times.
+        """
+        with self._lock:
+            first, last = max(first, self.oldest()), min(last, self.newest())
+            slots = np.arange(first, last + 1) % self._capacity
+            return StreamClip([self._frames[slot].copy() for slot in slots], self._times[slots].tolist(), fps)
+
+class ClipCapture:
+    """
+    A capture with the cv.VideoCapture interface which replays a clip kept from a stream.
+    """
+    def __init__(self, clip: StreamClip) -> None:
+        self._clip = clip
+        self._index = 0
+
+    def get(self, prop: int) -> float:
+        if prop == cv.CAP_PROP_FRAME_WIDTH:
+            return self._clip.frames[0].shape[1] if self._clip.frames else 0
+        if prop == cv.CAP_PROP_FRAME_HEIGHT:
+            return self._clip.frames[0].shape[0] if self._clip.frames else 0
+        if prop == cv.CAP_PROP_FPS:
+            return self._clip.fps
+        if prop == cv.CAP_PROP_POS_MSEC:
+            return self._clip.times[self._index - 1] if self._index > 0 else 0.0
+        if prop == cv.CAP_PROP_POS_FRAMES:
+            return self._index
+        if prop == cv.CAP_PROP_FRAME_COUNT:
+            return len(self._clip.frames)
+        return 0
+
+    def set(self, prop: int, value: float) -> bool:
+        if prop != cv.CAP_PROP_POS_FRAMES:
+            return False
+        self._index = int(value)
+        return True
+
+    def isOpened(self) -> bool:
+        return True
+
+    def grab(self) -> bool:
+        if self._index >= len(self._clip.frames):
+            return False
+        self._index += 1
+        return True
+
+    def read(self, image: np.ndarray = None) -> tuple[bool, np.ndarray]:
+        if not self.grab():
+            return False, None
+        return True, self._clip.frames[self._index - 1]
+
+    def release(self) -> None:
+        pass
+
+class LiveCapture:
+    """
+    A capture of a live source, such as a camera index, an RTSP or UDP URL or a named pipe, which stamps
+    each frame with the time it arrived because live sources rarely report usable timestamps.
+    """
+    def __init__(self, source: str | int, clock=time.monotonic) -> None:
+        """
+        Initializes the LiveCapture object.
+
+        parameters:
+            source (str | int): The camera index or URL of the stream.
+            clock: A function returning the current time in seconds, shared between cameras.
+        """
+        self._capture = cv.VideoCapture(source)
+        self._clock = clock
+        self._time = 0.0
+
+    def get(self, prop: int) -> float:
+        if prop == cv.CAP_PROP_POS_MSEC:
+            return self._time
+        return self._capture.get(prop)
+
+    def isOpened(self) -> bool:
+        return self._capture.isOpened()
+
+    def read(self, image: np.ndarray = None) -> tuple[bool, np.ndarray]:
+        ret, frame = self._capture.read(image)
+        self._time = self._clock() * 1000
+        return ret, frame
+
+    def release(self) -> None:
+        self._capture.release()
+
+class FileStream:
+    """
+    A stand-in for a live source which plays a video file, optionally paced to its own timestamps so
+    that frames arrive as they would from a camera.
+    """
+    def __init__(self, filePath: str, realtime: bool = False) -> None:
+        """
+        Initializes the FileStream object.
+
+        parameters:
+            filePath (str): Path to the video file.
+            realtime (bool): Whether to wait until each frame is due before returning it.
+        """
+        self._capture = cv.VideoCapture(filePath)
+        self._realtime = realtime
+        self._start = None
+
+    def get(self, prop: int) -> float:
+        return self._capture.get(prop)
+
+    def isOpened(self) -> bool:
+        return self._capture.isOpened()
+
+    def read(self, image: np.ndarray = None) -> tuple[bool, np.ndarray]:
+        ret, frame = self._capture.read(image)
+        if ret and self._realtime:
+            if self._start is None:
+                self._start = time.monotonic()
+            delay = self._start + self._capture.get(cv.CAP_PROP_POS_MSEC) / 1000 - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        return ret, frame
+
+    def release(self) -> None:
+        self._capture.release()
+
+def openStream(source: str, realtime: bool = False):
+    """
+    Opens a live source, or a video file standing in for one.
+
+    parameters:
+        source (str): A camera index, a stream URL or pipe, or the path of a video file.
+        realtime (bool): Whether a video file is paced to its timestamps.
+    returns:
+        A capture with the cv.VideoCapture read/get interface.
+    """
+    if source.isdigit():
+        return LiveCapture(int(source))
+    if "://" in source:
+        return LiveCapture(source)
+    return FileStream(source, realtime)
+
+class StreamMonitor:
+    """
+    Reads a stream on a background thread into a ring buffer, measuring motion as frames arrive, and
+    hands on a clip of each stretch of motion long enough to be a delivery once it has ended.
+    """
+    def __init__(self, capture, onDelivery, cropRegion: tuple[tuple[int, int], tuple[int, int]] = None, bufferSeconds: float = STREAM_BUFFER_SECONDS,
+            memoryLimit: int | None = STREAM_MEMORY_LIMIT) -> None:
+        """
+        Initializes the StreamMonitor object.
+
+        parameters:
+            capture: The stream to read.
+            onDelivery: Called from the monitor thread with the StreamClip of each delivery.
+            cropRegion: Region of the frame in which motion is measured, defaults to the whole frame.
+            bufferSeconds (float): Seconds of recent frames kept, if they fit in the memory limit.
+            memoryLimit (int | None): Largest number of bytes the recent frames may take, or None for no limit.
+        """
+        self._capture = capture
+        self._onDelivery = onDelivery
+        self._cropRegion = cropRegion
+        fps = capture.get(cv.CAP_PROP_FPS)
+        self._fps = fps if fps > 0 else 1000 / DEFAULT_FRAME_INTERVAL
+        self._ring = FrameRing(max(2, int(bufferSeconds * self._fps)), memoryLimit)
+        self._energy = np.zeros(STREAM_BASELINE_FRAMES)
+        # Number of entries of the baseline which hold measured energies
+        self._filled = 0
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        """
+        Starts reading the stream on a background thread.
+        """
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops reading the stream and waits for the thread to finish.
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def join(self) -> None:
+        """
+        Waits for the stream to end.
+        """
+        if self._thread is not None:
+            self._thread.join()
+
+    def run(self) -> None:
+        """
+        Reads the stream until it ends or the monitor is stopped, reporting each delivery.
+        """
+        previous = None
+        timestamp = None
+        runStart = None
+        lastActive = None
+        while not self._stopped.is_set():
+            ret, frame = self._capture.read()
+            if not ret:
+                break
+            reported = self._capture.get(cv.CAP_PROP_POS_MSEC)
+            timestamp = reported if timestamp is None or reported > timestamp else timestamp + 1000 / self._fps
+            index = self._ring.append(frame, timestamp)
+
+            if self._cropRegion is None:
+                self._cropRegion = ((0, 0), (frame.shape[1], frame.shape[0]))
+            current = downsample(frame, self._cropRegion)
+            if previous is None:
+                previous = current
+                continue
+            energy = motionEnergy(previous, current)
+            previous = current
+            active = self._filled >= STREAM_BASELINE_FRAMES // 3 and energy > self._threshold()
+            self._energy[self._filled % STREAM_BASELINE_FRAMES] = energy
+            self._filled += 1
+
+            if active:
+                if runStart is None:
+                    runStart = (index, timestamp)
+                lastActive = (index, timestamp)
+            elif runStart is not None and timestamp - lastActive[1] > max(DELIVERY_MAX_GAP, DELIVERY_PADDING):
+                self._finishRun(runStart, lastActive, index)
+                runStart = lastActive = None
+        if runStart is not None:
+            self._finishRun(runStart, lastActive, self._ring.newest())
+        self._capture.release()
+
+    def _threshold(self) -> float:
+        """
+        Returns the motion energy above which a frame counts as active, from the recent baseline. Only
+        measured entries are used, as unfilled entries would drag the baseline towards zero.
+        """
+        energy = self._energy[:min(self._filled, STREAM_BASELINE_FRAMES)]
+        median = np.median(energy)
+        deviation = np.median(np.abs(energy - median)) * 1.4826
+        return median + DELIVERY_THRESHOLD * max(deviation, 1e-3)
+
+    def _finishRun(self, runStart: tuple[int, float], lastActive: tuple[int, float], newest: int) -> None:
+        """
+        Reports a finished stretch of motion as a delivery, padded either side, if it lasted long enough.
+        """
+        if lastActive[1] - runStart[1] < DELIVERY_MIN_DURATION:
+            return
+        padding = int(np.ceil(DELIVERY_PADDING * self._fps / 1000))
+        clip = self._ring.clip(runStart[0] - padding, min(lastActive[0] + padding, newest), self._fps)
+        clip.sharedClock = isinstance(self._capture, LiveCapture)
+        self._onDelivery(clip)
+
+class LiveReview:
+    """
+    Pairs the deliveries seen by front and side stream monitors and runs the tracking and prediction
+    pipeline over each pair on a background thread as soon as both cameras have seen it end.
+    """
+    def __init__(self, stumpPosition: int, onDecision, ballColour: tuple[int] = (0, 0, 0), parameters: dict[View, Parameters] = None,
+            memoryLimit: int | None = STREAM_MEMORY_LIMIT) -> None:
+        """
+        Initializes the LiveReview object.
+
+        parameters:
+            stumpPosition (int): The stump position from the view of the side camera.
+            onDecision: Called from a background thread with the Prediction and Model of each delivery,
+                or with None and the error if no prediction could be made.
+            ballColour (tuple[int]): RGB colour of the ball.
+            parameters (dict[View, Parameters]): Ball tracking parameters of each view.
+            memoryLimit (int | None): Largest number of bytes the recent frames of each stream may take.
+        """
+        self._stumpPosition = stumpPosition
+        self._onDecision = onDecision
+        self._ballColour = ballColour
+        self._parameters = parameters or {}
+        self._memoryLimit = memoryLimit
+        self._pending = {View.FRONT: [], View.SIDE: []}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def monitor(self, view: View, capture, cropRegion: tuple[tuple[int, int], tuple[int, int]] = None) -> StreamMonitor:
+        """
+        Creates a monitor which reports the deliveries of a stream to this review.
+
+        parameters:
+            view (View): The camera the stream comes from.
+            capture: The stream to read.
+            cropRegion: Region of the frame in which motion is measured.
+        """
+        return StreamMonitor(capture, lambda clip: self.addDelivery(view, clip), cropRegion, memoryLimit=self._memoryLimit)
+
+    def addDelivery(self, view: View, clip: StreamClip) -> None:
+        """
+        Records a delivery seen by one camera, and queues its review once the other camera has seen it too.
+
+        parameters:
+            view (View): The camera which saw the delivery.
+            clip (StreamClip): The clip of the delivery.
+        """
+        other = View.SIDE if view == View.FRONT else View.FRONT
+        with self._lock:
+            for candidate in self._pending[other]:
+                if candidate.times[0] - STREAM_PAIRING_SLACK <= clip.times[-1] and clip.times[0] <= candidate.times[-1] + STREAM_PAIRING_SLACK:
+                    self._pending[other].remove(candidate)
+                    break
+            else:
+                self._pending[view].append(clip)
+                return
+        clips = {view: clip, other: candidate}
+        self._executor.submit(self._review, clips[View.FRONT], clips[View.SIDE])
+
+    def wait(self) -> None:
+        """
+        Waits for every queued review to finish.
+        """
+        self._executor.shutdown(wait=True)
+
+    def _review(self, frontClip: StreamClip, sideClip: StreamClip) -> None:
+        """
+        Tracks the ball through a pair of clips and makes a prediction, reporting it to onDecision.
+        """
+        try:
+            videos = [Video(f"stream:{view.name.lower()}", self._ballColour, opener=lambda clip=clip: ClipCapture(clip))
+                for view, clip in ((View.FRONT, frontClip), (View.SIDE, sideClip))]
+            model = Model(*videos)
+            for view in View:
+                if view in self._parameters:
+                    model.updateParameters(view, self._parameters[view])
+            if not (videos[0].incrementFrame() and videos[1].incrementFrame()):
+                raise ValueError("Delivery clip is empty.")
+            if frontClip.sharedClock and sideClip.sharedClock:
+                # Both cameras are stamped by one clock, so the clips line up without an offset
+                model.linkVideos(0.0)
+            elif model.autoLink() is None:
+                raise ValueError("Could not link the delivery clips.")
+            model.startTracking(View.FRONT)
+            while model.incrementFrame(View.FRONT):
+                pass
+            model.setStumpPosition(self._stumpPosition)
+            prediction = model.makePrediction()
+        except (ValueError, OSError, cv.error, np.linalg.LinAlgError) as e:
+            # A failed delivery must not stop the reviews of later deliveries
+            self._onDecision(None, e)
+            return
+        self._onDecision(prediction, model)
+
+def main(argv: list[str] = None) -> None:
+    """
+    Watches a front and side stream and prints a decision for each delivery.
+    """
+    parser = argparse.ArgumentParser(description="Review deliveries live from front and side camera streams")
+    parser.add_argument("front", help="camera index, stream URL, pipe or video file of the front camera")
+    parser.add_argument("side", help="camera index, stream URL, pipe or video file of the side camera")
+    parser.add_argument("--stump", type=int, required=True, help="stump position from the view of the side camera")
+    parser.add_argument("--realtime", action="store_true", help="pace video files to their timestamps as if they were live")
+    parser.add_argument("--memory-limit", type=float, default=STREAM_MEMORY_LIMIT / 2**20,
+        help="largest number of megabytes the recent frames of each stream may use")
+    arguments = parser.parse_args(argv)
+
+    def decide(prediction, result):
+        if prediction is None:
+            print(f"No decision: {result}")
+        else:
+            print(f"Delivery: line {prediction.line}, height {prediction.height} (impact at {prediction.impactTime:.2f} s)")
+
+    review = LiveReview(arguments.stump, decide, memoryLimit=int(arguments.memory_limit * 2**20))
+    monitors = [review.monitor(View.FRONT, openStream(arguments.front, arguments.realtime)),
+        review.monitor(View.SIDE, openStream(arguments.side, arguments.realtime))]
+    for monitor in monitors:
+        monitor.start()
+    try:
+        for monitor in monitors:
+            monitor.join()
+    except KeyboardInterrupt:
+        for monitor in monitors:
+            monitor.stop()
+    review.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+import cv2 as cv
+import numpy as np
+from dataclasses import dataclass, field
+
+# Number of fractional bits used when drawing circles, so that centres can sit between pixels
+DRAW_SHIFT = 4
+# Standard deviation of the blur which turns random noise into a smooth background texture
+TEXTURE_BLUR = 6
+
+@dataclass
+class BallPath:
+    """
+    A path in image coordinates which moves at constant horizontal speed and falls under constant
+    acceleration, optionally bouncing once. The height of the bounce is the ground, which the ball rolls
+    along if it comes down again rather than falling through. Times are in seconds.
+    """
+    start: tuple[float, float]
+    velocity: tuple[float, float] = (0.0, 0.0)
+    gravity: float = 0.0
+    bounceTime: float = None
+    restitution: float = 0.6
+
+    def position(self, time: float) -> tuple[float, float]:
+        """
+        Returns the (x, y) position on the path at the given time.
+        """
+        x = self.start[0] + self.velocity[0] * time
+        if self.bounceTime is None or time <= self.bounceTime:
+            return (x, self.start[1] + self.velocity[1] * time + 0.5 * self.gravity * time ** 2)
+        bounceY = self.position(self.bounceTime)[1]
+        reboundSpeed = -(self.velocity[1] + self.gravity * self.bounceTime) * self.restitution
+        elapsed = time - self.bounceTime
+        return (x, min(bounceY + reboundSpeed * elapsed + 0.5 * self.gravity * elapsed ** 2, bounceY))
+
+    def timeAtX(self, x: float) -> float:
+        """
+        Returns the time at which the path reaches the given horizontal position.
+        """
+        return (x - self.start[0]) / self.velocity[0]
+
+@dataclass
+class Circle:
+    """
+    A filled circle moving along a path, drawn in an RGB colour.
+    """
+    path: BallPath
+    radius: float
+    colour: tuple[int, int, int]
+    # Times between which the circle is drawn, defaulting to always
+    visible: tuple[float, float] = (-np.inf, np.inf)
+
+@dataclass
+class SyntheticView:
+    """
+    A camera view of a ball, and any distractor circles, over a textured background. Frames are fully
+    determined by the view so the same view always produces the same frames.
+    """
+    ball: Circle
+    size: tuple[int, int] = (480, 360)
+    fps: float = 30.0
+    duration: float = 1.0
+    # Time at which the first frame is captured, so views can start at different instants
+    startTime: float = 0.0
+    distractors: list[Circle] = field(default_factory=list)
+    texture: float = 40.0
+    noise: float = 4.0
+    seed: int = 0
+
+    def frameCount(self) -> int:
+        """
+        Returns the number of frames in the view.
+        """
+        return int(round(self.duration * self.fps))
+
+    def frameTime(self, index: int) -> float:
+        """
+        Returns the time, shared between views, at which a frame is captured.
+        """
+        return self.startTime + index / self.fps
+
+    def ballPosition(self, index: int) -> tuple[float, float]:
+        """
+        Returns the true position of the ball in a frame.
+        """
+        return self.ball.path.position(self.frameTime(index))
+
+    def background(self) -> np.ndarray:
+        """
+        Returns the smooth textured background the circles are drawn over.
+        """
+        width, height = self.size
+        rng = np.random.default_rng(self.seed)
+        texture = cv.GaussianBlur(rng.random((height, width, 3), dtype=np.float32), (0, 0), TEXTURE_BLUR)
+        texture = (texture - texture.min()) / max(float(texture.max() - texture.min()), 1e-6)
+        return (20 + texture * self.texture).astype(np.uint8)
+
+    def renderFrame(self, index: int, background: np.ndarray = None) -> np.ndarray:
+        """
+        Draws one frame of the view as a BGR image.
+
+        parameters:
+            index (int): Index of the frame.
+            background (np.ndarray): The view's background, passed in to avoid generating it per frame.
+        returns:
+            np.ndarray: The frame.
+        """
+        frame = (self.background() if background is None else background).copy()
+        if self.noise > 0:
+            rng = np.random.default_rng((self.seed, index))
+            grain = rng.normal(0, self.noise, frame.shape)
+            frame = np.clip(frame + grain, 0, 255).astype(np.uint8)
+        time = self.frameTime(index)
+        for circle in self.distractors + [self.ball]:
+            if not circle.visible[0] <= time <= circle.visible[1]:
+                continue
+            x, y = circle.path.position(time)
+            red, green, blue = circle.colour
+            scale = 1 << DRAW_SHIFT
+            cv.circle(frame, (int(round(x * scale)), int(round(y * scale))), int(round(circle.radius * scale)),
+                (blue, green, red), -1, cv.LINE_AA, shift=DRAW_SHIFT)
+        return frame
+
+class SyntheticCapture:
+    """
+    A capture with the cv.VideoCapture interface which draws the frames of a synthetic view as they are read.
+    """
+    def __init__(self, view: SyntheticView) -> None:
+        self._view = view
+        self._background = view.background()
+        self._index = 0
+
+    def get(self, prop: int) -> float:
+        if prop == cv.CAP_PROP_FRAME_WIDTH:
+            return self._view.size[0]
+        if prop == cv.CAP_PROP_FRAME_HEIGHT:
+            return self._view.size[1]
+        if prop == cv.CAP_PROP_FPS:
+            return self._view.fps
+        if prop == cv.CAP_PROP_POS_MSEC:
+            return (self._index - 1) * 1000 / self._view.fps if self._index > 0 else 0.0
+        if prop == cv.CAP_PROP_POS_FRAMES:
+            return self._index
+        if prop == cv.CAP_PROP_FRAME_COUNT:
+            return self._view.frameCount()
+        return 0
+
+    def set(self, prop: int, value: float) -> bool:
+        if prop != cv.CAP_PROP_POS_FRAMES:
+            return False
+        self._index = int(value)
+        return True
+
+    def isOpened(self) -> bool:
+        return True
+
+    def grab(self) -> bool:
+        if self._index >= self._view.frameCount():
+            return False
+        self._index += 1
+        return True
+
+    def read(self, image: np.ndarray = None) -> tuple[bool, np.ndarray]:
+        if not self.grab():
+            return False, None
+        return True, self._view.renderFrame(self._index - 1, self._background)
+
+    def release(self) -> None:
+        pass
+
+def deliveryViews(fps: tuple[float, float] = (30.0, 30.0), startTimes: tuple[float, float] = (0.0, 0.0), distractors: bool = False, ballColour: tuple[int, int, int] = (230, 30, 30), radius: float = 12.0, seed: int = 0) -> tuple[SyntheticView, SyntheticView]:
+    """
+    Returns a front and side view of the same bouncing delivery.
+
+    parameters:
+        fps (tuple[float, float]): Frame rates of the front and side views.
+        startTimes (tuple[float, float]): Times at which the front and side views start.
+        distractors (bool): Whether to add a still circle and a circle which crosses part of each view.
+        ballColour (tuple[int, int, int]): RGB colour of the ball.
+        radius (float): Radius of the ball in pixels.
+        seed (int): Seed of the backgrounds and noise.
+    returns:
+        tuple[SyntheticView, SyntheticView]: The front and side views.
+    """
+    # The ball rebounds hard enough to stay off the ground until after every clip has ended
+    bounceTime = 0.35
+    front = BallPath(start=(200.0, 60.0), velocity=(40.0, 60.0), gravity=900.0, bounceTime=bounceTime, restitution=0.85)
+    side = BallPath(start=(40.0, 80.0), velocity=(380.0, 120.0), gravity=1300.0, bounceTime=bounceTime, restitution=0.85)
+    views = []
+    for index, (path, rate, start) in enumerate(zip((front, side), fps, startTimes)):
+        extras = []
+        if distractors:
+            extras = [
+                Circle(BallPath(start=(440.0, 40.0)), radius * 1.4, (255, 40, 40)),
+                Circle(BallPath(start=(440.0, 340.0), velocity=(0.0, -260.0)), radius * 1.2, (240, 60, 60), visible=(0.1, 0.6)),
+            ]
+        views.append(SyntheticView(Circle(path, radius, ballColour), fps=rate, startTime=start, distractors=extras, seed=seed + index))
+    return tuple(views)
+
+def groundTruth(front: SyntheticView, side: SyntheticView, stumpPosition: float) -> tuple[float, float, float]:
+    """
+    Returns the true time at which the ball reaches the stumps and its line and height there.
+
+    parameters:
+        front (SyntheticView): The front view.
+        side (SyntheticView): The side view.
+        stumpPosition (float): Horizontal position of the stumps in the side view.
+    returns:
+        tuple[float, float, float]: The impact time in seconds, the line in the front view and the height
+            in the side view, both in pixels.
+    """
+    impactTime = side.ball.path.timeAtX(stumpPosition)
+    return (impactTime, front.ball.path.position(impactTime)[0], side.ball.path.position(impactTime)[1])
+
+def writeVideo(view: SyntheticView, path: str, fourcc: str = "mp4v") -> str:
+    """
+    Encodes a synthetic view to a video file, such as for building harness datasets.
+
+    parameters:
+        view (SyntheticView): The view to encode.
+        path (str): Path to the video file.
+        fourcc (str): Codec of the video.
+    returns:
+        str: The path written.
+    """
+    writer = cv.VideoWriter(path, cv.VideoWriter_fourcc(*fourcc), view.fps, view.size)
+    background = view.background()
+    for index in range(view.frameCount()):
+        writer.write(view.renderFrame(index, background))
+    writer.release()
+    return path
@@ -0,0 +1,105 @@
+import pytest
+import numpy as np
+import Model as model
+import export
+
+Video = model.Video
+Model = model.Model
+View = model.View
+
+
+def makeTrackedModel():
+    """Creates a model with a bouncing delivery restored straight into both videos."""
+    times = np.arange(12) * 1000 / 30
+    seconds = times / 1000
+    bounce = 5
+    frontX = 300 + 60 * seconds
+    frontY = np.where(np.arange(12) <= bounce, 100 + 2000 * seconds, 100 + 2000 * seconds[bounce] - 900 * (seconds - seconds[bounce]))
+    sideX = 100 + 1500 * seconds
+    sideY = np.where(np.arange(12) <= bounce, 50 + 1800 * seconds, 50 + 1800 * seconds[bounce] - 1200 * (seconds - seconds[bounce]) + 3000 * (seconds - seconds[bounce]) ** 2)
+
+    front = Video("front.mp4", (0, 0, 0))
+    front.restoreTracking([(x, y, 10, i) for i, (x, y) in enumerate(zip(frontX, frontY))], times)
+    side = Video("side.mp4", (0, 0, 0))
+    side.restoreTracking([(x, y, 10, i) for i, (x, y) in enumerate(zip(sideX, sideY))], times)
+    result = Model(front, side)
+    result.restore(800)
+    return result
+
+
+class TestExport:
+    def testExportAppendsAndRestores(self, tmp_path):
+        path = str(tmp_path / "deliveries.npz")
+        original = makeTrackedModel()
+        prediction = original.makePrediction()
+        line, height = prediction.line, prediction.height
+
+        assert export.exportDelivery(original, path) == 0
+        assert export.exportDelivery(original, path) == 1
+
+        columns = export.loadDeliveries(path)
+        assert columns["line"].tolist() == [line, line]
+        assert columns["frontPath"].tolist() == ["front.mp4", "front.mp4"]
+        assert len(columns["pointX"]) == 48
+        assert np.count_nonzero(columns["pointDelivery"] == 1) == 24
+
+        restored = export.restoreModel(columns, 1)
+        assert restored.getPrediction() == original.getPrediction()
+        repeated = restored.makePrediction()
+        assert (repeated.line, repeated.height) == pytest.approx((line, height), abs=1)
+        np.testing.assert_allclose(restored.getVideo(View.SIDE).getPoints(), original.getVideo(View.SIDE).getPoints(), rtol=1e-6)
+
+    def testExportRequiresPrediction(self, tmp_path):
+        with pytest.raises(ValueError):
+            export.exportDelivery(makeTrackedModel(), str(tmp_path / "deliveries.npz"))
+
+    def testExportFillsColumnsMissingFromOlderFiles(self, tmp_path):
+        path = str(tmp_path / "deliveries.npz")
+        original = makeTrackedModel()
+        original.makePrediction()
+        # A file written before the format was versioned and before confidence intervals were exported
+        legacy = export.deliveryColumns(original)
+        del legacy["lineInterval"], legacy["heightInterval"]
+        np.savez_compressed(path, **legacy)
+
+        assert export.exportDelivery(original, path) == 1
+        columns = export.loadDeliveries(path)
+        assert int(columns["formatVersion"]) == export.EXPORT_FORMAT_VERSION
+        assert columns["lineInterval"].shape == (2, 2)
+        assert np.isnan(columns["lineInterval"][0]).all()
+        assert np.isfinite(columns["lineInterval"][1]).all()
+        assert columns["pointDelivery"].tolist() == [0] * 24 + [1] * 24
+
+    def testRestoreWithoutVideosOrPointTimes(self, monkeypatch):
+        original = makeTrackedModel()
+        prediction = original.makePrediction()
+        columns = export.deliveryColumns(original)
+        # A file written before point times were exported has them filled with NaN
+        columns["pointTime"] = np.full(len(columns["pointX"]), np.nan)
+
+        def openCapture(*arguments):
+            raise OSError("The source videos must not be opened.")
+
+        monkeypatch.setattr(model, "openCapture", openCapture)
+        restored = export.restoreModel(columns, 0)
+        assert np.isfinite(restored.getVideo(View.SIDE).getPointTimes()).all()
+        assert [restored.getPairedFrame(View.FRONT, frame) for frame in (0, 5, 11)] == [0, 5, 11]
+        repeated = restored.makePrediction()
+        assert (repeated.line, repeated.height) == pytest.approx((prediction.line, prediction.height), abs=1)
+
+    def testPairingSkipsFramesWithoutTimes(self):
+        restored = makeTrackedModel()
+        side = restored.getVideo(View.SIDE)
+        points = side.getPoints()
+        # Frames without a tracked point are restored without a timestamp
+        side.restoreTracking([point for point in points if point[3] != 6], [i * 1000 / 30 for i in range(12) if i != 6])
+        assert np.isnan(side.getTimestamps()[6])
+        assert [restored.getPairedFrame(View.FRONT, frame) for frame in (5, 6, 7)] == [5, 6, 7]
+
+    def testExportRejectsNewerFormat(self, tmp_path):
+        path = str(tmp_path / "deliveries.npz")
+        original = makeTrackedModel()
+        original.makePrediction()
+        np.savez_compressed(path, formatVersion=np.array(export.EXPORT_FORMAT_VERSION + 1), **export.deliveryColumns(original))
+        with pytest.raises(ValueError):
+            export.exportDelivery(original, path)
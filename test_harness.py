@@ -0,0 +1,76 @@
+import pytest
+import numpy as np
+import cv2 as cv
+import harness
+
+
+def writeBallClip(path, xs, ys, size):
+    """Writes a clip of a red ball moving through the given positions on a dark background."""
+    writer = cv.VideoWriter(str(path), cv.VideoWriter_fourcc(*"mp4v"), 30, size)
+    for x, y in zip(xs, ys):
+        frame = np.full((size[1], size[0], 3), 40, dtype=np.uint8)
+        cv.circle(frame, (int(x), int(y)), 15, (30, 30, 230), -1)
+        writer.write(frame)
+    writer.release()
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    """A dataset of two labelled deliveries sharing one bouncing clip pair, the second labelled wrongly."""
+    seconds = np.arange(12) / 30
+    bounce = 5
+    after = seconds - seconds[bounce]
+    falling = np.arange(12) <= bounce
+    writeBallClip(tmp_path / "front.mp4", 300 + 60 * seconds,
+        np.where(falling, 100 + 2000 * seconds, 100 + 2000 * seconds[bounce] - 900 * after), (640, 480))
+    writeBallClip(tmp_path / "side.mp4", 100 + 1500 * seconds,
+        np.where(falling, 50 + 1800 * seconds, 50 + 1800 * seconds[bounce] - 1200 * after + 3000 * after ** 2), (960, 540))
+
+    truth = harness.evaluateDelivery(harness.Delivery("truth", str(tmp_path / "front.mp4"), str(tmp_path / "side.mp4"), 800, 0, 0))
+    (tmp_path / harness.LABELS_FILE).write_text(
+        "name,front,side,stump,line,height,offset\n"
+        f"good,front.mp4,side.mp4,800,{truth.line},{truth.height},\n"
+        f"bad,front.mp4,side.mp4,800,{truth.line + 50},{truth.height},0\n"
+    )
+    return str(tmp_path)
+
+
+class TestHarness:
+    def testLoadDataset(self, dataset):
+        deliveries = harness.loadDataset(dataset)
+        assert [delivery.name for delivery in deliveries] == ["good", "bad"]
+        assert deliveries[0].frontPath.endswith("front.mp4")
+        assert deliveries[0].offset is None and deliveries[1].offset == 0
+
+    def testEvaluateInParallel(self, dataset):
+        report = harness.evaluateDeliveries(harness.loadDataset(dataset), workers=2)
+        assert [result.error for result in report.results] == [None, None]
+        assert report.results[0].lineError == 0 and report.results[1].lineError == 50
+        assert report.accuracy() == 0.5
+        assert report.results[0].frames == 24
+        assert report.throughput()[0] > 0
+        assert "Accuracy within 10 px: 50.0%" in report.summary()
+
+    def testSweepPicksSettingMeetingTarget(self, dataset):
+        deliveries = harness.loadDataset(dataset)[:1]
+        # An accumulator threshold this high finds no circles, so no prediction can be made
+        best, reports = harness.sweepParameters(deliveries, {"param2": [30, 1000]}, target=1.0, workers=1)
+        assert best.param2 == 30
+        assert reports[1][1].failures() == 1
+        assert harness.parseSweep(["param2=20,30", "dp=1.5"]) == {"param2": [20, 30], "dp": [1.5]}
+        with pytest.raises(ValueError):
+            harness.parameterGrid({"speed": [1]})
+
+    def testOpenCVErrorFailsOnlyItsDelivery(self, dataset):
+        deliveries = harness.loadDataset(dataset)[:1]
+        # OpenCV rejects an even blur size, which must not abort the other settings evaluated alongside it
+        best, reports = harness.sweepParameters(deliveries, {"blurSqrSize": [10, 11]}, target=1.0, workers=2)
+        assert best.blurSqrSize == 11
+        assert reports[0][1].failures() == 1 and reports[1][1].failures() == 0
+
+    def testSweepUsesFitMode(self, dataset, monkeypatch):
+        modes = []
+        evaluate = harness.evaluateDelivery
+        monkeypatch.setattr(harness, "evaluateDelivery", lambda delivery, parameters, fitMode: modes.append(fitMode) or evaluate(delivery, parameters, fitMode))
+        harness.main([dataset, "--fit-mode", "huber", "--sweep", "param2=30", "--workers", "1"])
+        assert modes == [harness.FitMode.HUBER] * 2
@@ -1,6 +1,9 @@
 import pytest
 import numpy as np
+from dataclasses import replace
 import Model as model
+import decoders
+import playback
 
 Video = model.Video
 Model = model.Model
@@ -10,12 +13,13 @@ defaultParameters = model.defaultParameters
 
 class FakeCapture:
     """A small fake replacement for cv2.VideoCapture used in tests."""
-    def __init__(self, frames=None, width=640, height=480, fps=30):
+    def __init__(self, frames=None, width=640, height=480, fps=30, timestamps=None):
         self._frames = frames or []
         self._i = 0
         self._width = width
         self._height = height
         self._fps = fps
+        self._timestamps = timestamps
 
     def get(self, prop):
         if prop == model.cv.CAP_PROP_FRAME_WIDTH:
@@ -24,15 +28,32 @@ class FakeCapture:
             return self._height
         if prop == model.cv.CAP_PROP_FPS:
             return self._fps
+        if prop == model.cv.CAP_PROP_POS_MSEC and self._timestamps is not None and self._i > 0:
+            return self._timestamps[self._i - 1]
         return 0
 
-    def read(self):
+    def read(self, image=None):
         if self._i < len(self._frames):
             f = self._frames[self._i]
             self._i += 1
             return True, f
         return False, None
 
+    def grab(self):
+        if self._i < len(self._frames):
+            self._i += 1
+            return True
+        return False
+
+    def set(self, prop, value):
+        if prop == model.cv.CAP_PROP_POS_FRAMES:
+            self._i = int(value)
+            return True
+        return False
+
+    def release(self):
+        pass
+
 
 class DummyVideo:
     def __init__(self, frame, points):
@@ -106,4 +127,555 @@ class TestVideo:
         assert video.incrementFrame() is True
         np.testing.assert_array_equal(video._curFrame, frame2)
 
-        assert video.incrementFrame() is False  # No more frames
\ No newline at end of file
+        assert video.incrementFrame() is False  # No more frames
+
+    def testSubpixelRefinement(self):
+        for seed, (x, y) in enumerate([(120.3, 95.7), (141.6, 100.45), (107.85, 118.2)]):
+            video = makeBallFrameVideo(x, y, seed)
+            video._recalculatePoints()
+            rounded = video.getPoints()[0]
+            assert float(rounded[0]).is_integer() and float(rounded[1]).is_integer()
+
+            video.setRefinement(True)
+            refined = video.getPoints()[0]
+            assert np.hypot(refined[0] - x, refined[1] - y) < 0.2
+            assert refined[3] == 0
+
+    def testAutoTuneFindsClickedBalls(self):
+        rng = np.random.default_rng(1)
+        positions = [(60, 50), (140, 110), (220, 170)]
+        frames = []
+        for x, y in positions:
+            frame = (rng.random((240, 320, 3)) * 60).astype(np.uint8)
+            model.cv.circle(frame, (x, y), 7, (30, 30, 230), -1)
+            frames.append(frame)
+        video = Video("some.mp4", (0, 0, 0))
+        video._video = FakeCapture(frames=frames, width=320, height=240)
+        video._cropRegion = ((0, 0), (320, 240))
+        video.incrementFrame()
+        video.markFirstFrame()
+        while video.incrementFrame():
+            pass
+
+        # The default parameters look for balls too large to find these
+        assert video.getPoints() == []
+        parameters, hits = video.autoTune([(i, x + 0.5, y - 0.5) for i, (x, y) in enumerate(positions)])
+        assert hits == 3
+        assert video._params == parameters
+        assert [point[3] for point in video.getPoints()] == [0, 1, 2]
+        for point, (x, y) in zip(video.getPoints(), positions):
+            assert abs(int(point[0]) - x) <= 2 and abs(int(point[1]) - y) <= 2
+        with pytest.raises(ValueError):
+            video.autoTune([(0, 60, 50)])
+
+    def testTrackIgnoresJumpingDistractors(self):
+        rng = np.random.default_rng(2)
+        ball = [(60 + 25 * i, 80 + 10 * i) for i in range(8)]
+        frames = []
+        for i, (x, y) in enumerate(ball):
+            frame = (rng.random((360, 480, 3)) * 40).astype(np.uint8)
+            model.cv.circle(frame, (x, y), 14, (30, 30, 200), -1)
+            # A brighter, larger circle far from the ball which jumps between frames
+            distractor = (420, 60) if i % 2 == 0 else (380, 320)
+            model.cv.circle(frame, distractor, 20, (30, 30, 255), -1)
+            frames.append(frame)
+        video = Video("some.mp4", (0, 0, 0))
+        video._video = FakeCapture(frames=frames, width=480, height=360)
+        parameters = defaultParameters()
+        parameters.param2 = 20
+        parameters.maxStep = 60
+        video.updateParameters(parameters)
+        video.incrementFrame()
+        video.markFirstFrame()
+        while video.incrementFrame():
+            pass
+
+        points = video.getPoints()
+        assert [point[3] for point in points] == list(range(1, 8))
+        for point, (x, y) in zip(points, ball[1:]):
+            assert np.hypot(point[0] - x, point[1] - y) <= 3
+
+    def testMaxStepOnlyResolvesTrack(self, monkeypatch):
+        video = makeBallFrameVideo(120, 95)
+        video._recalculatePoints()
+        points = video.getPoints()
+        detections = []
+        detect = video._detectCandidates
+        monkeypatch.setattr(video, "_detectCandidates", lambda frame: detections.append(frame) or detect(frame))
+
+        parameters = replace(video.getParameters(), maxStep=40)
+        video.updateParameters(parameters)
+        assert detections == [] and video.getPoints() == points
+        parameters = replace(parameters, param2=25)
+        video.updateParameters(parameters)
+        assert len(detections) == 1
+
+    @pytest.mark.parametrize("frameLimit", [3, 0.1])
+    def testMemoryLimitEvictsOldFrames(self, frameLimit):
+        rng = np.random.default_rng(3)
+        frames = []
+        for i in range(10):
+            frame = (rng.random((240, 320, 3)) * 60).astype(np.uint8)
+            model.cv.circle(frame, (60 + 20 * i, 60 + 10 * i), 15, (30, 30, 230), -1)
+            frames.append(frame)
+        videos = []
+        for limit in (None, int(frameLimit * frames[0].nbytes)):
+            video = Video("some.mp4", (0, 0, 0), opener=lambda: FakeCapture(frames=frames, width=320, height=240))
+            video.setMemoryLimit(limit)
+            video.incrementFrame()
+            video.markFirstFrame()
+            while video.incrementFrame():
+                pass
+            videos.append(video)
+        unlimited, limited = videos
+
+        usage = limited.getMemoryUsage()
+        # Only the current frame is held whole, however low the limit
+        assert usage.frames == frames[0].nbytes
+        assert usage.frames + usage.planes <= max(limited.getMemoryLimit(), frames[0].nbytes)
+        assert unlimited.getMemoryUsage().frames == 10 * frames[0].nbytes
+        np.testing.assert_array_equal(limited.getCurrentFrame(), frames[-1])
+
+        # Retracking reuses the planes that were kept and decodes the frames that were dropped
+        parameters = replace(defaultParameters(), param2=25)
+        for video in videos:
+            video.updateParameters(parameters)
+        assert len(limited.getPoints()) == 10
+        assert limited.getPoints() == unlimited.getPoints()
+
+    def testTrackingOnlyKeepsPlanes(self):
+        rng = np.random.default_rng(4)
+        frames = []
+        for i in range(8):
+            frame = (rng.random((240, 320, 3)) * 60).astype(np.uint8)
+            model.cv.circle(frame, (60 + 20 * i, 60 + 10 * i), 15, (30, 30, 230), -1)
+            frames.append(frame)
+        opened = []
+        videos = []
+        for trackingOnly in (False, True):
+            video = Video("some.mp4", (0, 0, 0), trackingOnly=trackingOnly,
+                opener=lambda: opened.append(True) or FakeCapture(frames=frames, width=320, height=240))
+            video.cropToRegion((20, 10), (300, 230))
+            video.incrementFrame()
+            video.markFirstFrame()
+            while video.incrementFrame():
+                pass
+            videos.append(video)
+        full, trackingOnly = videos
+
+        usage = trackingOnly.getMemoryUsage()
+        assert usage.frames == frames[0].nbytes
+        assert usage.planes == 8 * 280 * 220
+        np.testing.assert_array_equal(trackingOnly.getCurrentFrame(), frames[-1])
+        assert trackingOnly.getPoints() == full.getPoints()
+        assert len(full.getPoints()) == 7
+
+        # Retracking uses the kept planes without decoding any frames again
+        opened.clear()
+        parameters = replace(defaultParameters(), param2=25)
+        for video in videos:
+            video.updateParameters(parameters)
+        assert opened == []
+        assert trackingOnly.getPoints() == full.getPoints()
+
+    def testTimestampsFallBackToFPS(self):
+        frames = [np.zeros((10, 10, 3), dtype=np.uint8) for _ in range(3)]
+        video = Video("some.mp4", (0, 0, 0))
+        video._video = FakeCapture(frames=frames, fps=25)
+
+        while video.incrementFrame():
+            pass
+        assert video.getTimestamps() == [0, 40, 80]
+        assert video.getFrameInterval() == pytest.approx(40)
+
+    def testTimestampsFromCapture(self):
+        frames = [np.zeros((10, 10, 3), dtype=np.uint8) for _ in range(4)]
+        video = Video("some.mp4", (0, 0, 0))
+        video._video = FakeCapture(frames=frames, fps=30, timestamps=[0, 30, 70, 100])
+
+        while video.incrementFrame():
+            pass
+        assert video.getTimestamp() == 100
+        assert video.getTimestamp(2) == 70
+
+
+def makeBallFrameVideo(x, y, seed=0):
+    """Creates a video holding a single noisy frame with a red ball centred at a sub-pixel position."""
+    frame = (np.random.default_rng(seed).random((240, 320, 3)) * 60).astype(np.uint8)
+    model.cv.circle(frame, (int(x * 16), int(y * 16)), 15 * 16, (30, 30, 230), -1, model.cv.LINE_AA, shift=4)
+    video = Video("some.mp4", (0, 0, 0))
+    video._video = FakeCapture(frames=[frame], width=320, height=240)
+    video._cropRegion = ((0, 0), (320, 240))
+    video.incrementFrame()
+    video.markFirstFrame()
+    return video
+
+
+def makeTimedVideo(numFrames, fps, start=0):
+    """Creates a video whose capture reports exact presentation timestamps at the given frame rate."""
+    frames = [np.zeros((10, 10, 3), dtype=np.uint8) for _ in range(numFrames)]
+    timestamps = [start + i * 1000 / fps for i in range(numFrames)]
+    video = Video("some.mp4", (0, 0, 0))
+    video._video = FakeCapture(frames=frames, fps=fps, timestamps=timestamps)
+    return video
+
+
+class TestModel:
+    def testLinkRequiresFrames(self):
+        model = Model(makeTimedVideo(5, 30), makeTimedVideo(5, 30))
+        assert model.linkVideos() is False
+
+    def testLinkedIncrementStaysInSync(self):
+        front = makeTimedVideo(600, 59.94)
+        side = makeTimedVideo(300, 29.97, start=500)
+        front.incrementFrame()
+        side.incrementFrame()
+        model = Model(front, side)
+        assert model.linkVideos() is True
+
+        for _ in range(500):
+            assert model.incrementFrame(View.FRONT) is True
+            drift = model._linkedTime(front) - model._linkedTime(side)
+            assert abs(drift) <= side.getFrameInterval() / 2 + 1e-6
+        assert front.getTimestamp() - side.getTimestamp() == pytest.approx(-500, abs=17)
+
+    def testRenderOnlyChangedViews(self):
+        front, side = makeTimedVideo(5, 30), makeTimedVideo(5, 30)
+        front.incrementFrame()
+        side.incrementFrame()
+        model = Model(front, side)
+        assert set(model.render(changedOnly=True)) == {View.FRONT, View.SIDE}
+        assert model.render(changedOnly=True) == {}
+
+        model.incrementFrame(View.FRONT)
+        renders = model.render(changedOnly=True)
+        assert set(renders) == {View.FRONT}
+        assert renders[View.FRONT].frame is not None
+
+        # Markings changed but the frame did not, so the cached frame is reused
+        model.setStumpPosition(5)
+        renders = model.render(changedOnly=True)
+        assert set(renders) == {View.SIDE}
+        assert renders[View.SIDE].frame is None
+        assert renders[View.SIDE].verticalLines == [5]
+        assert model.render()[View.SIDE].frame is not None
+
+    def testGetPairedFrame(self):
+        front = makeTimedVideo(10, 60)
+        side = makeTimedVideo(5, 30)
+        front.incrementFrame()
+        side.incrementFrame()
+        model = Model(front, side)
+        model.linkVideos()
+        for _ in range(6):
+            model.incrementFrame(View.FRONT)
+
+        assert model.getPairedFrame(View.FRONT, 4) == 2
+        assert model.getPairedFrame(View.SIDE, 3) == 6
+
+    def testAutoLinkAlignsVideos(self):
+        # A bright square appears at 1.0s in front time, and at 1.25s in the side video
+        def makeFlashVideo(fps, flashTime):
+            frames = []
+            for i in range(int(fps * 2)):
+                frame = np.zeros((40, 40, 3), dtype=np.uint8)
+                if i * 1000 / fps >= flashTime:
+                    frame[10:30, 10:30] = 255
+                frames.append(frame)
+            video = Video("some.mp4", (0, 0, 0))
+            video._video = FakeCapture(frames=frames, fps=fps, width=40, height=40)
+            video._cropRegion = ((0, 0), (40, 40))
+            video._opener = lambda: FakeCapture(frames=frames, fps=fps, width=40, height=40)
+            video.incrementFrame()
+            return video
+
+        front = makeFlashVideo(30, 1000)
+        side = makeFlashVideo(60, 1250)
+        model = Model(front, side)
+
+        offset = model.autoLink()
+        assert offset == pytest.approx(250, abs=20)
+        assert side.getTimestamp() - front.getTimestamp() == pytest.approx(offset, abs=side.getFrameInterval())
+
+
+class TestPlayback:
+    def testAdvanceToTracksEveryFrame(self):
+        model = Model(makeTimedVideo(10, 25), makeTimedVideo(10, 25))
+        video = model.getVideo(View.FRONT)
+        assert model.advanceTo(View.FRONT, 150) is True
+        assert video.getTimestamp() == 160
+        assert video.getFrameCount() == 5
+        assert model.advanceTo(View.FRONT, 1000) is False
+        assert video.getFrameCount() == 10
+
+    def testSchedulerDropsRendersNotTime(self):
+        now = [0.0]
+        scheduler = playback.PlaybackScheduler(500, targetRate=20, clock=lambda: now[0])
+        assert scheduler.getTickInterval() == 50
+        assert scheduler.achievedRate() == 0.0
+
+        for tick in range(11):
+            now[0] = tick * 0.05
+            # Every other tick arrives while the previous frame is still being tracked
+            if tick % 2:
+                scheduler.dropRender()
+            else:
+                scheduler.recordRender()
+        assert scheduler.dueTime() == pytest.approx(1000)
+        assert scheduler.getDroppedRenders() == 5
+        assert scheduler.achievedRate() == pytest.approx(10)
+
+
+class CountingCapture(FakeCapture):
+    """A fake capture which counts the frames it decodes and the frames it only grabs."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reads = 0
+        self.grabs = 0
+
+    def read(self, image=None):
+        self.reads += 1
+        return super().read(image)
+
+    def grab(self):
+        self.grabs += 1
+        return super().grab()
+
+
+def makeIdleVideo(captures=None):
+    """
+    Creates a 4 second 30fps video with a square moving across it from 2.0s to 2.5s, adding each capture
+    opened for a scan to the given list.
+    """
+    frames = []
+    for i in range(120):
+        frame = np.zeros((60, 60, 3), dtype=np.uint8)
+        if 60 <= i < 75:
+            x = (i - 60) * 3
+            frame[20:30, x:x + 10] = 255
+        frames.append(frame)
+    video = Video("some.mp4", (0, 0, 0))
+    video._video = FakeCapture(frames=frames, fps=30, width=60, height=60)
+    video._cropRegion = ((0, 0), (60, 60))
+
+    def opener():
+        capture = CountingCapture(frames=frames, fps=30, width=60, height=60)
+        if captures is not None:
+            captures.append(capture)
+        return capture
+    video._opener = opener
+    return video
+
+
+class TestMotion:
+    def testFindDeliveryWindows(self):
+        video = makeIdleVideo()
+        assert video.findDeliveryWindows(step=1) == [(51, 83)]
+        assert video.findDeliveryWindows(step=2) == [(52, 84)]
+
+    def testSkipToDelivery(self):
+        captures = []
+        video = makeIdleVideo(captures)
+        video.incrementFrame()
+        model = Model(video, makeIdleVideo())
+
+        assert model.skipToDelivery(View.FRONT) is True
+        # The pre-scan measures one frame in every 50ms and only grabs the frames in between
+        scan = captures[-1]
+        assert scan.reads == 61 and scan.grabs == 60
+        assert len(video._frames) == 53
+        assert video._frames[1] is None
+        assert video._frames[52] is not None
+        assert video.getTimestamp() == pytest.approx(52 * 1000 / 30)
+        assert model.skipToDelivery(View.FRONT) is False
+
+    def testEstimateOffsetSubFrame(self):
+        def bumps(times, events):
+            return sum(np.exp(-((times - event) / 40) ** 2) for event in events)
+
+        events = np.array([400, 900, 1700, 2300])
+        frontTimes = np.arange(0, 3000, 1000 / 29.97)
+        sideTimes = np.arange(0, 3000, 1000 / 59.94)
+        offset = 123.4
+        signalFront = bumps(frontTimes, events)
+        signalSide = bumps(sideTimes, events + offset)
+
+        estimate = model.estimateOffset(frontTimes, signalFront, sideTimes, signalSide)
+        assert estimate == pytest.approx(offset, abs=3)
+        assert model.estimateOffset(sideTimes, signalSide, frontTimes, signalFront) == pytest.approx(-offset, abs=3)
+
+
+def writeTestVideo(path, numFrames=12, fps=24, size=(64, 48)):
+    """Writes a small video file where each frame has a distinct brightness."""
+    writer = model.cv.VideoWriter(str(path), model.cv.VideoWriter_fourcc(*"mp4v"), fps, size)
+    for i in range(numFrames):
+        writer.write(np.full((size[1], size[0], 3), i * 20, dtype=np.uint8))
+    writer.release()
+    return str(path)
+
+
+class TestDecoders:
+    def testOpenCVCaptureScaleAndGrayscale(self, tmp_path):
+        path = writeTestVideo(tmp_path / "clip.mp4")
+        video = Video(path, (0, 0, 0), scale=0.5, grayscale=True)
+
+        assert video.getDimensions() == (32, 24)
+        assert video.incrementFrame() is True
+        assert video.getCurrentFrame().shape == (24, 32)
+
+    def testPyAVMatchesOpenCV(self, tmp_path):
+        pytest.importorskip("av")
+        path = writeTestVideo(tmp_path / "clip.mp4")
+        reference = Video(path, (0, 0, 0))
+        video = Video(path, (0, 0, 0), backend=model.Backend.PYAV)
+
+        assert video.getDimensions() == reference.getDimensions()
+        assert video.getFPS() == pytest.approx(24)
+        while reference.incrementFrame():
+            assert video.incrementFrame() is True
+            assert np.abs(video.getCurrentFrame().astype(int) - reference.getCurrentFrame()).mean() < 3
+        assert video.incrementFrame() is False
+        assert video.getTimestamps() == pytest.approx(reference.getTimestamps())
+
+    @pytest.mark.parametrize("backend", list(model.Backend))
+    def testSeekToFrame(self, tmp_path, backend):
+        if backend == model.Backend.PYAV:
+            pytest.importorskip("av")
+        path = writeTestVideo(tmp_path / "clip.mp4")
+        capture = decoders.openCapture(path, backend)
+        assert capture.set(model.cv.CAP_PROP_POS_FRAMES, 7)
+        ret, frame = capture.read()
+        assert ret and abs(int(frame.mean()) - 7 * 20) <= 3
+        assert capture.get(model.cv.CAP_PROP_POS_MSEC) == pytest.approx(7 * 1000 / 24, abs=1)
+        ret, frame = capture.read()
+        assert ret and abs(int(frame.mean()) - 8 * 20) <= 3
+
+    def testPyAVReadsIntoBuffer(self, tmp_path):
+        pytest.importorskip("av")
+        path = writeTestVideo(tmp_path / "clip.mp4")
+        capture = decoders.PyAVCapture(path, scale=0.5, grayscale=True)
+        buffer = np.empty((24, 32), dtype=np.uint8)
+
+        ret, frame = capture.read(buffer)
+        assert ret is True
+        assert frame is buffer
+        assert capture.grab() is True
+        assert capture.get(model.cv.CAP_PROP_POS_FRAMES) == 2
+
+
+class TestFitting:
+    def testFindBounceIgnoresSpuriousDetection(self):
+        xs = np.arange(20, dtype=float)
+        ys = np.where(xs <= 8, 100 + 20 * xs, 260 - 12 * (xs - 8))
+        ys[14] = 400  # a false detection far below the pitch
+
+        bounce, confidence = model.findBounce(xs, ys)
+        assert bounce == 8
+        assert confidence > 0.8
+
+    def testFindBounceWithoutBounce(self):
+        xs = np.arange(10, dtype=float)
+        assert model.findBounce(xs, 100 + 5 * xs) == (0, 0.0)
+        assert model.findBounce(xs[:2], xs[:2]) == (0, 0.0)
+
+    def testStandardFitMatchesPolyfit(self):
+        xs = np.linspace(0, 1, 15)
+        ys = 3 * xs ** 2 - 2 * xs + 1 + np.sin(xs * 40) * 0.01
+        fit = model.fitTrajectory(xs, ys, 2)
+        np.testing.assert_allclose(fit.coefficients, np.polyfit(xs, ys, 2))
+        assert fit.inlierCount() == 15
+
+    @pytest.mark.parametrize("mode", [model.FitMode.RANSAC, model.FitMode.HUBER])
+    def testRobustFitsRejectOutliers(self, mode):
+        xs = np.linspace(0, 0.5, 20)
+        ys = 400 - 300 * xs + 200 * xs ** 2
+        ys[[4, 13]] += [80, -60]
+
+        fit = model.fitTrajectory(xs, ys, 2, mode)
+        np.testing.assert_allclose(fit.coefficients, [200, -300, 400], rtol=0.05)
+        assert not fit.inliers[4] and not fit.inliers[13]
+        if mode == model.FitMode.RANSAC:
+            assert fit.inlierCount() == 18
+            assert fit.residualError() < 1e-6
+
+
+def lookAt(eye, target, focal=1000, centre=(480, 270)):
+    """Returns the projection matrix of a pinhole camera at eye looking at target with Z up."""
+    eye, target = np.asarray(eye, dtype=float), np.asarray(target, dtype=float)
+    forward = (target - eye) / np.linalg.norm(target - eye)
+    right = np.cross(forward, [0, 0, 1])
+    right /= np.linalg.norm(right)
+    down = np.cross(forward, right)
+    rotation = np.stack((right, down, forward))
+    intrinsics = np.array([[focal, 0, centre[0]], [0, focal, centre[1]], [0, 0, 1]])
+    return intrinsics @ np.concatenate((rotation, -rotation @ eye[:, None]), axis=1)
+
+
+class TestReconstruction:
+    REFERENCES = np.array([
+        [-1.5, 0, 0], [1.5, 0, 0], [-1.5, 20.12, 0], [1.5, 20.12, 0],
+        [-0.11, 20.12, 0.711], [0.11, 20.12, 0.711], [-0.11, 0, 0.711], [0.11, 0, 0.711],
+    ])
+
+    def testCalibrateCameraRecoversProjection(self):
+        projection = lookAt([0, -5, 2], [0, 20, 0])
+        calibrated = model.calibrateCamera(model.project(projection, self.REFERENCES), self.REFERENCES)
+        np.testing.assert_allclose(model.project(calibrated, [[0.3, 12, 0.4]]), model.project(projection, [[0.3, 12, 0.4]]), atol=1e-6)
+
+    def testModelReconstructsImpactPoint(self):
+        cameras = {View.FRONT: lookAt([0, 28, 1.5], [0, 10, 0]), View.SIDE: lookAt([25, 10, 1.5], [0, 10, 0])}
+        truth = model.Reconstruction(np.array([0.2, 14.0, 0.0]), np.array([-0.4, 30.0, 4.0]), 0.1, None, None, 0)
+
+        videos = {}
+        for view, fps in ((View.FRONT, 60), (View.SIDE, 30)):
+            times = np.arange(0, 0.2, 1 / fps)
+            # Points before the bounce fall towards the pitch, afterwards they follow the true trajectory
+            before = truth.positionAt(times[times < 0.1])
+            before[:, 2] = 2.0 * (0.1 - times[times < 0.1])
+            pixels = model.project(cameras[view], np.concatenate((before, truth.positionAt(times[times >= 0.1]))))
+            video = Video("some.mp4", (0, 0, 0))
+            video.restoreTracking([(u, v, 5, i) for i, (u, v) in enumerate(pixels)], times * 1000)
+            videos[view] = video
+
+        result = Model(videos[View.FRONT], videos[View.SIDE])
+        result.restore(0)
+        for view in View:
+            result.setCalibration(view, model.project(cameras[view], self.REFERENCES), self.REFERENCES)
+
+        reconstruction = result.reconstructTrajectory()
+        impactTime = 0.1 + (20.12 - 14.0) / 30.0
+        assert reconstruction.impactTime == pytest.approx(impactTime, abs=1e-3)
+        np.testing.assert_allclose(reconstruction.impactPoint, truth.positionAt(impactTime), atol=1e-3)
+        assert reconstruction.residual < 1e-3
+
+
+class TestPrediction:
+    def makeNoisyModel(self, noise):
+        rng = np.random.default_rng(3)
+        times = np.arange(16) * 1000 / 60
+        seconds = times / 1000
+        frontX = 300 + 60 * seconds + rng.normal(0, noise, 16)
+        frontY = 500 - 400 * seconds
+        sideX = 100 + 2000 * seconds
+        sideY = 300 - 800 * seconds + 2000 * seconds ** 2 + rng.normal(0, noise, 16)
+
+        front = Video("front.mp4", (0, 0, 0))
+        front.restoreTracking([(x, y, 10, i) for i, (x, y) in enumerate(zip(frontX, frontY))], times)
+        side = Video("side.mp4", (0, 0, 0))
+        side.restoreTracking([(x, y, 10, i) for i, (x, y) in enumerate(zip(sideX, sideY))], times)
+        result = Model(front, side)
+        result.restore(900)
+        return result
+
+    @pytest.mark.parametrize("bootstrap", [0, 500])
+    def testPredictionIntervals(self, bootstrap):
+        impactTime = 0.4
+        trueLine, trueHeight = 300 + 60 * impactTime, 300 - 800 * impactTime + 2000 * impactTime ** 2
+
+        prediction = self.makeNoisyModel(2).makePrediction(bootstrap)
+        assert prediction.impactTime == pytest.approx(impactTime)
+        assert prediction.lineInterval[0] < trueLine < prediction.lineInterval[1]
+        assert prediction.heightInterval[0] < trueHeight < prediction.heightInterval[1]
+
+        narrow = self.makeNoisyModel(0.2).makePrediction(bootstrap)
+        assert np.diff(narrow.heightInterval)[0] < np.diff(prediction.heightInterval)[0] / 5
@@ -0,0 +1,43 @@
+import time
+from collections import namedtuple
+import profiling
+import harness
+from test_harness import dataset
+
+
+def spin(seconds):
+    """Keeps the calling thread busy in Python code for the given time."""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class TestStackSampler:
+    def testCollapsedStacksRecordBusyFunction(self, tmp_path):
+        path = tmp_path / "profile.folded"
+        with profiling.profiled(str(path), interval=0.001) as sampler:
+            spin(0.2)
+        assert sampler.getSampleCount() > 0
+
+        lines = path.read_text().splitlines()
+        stack, _, count = lines[0].rpartition(" ")
+        assert int(count) > 0 and ";" in stack
+        assert any(line.startswith("MainThread;") and "spin (test_profiling.py:" in line for line in lines)
+        assert (tmp_path / ("profile" + profiling.PROFILE_SUMMARY_SUFFIX)).exists()
+
+        hot = {function.name.partition(" ")[0]: function for function in sampler.hotFunctions(files=("test_profiling.py",))}
+        assert hot["spin"].selfTime >= 0.1
+        assert hot["TestStackSampler.testCollapsedStacksRecordBusyFunction"].selfTime < hot["spin"].selfTime
+
+    def testHarnessProfileSummarisesModel(self, dataset, tmp_path, capsys):
+        path = tmp_path / "harness.folded"
+        harness.main([dataset, "--profile", str(path)])
+        assert path.exists()
+        summary = (tmp_path / ("harness" + profiling.PROFILE_SUMMARY_SUFFIX)).read_text()
+        assert "(Model.py:" in summary
+        assert "Accuracy within" in capsys.readouterr().out
+
+    def testLabelWithoutQualifiedName(self):
+        # Code objects before Python 3.11 have no co_qualname
+        code = namedtuple("Code", "co_name co_filename co_firstlineno")("incrementFrame", "/src/Model.py", 228)
+        assert profiling.StackSampler()._label(code) == "incrementFrame (Model.py:228)"
@@ -0,0 +1,47 @@
+import pytest
+import numpy as np
+import cv2 as cv
+import Model as model
+import replay
+import session
+from test_session import tracked
+
+View = model.View
+
+
+class TestReplay:
+    def testReplayCoversDeliveryAndHold(self, tracked, tmp_path):
+        tracked.makePrediction()
+        path = str(tmp_path / "replay.mp4")
+        count = replay.exportReplay(tracked, path, queueSize=2)
+
+        capture = cv.VideoCapture(path)
+        assert int(capture.get(cv.CAP_PROP_FRAME_COUNT)) == count
+        assert int(capture.get(cv.CAP_PROP_FRAME_WIDTH)) == 640
+        assert int(capture.get(cv.CAP_PROP_FRAME_HEIGHT)) == 240
+        # Every tracked frame plus the frames after it, then the held prediction
+        frames = tracked.getVideo(View.FRONT).getFrameCount()
+        assert count == frames + round(replay.REPLAY_HOLD / 1000 * 30)
+        capture.release()
+
+    def testReplayDecodesDroppedFrames(self, tracked, tmp_path):
+        tracked.makePrediction()
+        sessionPath = str(tmp_path / "review.json")
+        session.saveSession(tracked, sessionPath)
+        resumed = session.loadSession(sessionPath)
+
+        first, second = str(tmp_path / "first.mp4"), str(tmp_path / "second.mp4")
+        assert replay.exportReplay(resumed, second) == replay.exportReplay(tracked, first)
+        # Frames decoded for the replay are not kept
+        assert sum(frame is not None for frame in resumed.getVideo(View.FRONT)._frames) == 1
+
+        original, restored = cv.VideoCapture(first), cv.VideoCapture(second)
+        while True:
+            ret, expected = original.read()
+            if not ret:
+                break
+            assert np.array_equal(restored.read()[1], expected)
+
+    def testReplayRequiresPrediction(self, tracked, tmp_path):
+        with pytest.raises(ValueError):
+            replay.exportReplay(tracked, str(tmp_path / "replay.mp4"))
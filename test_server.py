@@ -0,0 +1,123 @@
+import os
+import stat
+import threading
+import pytest
+import numpy as np
+import server
+import synthetic
+from dataclasses import replace
+from Model import Model, Video, defaultParameters
+from session import saveSession
+from library import View
+
+
+@pytest.fixture
+def delivery(tmp_path):
+    """Clips of a synthetic delivery, a tracking server and a local model of the same clips."""
+    front, side = synthetic.deliveryViews()
+    paths = [synthetic.writeVideo(view, str(tmp_path / f"{name}.mp4")) for name, view in (("front", front), ("side", side))]
+    keyPath = str(tmp_path / "drs.key")
+    trackingServer = server.TrackingServer(str(tmp_path / "drs.sock"), keyPath)
+    thread = trackingServer.start()
+    local = Model(Video(paths[0], front.ball.colour), Video(paths[1], front.ball.colour))
+    remote = server.connectModel(trackingServer.getAddress(), *paths, front.ball.colour, keyPath=keyPath)
+    yield local, remote
+    remote.close()
+    trackingServer.close()
+    thread.join(5)
+
+
+def track(model):
+    model.incrementFrame(View.FRONT)
+    model.incrementFrame(View.SIDE)
+    model.linkVideos()
+    model.startTracking(View.FRONT)
+    while model.incrementFrame(View.FRONT):
+        pass
+    model.setStumpPosition(360)
+
+
+class TestTrackingServer:
+    def testRemoteModelMatchesLocalModel(self, delivery):
+        local, remote = delivery
+        for model in delivery:
+            track(model)
+        for view in View:
+            assert remote.getVideo(view).getPoints() == local.getVideo(view).getPoints()
+        assert remote.makePrediction() == local.makePrediction()
+
+        remoteRenders, localRenders = remote.render(), local.render()
+        for view in View:
+            assert np.array_equal(remoteRenders[view].frame, localRenders[view].frame)
+            assert remoteRenders[view].circles == localRenders[view].circles
+        assert [plot[3].tolist() for plot in remote.getPlots()] == [plot[3].tolist() for plot in local.getPlots()]
+
+    def testFramesArePassedThroughSharedMemory(self, delivery, monkeypatch):
+        _, remote = delivery
+        remote.incrementFrame(View.FRONT)
+        remote.incrementFrame(View.SIDE)
+        sent = []
+        connection = remote._local.connection[0]
+        original = connection.recv
+        monkeypatch.setattr(connection, "recv", lambda: sent.append(original()) or sent[-1])
+        render = remote.render()[View.FRONT]
+        assert render.frame.shape == (360, 480, 3)
+        # Only a description of the frame passes through the socket
+        assert isinstance(sent[-1][1][View.FRONT].frame, server.SharedArray)
+        assert os.path.dirname(sent[-1][1][View.FRONT].frame.path) == server.SHARED_MEMORY_DIRECTORY
+
+    def testThreadsShareSessionAndProgressIsReported(self, delivery):
+        _, remote = delivery
+        track(remote)
+        progress = []
+        remote.setProgressCallback(lambda done, total: progress.append((done, total)))
+
+        indices = []
+        thread = threading.Thread(target=lambda: indices.append(remote.getVideo(View.SIDE).getFrameIndex()))
+        thread.start()
+        thread.join()
+        assert indices == [remote.getVideo(View.SIDE).getFrameIndex()]
+
+        remote.updateParameters(View.FRONT, replace(defaultParameters(), param2=25))
+        assert progress and progress[-1][0] + 1 == progress[-1][1]
+
+    def testTasksAndErrors(self, delivery, tmp_path):
+        _, remote = delivery
+        with pytest.raises(ValueError):
+            remote.makePrediction()
+        with pytest.raises(ValueError):
+            remote._call("call", None, "_frontVideo", (), {})
+        # Only the listed methods can be called, even if the client sends others
+        with pytest.raises(ValueError):
+            remote._call("call", None, "restoreSession", ({},), {})
+        with pytest.raises(ValueError):
+            remote._call("call", View.FRONT, "restoreTracking", ([], []), {})
+        with pytest.raises(AttributeError):
+            remote.getSession()
+
+        track(remote)
+        path = str(tmp_path / "session.json")
+        remote.runTask(saveSession, path)
+        resumed = server.connectSession(remote._address, path, str(tmp_path / "drs.key"))
+        try:
+            assert resumed.getVideo(View.FRONT).getPoints() == remote.getVideo(View.FRONT).getPoints()
+        finally:
+            resumed.close()
+
+    def testClientsNeedKeyAndSocketIsPrivate(self, delivery, tmp_path):
+        _, remote = delivery
+        keyPath = str(tmp_path / "drs.key")
+        assert stat.S_IMODE(os.stat(keyPath).st_mode) == 0o600
+        assert stat.S_IMODE(os.stat(remote._address).st_mode) == 0o600
+
+        otherKey = str(tmp_path / "other.key")
+        server.loadAuthKey(otherKey, create=True)
+        with pytest.raises(ValueError):
+            server.connectSession(remote._address, "session.json", otherKey)
+
+        os.chmod(otherKey, 0o644)
+        with pytest.raises(ValueError):
+            server.loadAuthKey(otherKey)
+        # The server still serves clients holding the key
+        remote.incrementFrame(View.FRONT)
+        assert remote.getVideo(View.FRONT).getFrameIndex() == 0
@@ -0,0 +1,82 @@
+import pytest
+import numpy as np
+import cv2 as cv
+import Model as model
+import session
+
+Video = model.Video
+Model = model.Model
+View = model.View
+
+
+def writeBallClip(path, numFrames, size=(320, 240)):
+    """Writes a clip of a red ball crossing a dark background."""
+    writer = cv.VideoWriter(str(path), cv.VideoWriter_fourcc(*"mp4v"), 30, size)
+    for i in range(numFrames):
+        frame = np.full((size[1], size[0], 3), 40, dtype=np.uint8)
+        cv.circle(frame, (40 + 10 * i, 60 + 5 * i), 15, (30, 30, 230), -1)
+        writer.write(frame)
+    writer.release()
+    return str(path)
+
+
+@pytest.fixture
+def tracked(tmp_path):
+    """A linked model of two clips tracked part of the way through."""
+    front = Video(writeBallClip(tmp_path / "front.mp4", 20), (0, 0, 0))
+    side = Video(writeBallClip(tmp_path / "side.mp4", 20), (0, 0, 0))
+    result = Model(front, side)
+    for _ in range(3):
+        result.incrementFrame(View.FRONT)
+        result.incrementFrame(View.SIDE)
+    result.linkVideos()
+    result.startTracking(View.FRONT)
+    result.cropRegion(View.SIDE, (10, 10), (300, 230))
+    for _ in range(8):
+        result.incrementFrame(View.FRONT)
+    result.setStumpPosition(250)
+    return result
+
+
+class TestSession:
+    def testResumeMatchesSavedModel(self, tracked, tmp_path):
+        path = str(tmp_path / "review.json")
+        session.saveSession(tracked, path)
+        resumed = session.loadSession(path)
+
+        assert resumed.getStumpPosition() == 250
+        assert resumed.getLinkTime(View.SIDE) == tracked.getLinkTime(View.SIDE)
+        for view in View:
+            original, restored = tracked.getVideo(view), resumed.getVideo(view)
+            assert len(original.getPoints()) >= 8
+            assert np.allclose(restored.getPoints(), original.getPoints())
+            assert restored.getCropRegion() == original.getCropRegion()
+            assert restored.getTimestamps() == original.getTimestamps()
+            assert restored.getFrameIndex() == original.getFrameIndex()
+            assert np.array_equal(restored.getCurrentFrame(), original.getCurrentFrame())
+            # Only the current frame is decoded on resume
+            assert sum(frame is not None for frame in restored._frames) == 1
+
+        # Playback continues from the saved position
+        assert tracked.incrementFrame(View.FRONT) and resumed.incrementFrame(View.FRONT)
+        for view in View:
+            assert np.array_equal(resumed.getVideo(view).getCurrentFrame(), tracked.getVideo(view).getCurrentFrame())
+            assert np.allclose(resumed.getVideo(view).getPoints(), tracked.getVideo(view).getPoints())
+
+    def testRetrackDecodesDroppedFrames(self, tracked, tmp_path):
+        path = str(tmp_path / "review.json")
+        session.saveSession(tracked, path)
+        resumed = session.loadSession(path)
+
+        parameters = model.defaultParameters()
+        parameters.param2 = 25
+        tracked.updateParameters(View.FRONT, parameters)
+        resumed.updateParameters(View.FRONT, parameters)
+        assert len(resumed.getVideo(View.FRONT).getPoints()) >= 8
+        assert np.allclose(resumed.getVideo(View.FRONT).getPoints(), tracked.getVideo(View.FRONT).getPoints())
+
+    def testRejectsUnknownVersion(self, tmp_path):
+        path = tmp_path / "review.json"
+        path.write_text('{"version": 99}')
+        with pytest.raises(ValueError):
+            session.loadSession(str(path))
@@ -0,0 +1,100 @@
+import threading
+import numpy as np
+import cv2 as cv
+import stream
+from library import View
+
+
+def writeDeliveryClip(path, idleBefore=40, ballFrames=20, idleAfter=30, size=(320, 240), noise=3):
+    """Writes a clip of an empty dark background, a red ball crossing it, then the background again."""
+    writer = cv.VideoWriter(str(path), cv.VideoWriter_fourcc(*"mp4v"), 30, size)
+    rng = np.random.default_rng(0)
+    for i in range(idleBefore + ballFrames + idleAfter):
+        frame = np.full((size[1], size[0], 3), 40, dtype=np.uint8)
+        frame += rng.integers(0, noise, frame.shape, dtype=np.uint8)
+        if idleBefore <= i < idleBefore + ballFrames:
+            step = i - idleBefore
+            cv.circle(frame, (40 + 12 * step, 60 + 6 * step), 15, (30, 30, 230), -1)
+        writer.write(frame)
+    writer.release()
+    return str(path)
+
+
+class TestFrameRing:
+    def testKeepsMostRecentFrames(self):
+        ring = stream.FrameRing(4)
+        for i in range(10):
+            ring.append(np.full((2, 2), i, dtype=np.uint8), i * 10.0)
+        assert ring.oldest() == 6 and ring.newest() == 9
+
+        clip = ring.clip(3, 8, 30)
+        assert [frame[0, 0] for frame in clip.frames] == [6, 7, 8]
+        assert clip.times == [60.0, 70.0, 80.0]
+
+    def testCapacityFitsMemoryLimit(self):
+        ring = stream.FrameRing(100, memoryLimit=10 * 64)
+        ring.append(np.zeros((8, 8), dtype=np.uint8), 0.0)
+        assert ring.getCapacity() == 10
+        # Frames too large for the limit still leave a pair to difference
+        ring = stream.FrameRing(100, memoryLimit=1)
+        ring.append(np.zeros((8, 8), dtype=np.uint8), 0.0)
+        assert ring.getCapacity() == 2
+
+
+class TestStreamMonitor:
+    def testDetectsOneDelivery(self, tmp_path):
+        clips = []
+        monitor = stream.StreamMonitor(stream.openStream(writeDeliveryClip(tmp_path / "front.mp4")), clips.append)
+        monitor.start()
+        monitor.join()
+
+        assert len(clips) == 1
+        # The clip spans the ball's flight plus padding, but not the whole stream
+        assert 20 <= len(clips[0].frames) < 90
+        assert clips[0].times == sorted(clips[0].times)
+
+    def testNoisyStaticStreamHasNoDelivery(self, tmp_path):
+        clips = []
+        path = writeDeliveryClip(tmp_path / "idle.mp4", idleBefore=150, ballFrames=0, idleAfter=0, noise=20)
+        monitor = stream.StreamMonitor(stream.openStream(path), clips.append)
+        monitor.start()
+        monitor.join()
+        assert clips == []
+
+    def testLiveReviewTracksPairedDeliveries(self, tmp_path):
+        decisions = []
+        done = threading.Event()
+
+        def decide(prediction, result):
+            decisions.append((prediction, result))
+            done.set()
+
+        review = stream.LiveReview(250, decide)
+        # The side file starts 6 frames earlier, so its timestamps are not on the front file's clock
+        for view, idleBefore in ((View.FRONT, 40), (View.SIDE, 46)):
+            monitor = review.monitor(view, stream.openStream(writeDeliveryClip(tmp_path / f"{view.name}.mp4", idleBefore)))
+            monitor.start()
+            monitor.join()
+        assert done.wait(30)
+        review.wait()
+
+        assert len(decisions) == 1
+        prediction, model = decisions[0]
+        assert prediction is not None
+        assert len(model.getVideo(View.FRONT).getPoints()) == 20
+        assert abs(model.getLinkTime(View.SIDE) - model.getLinkTime(View.FRONT) - 200) <= 34
+
+    def testReviewReportsPipelineErrors(self, monkeypatch):
+        decisions = []
+
+        def failingVideo(*arguments, **options):
+            raise cv.error("corrupt clip")
+
+        monkeypatch.setattr(stream, "Video", failingVideo)
+        review = stream.LiveReview(250, lambda prediction, result: decisions.append((prediction, result)))
+        clip = stream.StreamClip([np.zeros((4, 4, 3), dtype=np.uint8)] * 3, [0.0, 33.0, 67.0], 30)
+        review.addDelivery(View.FRONT, clip)
+        review.addDelivery(View.SIDE, clip)
+        review.wait()
+        assert len(decisions) == 1
+        assert decisions[0][0] is None and isinstance(decisions[0][1], cv.error)
@@ -0,0 +1,224 @@
+import pytest
+import numpy as np
+from dataclasses import replace
+import Model as model
+import synthetic
+
+Video = model.Video
+Model = model.Model
+View = model.View
+
+STUMP_POSITION = 360
+
+
+def makeVideo(view, **options):
+    """Creates a video which decodes a synthetic view, and decodes it again whenever asked to."""
+    return Video("synthetic.mp4", view.ball.colour, opener=lambda: synthetic.SyntheticCapture(view), **options)
+
+
+def trackDelivery(front, side, **options):
+    """Links videos of both views at the same instant and tracks the ball through the whole delivery."""
+    result = Model(makeVideo(front, **options), makeVideo(side, **options))
+    result.incrementFrame(View.FRONT)
+    result.incrementFrame(View.SIDE)
+    assert result.linkVideos((front.startTime - side.startTime) * 1000)
+    result.startTracking(View.FRONT)
+    while result.incrementFrame(View.FRONT):
+        pass
+    result.setStumpPosition(STUMP_POSITION)
+    return result
+
+
+def trackingErrors(video, view):
+    """Returns the distance of each tracked point from the true position of the ball."""
+    return [np.hypot(point[0] - view.ballPosition(point[3])[0], point[1] - view.ballPosition(point[3])[1]) for point in video.getPoints()]
+
+
+class TestGenerator:
+    def testFramesAreDeterministic(self):
+        front, _ = synthetic.deliveryViews(distractors=True)
+        first, second = synthetic.SyntheticCapture(front), synthetic.SyntheticCapture(front)
+        for _ in range(3):
+            assert np.array_equal(first.read()[1], second.read()[1])
+        assert first.get(model.cv.CAP_PROP_POS_MSEC) == pytest.approx(2000 / 30)
+
+        first.set(model.cv.CAP_PROP_POS_FRAMES, 10)
+        assert np.array_equal(first.read()[1], front.renderFrame(10))
+
+    def testBallStaysAbovePitch(self):
+        for view in synthetic.deliveryViews():
+            path = view.ball.path
+            ground = path.position(path.bounceTime)[1]
+            assert max(view.ballPosition(index)[1] for index in range(view.frameCount())) <= ground
+            assert path.position(10.0)[1] == ground
+
+    def testBallIsDrawnAtTruePosition(self):
+        front, _ = synthetic.deliveryViews()
+        frame = front.renderFrame(5)
+        x, y = front.ballPosition(5)
+        # BGR of the default red ball
+        assert tuple(frame[int(round(y)), int(round(x))]) == (30, 30, 230)
+
+
+class TestTracking:
+    @pytest.mark.parametrize("distractors", [False, True])
+    def testTrackFollowsBall(self, distractors):
+        front, side = synthetic.deliveryViews(distractors=distractors)
+        delivery = trackDelivery(front, side)
+        for view, synthetic_view in zip(View, (front, side)):
+            video = delivery.getVideo(view)
+            assert len(video.getPoints()) == synthetic_view.frameCount() - 1
+            assert max(trackingErrors(video, synthetic_view)) <= 1.5
+
+    def testDecodeScaleScalesParameters(self, tmp_path):
+        front, side = synthetic.deliveryViews()
+        paths = [synthetic.writeVideo(view, str(tmp_path / f"{name}.mp4")) for name, view in (("front", front), ("side", side))]
+        # At half size the ball's radius of 12 px is below the default smallest radius unless it is scaled
+        delivery = Model(Video(paths[0], front.ball.colour, scale=0.5), Video(paths[1], front.ball.colour, scale=0.5))
+        assert delivery.getVideo(View.FRONT).getParameters() == model.defaultParameters()
+        delivery.incrementFrame(View.FRONT)
+        delivery.incrementFrame(View.SIDE)
+        delivery.linkVideos(0.0)
+        delivery.startTracking(View.FRONT)
+        while delivery.incrementFrame(View.FRONT):
+            pass
+        points = delivery.getVideo(View.SIDE).getPoints()
+        assert len(points) >= side.frameCount() - 1
+        errors = [np.hypot(x * 2 - side.ballPosition(index)[0], y * 2 - side.ballPosition(index)[1]) for x, y, _, index in points]
+        assert np.median(errors) < 3
+
+    def testScaleParameters(self):
+        half = model.scaleParameters(model.defaultParameters(), 0.5)
+        assert (half.minRadius, half.maxRadius, half.minDist, half.maxStep, half.param2) == (5, 15, 50, 75, 15)
+        assert half.blurSqrSize % 2 == 1 and half.param1 == model.defaultParameters().param1
+        assert model.scaleParameters(model.defaultParameters(), 1.0) == model.defaultParameters()
+
+    def testRefinedTrackIsSubpixel(self):
+        front, side = synthetic.deliveryViews()
+        delivery = trackDelivery(front, side)
+        delivery.setRefinement(View.SIDE, True)
+        assert np.mean(trackingErrors(delivery.getVideo(View.SIDE), side)) <= 0.5
+
+    def testTrackIsBacktrackedOncePerBatch(self, monkeypatch):
+        front, _ = synthetic.deliveryViews(distractors=True)
+        video = makeVideo(front)
+        calls = []
+        backtrack = Video._backtrackPoints
+        monkeypatch.setattr(Video, "_backtrackPoints", lambda self: calls.append(None) or backtrack(self))
+        video.incrementFrame()
+        video.markFirstFrame()
+        while video.incrementFrame():
+            pass
+        assert calls == []
+        points = video.getPoints()
+        assert len(points) == front.frameCount() - 1 and len(calls) == 1
+        assert video.getPoints() == points and len(calls) == 1
+
+    def testRetrackMatchesIncrementalTrack(self):
+        front, side = synthetic.deliveryViews(distractors=True)
+        video = trackDelivery(front, side).getVideo(View.SIDE)
+        incremental = video.getPoints()
+        video._recalculatePoints()
+        # Retracking also tracks the frame tracking was started on
+        assert video.getPoints()[1:] == incremental
+
+    @pytest.mark.parametrize("options", [{"trackingOnly": True}, {"memoryLimit": 200000}])
+    def testMemorySavingPathsMatchBitForBit(self, options):
+        front, side = synthetic.deliveryViews(distractors=True)
+        reference = trackDelivery(front, side)
+        memoryLimit = options.pop("memoryLimit", None)
+        delivery = Model(makeVideo(front, **options), makeVideo(side, **options))
+        delivery.setMemoryLimit(memoryLimit)
+        delivery.incrementFrame(View.FRONT)
+        delivery.incrementFrame(View.SIDE)
+        delivery.linkVideos(0)
+        delivery.startTracking(View.FRONT)
+        while delivery.incrementFrame(View.FRONT):
+            pass
+
+        parameters = replace(model.defaultParameters(), param2=25)
+        for view in View:
+            assert delivery.getVideo(view).getPoints() == reference.getVideo(view).getPoints()
+            reference.updateParameters(view, parameters)
+            delivery.updateParameters(view, parameters)
+            assert delivery.getVideo(view).getPoints() == reference.getVideo(view).getPoints()
+
+
+class TestBounce:
+    @pytest.mark.parametrize("fps", [25.0, 30.0, 60.0])
+    @pytest.mark.parametrize("view", [0, 1])
+    def testBounceMatchesPath(self, fps, view):
+        path = synthetic.deliveryViews((fps, fps))[view]
+        times = np.array([path.frameTime(index) for index in range(path.frameCount())])
+        ys = np.array([path.ballPosition(index)[1] for index in range(path.frameCount())])
+        bounce, confidence = model.findBounce(times, ys)
+        # The bounce is the frame closest to the instant the ball turns
+        assert abs(times[bounce] - path.ball.path.bounceTime) <= 0.5 / fps + 1e-9
+        assert confidence > 0.9
+
+    def testSpuriousPointBelowPitchKeepsBounce(self):
+        path = synthetic.deliveryViews()[1]
+        times = np.array([path.frameTime(index) for index in range(path.frameCount())])
+        ys = np.array([path.ballPosition(index)[1] for index in range(path.frameCount())])
+        bounce, _ = model.findBounce(times, ys)
+        ys[bounce + 4] = path.size[1] - 1
+        assert model.findBounce(times, ys)[0] == bounce
+
+
+class TestLinkedPrediction:
+    @pytest.mark.parametrize("fps, startTimes", [
+        ((30.0, 30.0), (0.0, 0.0)),
+        ((30.0, 50.0), (0.0, 0.013)),
+        ((60.0, 25.0), (0.02, 0.0)),
+    ])
+    def testLinkedFramesStayInSync(self, fps, startTimes):
+        front, side = synthetic.deliveryViews(fps, startTimes)
+        delivery = Model(makeVideo(front), makeVideo(side))
+        delivery.incrementFrame(View.FRONT)
+        delivery.incrementFrame(View.SIDE)
+        delivery.linkVideos((front.startTime - side.startTime) * 1000)
+        tolerance = 0.5 / min(fps) + 1e-6
+        # Once either view has ended the other can only be paired with its last frame
+        end = min(view.frameTime(view.frameCount() - 1) for view in (front, side))
+        while True:
+            frontTime = front.frameTime(delivery.getVideo(View.FRONT).getFrameIndex())
+            sideTime = side.frameTime(delivery.getVideo(View.SIDE).getFrameIndex())
+            if max(frontTime, sideTime) <= end:
+                assert abs(frontTime - sideTime) <= tolerance
+            if not delivery.incrementFrame(View.FRONT):
+                break
+
+    @pytest.mark.parametrize("startTimes", [(0.0, 0.1), (0.1, 0.0), (0.0, 0.25)])
+    def testAutoLinkFindsOffsetOfNoisyViews(self, startTimes):
+        # The crossing distractor gives both views a burst of motion to align, over grain in every frame
+        front, side = synthetic.deliveryViews(startTimes=startTimes, distractors=True)
+        delivery = Model(makeVideo(front), makeVideo(side))
+        delivery.incrementFrame(View.FRONT)
+        delivery.incrementFrame(View.SIDE)
+        offset = delivery.autoLink()
+        assert offset == pytest.approx((front.startTime - side.startTime) * 1000, abs=500 / front.fps)
+
+    @pytest.mark.parametrize("fps, startTimes, distractors", [
+        ((30.0, 30.0), (0.0, 0.0), False),
+        ((30.0, 30.0), (0.0, 0.0), True),
+        ((30.0, 50.0), (0.0, 0.013), False),
+        ((60.0, 25.0), (0.02, 0.0), True),
+    ])
+    def testPredictionMatchesGroundTruth(self, fps, startTimes, distractors):
+        front, side = synthetic.deliveryViews(fps, startTimes, distractors)
+        delivery = trackDelivery(front, side)
+        prediction = delivery.makePrediction()
+        impactTime, line, height = synthetic.groundTruth(front, side, STUMP_POSITION)
+
+        # Predicted times are measured from the first front frame
+        assert prediction.impactTime + front.startTime == pytest.approx(impactTime, abs=0.01)
+        assert prediction.line == pytest.approx(line, abs=3)
+        # Heights are truncated to whole pixels
+        assert prediction.height == pytest.approx(height, abs=1.5)
+        assert prediction.heightInterval[0] <= height <= prediction.heightInterval[1]
+
+        for view, video, bounce, confidence in ((front, View.FRONT, prediction.frontBounce, prediction.frontBounceConfidence),
+                (side, View.SIDE, prediction.sideBounce, prediction.sideBounceConfidence)):
+            frame = delivery.getVideo(video).getPoints()[bounce][3]
+            assert abs(view.frameTime(frame) - view.ball.path.bounceTime) <= 0.5 / view.fps + 1e-9
+            assert confidence > 0.9
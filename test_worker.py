@@ -0,0 +1,86 @@
+import threading
+import pytest
+from worker import Worker
+
+
+class FakeRoot:
+    """Stands in for a Tk root, holding scheduled callbacks until the test runs them."""
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, delay, callback):
+        self.scheduled.append(callback)
+
+    def poll(self):
+        callbacks, self.scheduled = self.scheduled, []
+        for callback in callbacks:
+            callback()
+
+
+def waitFor(worker, root):
+    """Drives the fake Tk loop until every submitted task has been handled."""
+    for _ in range(1000):
+        root.poll()
+        if not worker.isBusy():
+            return
+        threading.Event().wait(0.005)
+    raise AssertionError("Worker did not finish")
+
+
+class TestWorker:
+    def testResultsAreHandledOnPollingThread(self):
+        root = FakeRoot()
+        busy = []
+        worker = Worker(root, onBusyChange=busy.append)
+        results = []
+        threads = []
+
+        def task():
+            threads.append(threading.current_thread())
+            return 42
+
+        def done(value):
+            threads.append(threading.current_thread())
+            results.append(value)
+
+        worker.submit(task, done)
+        assert worker.isBusy()
+        waitFor(worker, root)
+
+        assert results == [42]
+        assert threads[0] is not threading.current_thread()
+        assert threads[1] is threading.current_thread()
+        assert busy == [True, False]
+
+    def testTasksRunInOrderAndReportProgress(self):
+        root = FakeRoot()
+        progress = []
+        worker = Worker(root, onProgress=lambda done, total: progress.append((done, total)))
+        order = []
+
+        def task(i):
+            worker.reportProgress(i, 3)
+            return i
+
+        for i in range(3):
+            worker.submit(lambda i=i: task(i), order.append)
+        waitFor(worker, root)
+
+        assert order == [0, 1, 2]
+        assert progress == [(0, 3), (1, 3), (2, 3)]
+
+    def testErrorsAreHandledOrRaised(self):
+        root = FakeRoot()
+        worker = Worker(root)
+        errors = []
+
+        def fail():
+            raise ValueError("bad")
+
+        worker.submit(fail, onError=errors.append)
+        waitFor(worker, root)
+        assert str(errors[0]) == "bad"
+
+        worker.submit(fail)
+        with pytest.raises(ValueError):
+            waitFor(worker, root)
@@ -0,0 +1,88 @@
+import queue
+import threading
+
+# Milliseconds between checks for finished tasks on the Tk thread
+WORKER_POLL_INTERVAL = 15
+
+class Worker:
+    """
+    Runs tasks one at a time on a background thread and hands their results back to the Tk thread, so
+    that long model operations do not block redraws.
+    """
+    def __init__(self, root, onBusyChange=None, onProgress=None) -> None:
+        """
+        Initializes the Worker and starts its thread.
+        parameters:
+            root: The Tkinter root window, used to schedule callbacks on the Tk thread.
+            onBusyChange: Called on the Tk thread with True when work starts and False when the queue empties.
+            onProgress: Called on the Tk thread with (done, total) as a task reports progress.
+        """
+        self._root = root
+        self._onBusyChange = onBusyChange
+        self._onProgress = onProgress
+        self._tasks = queue.Queue()
+        self._results = queue.Queue()
+        self._pending = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._root.after(WORKER_POLL_INTERVAL, self._poll)
+
+    def submit(self, task, onDone=None, onError=None) -> None:
+        """
+        Queues a task to run on the worker thread. Must be called from the Tk thread.
+        parameters:
+            task: A function taking no arguments.
+            onDone: Called on the Tk thread with the task's return value.
+            onError: Called on the Tk thread with the exception if the task raises one.
+        """
+        self._pending += 1
+        if self._pending == 1 and self._onBusyChange is not None:
+            self._onBusyChange(True)
+        self._tasks.put((task, onDone, onError))
+
+    def isBusy(self) -> bool:
+        """
+        Returns whether any submitted task has not yet had its result handled.
+        """
+        return self._pending > 0
+
+    def reportProgress(self, done: int, total: int) -> None:
+        """
+        Reports the progress of the running task. Safe to call from the worker thread.
+        """
+        self._results.put(("progress", self._onProgress, (done, total)))
+
+    def _run(self) -> None:
+        """
+        Runs queued tasks forever on the worker thread.
+        """
+        while True:
+            task, onDone, onError = self._tasks.get()
+            try:
+                self._results.put(("done", onDone, task()))
+            except Exception as e:
+                self._results.put(("error", onError, e))
+
+    def _poll(self) -> None:
+        """
+        Runs the callbacks of finished tasks on the Tk thread, then schedules the next check. Errors
+        without a handler are raised on the Tk thread so that Tk reports them.
+        """
+        self._root.after(WORKER_POLL_INTERVAL, self._poll)
+        while True:
+            try:
+                kind, callback, value = self._results.get_nowait()
+            except queue.Empty:
+                return
+            if kind == "progress":
+                if callback is not None:
+                    callback(*value)
+                continue
+
+            self._pending -= 1
+            if self._pending == 0 and self._onBusyChange is not None:
+                self._onBusyChange(False)
+            if callback is not None:
+                callback(value)
+            elif kind == "error":
+                raise value